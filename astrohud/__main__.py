@@ -1,20 +1,56 @@
 """Main entrypoint"""
 
 from datetime import datetime
+from datetime import timedelta
 from datetime import timezone
+from typing import Optional
 from typing import Tuple
+import json
+import os
 import click
 
 from astrohud.chart.styles.enums import ChartStyle
-from astrohud.chart.styles.const import CHART_STYLE_CLASSES
-from astrohud.chart.renderer.pillow.models import PillowRenderer
+from astrohud.cli.batch import run_batch
+from astrohud.cli.bench import format_header
+from astrohud.cli.bench import format_result
+from astrohud.cli.bench import get_bench_dates
+from astrohud.cli.bench import make_report
+from astrohud.cli.bench import run_benchmark
+from astrohud.cli.bench import select_benchmarks
+from astrohud.cli.const import BATCH_CHUNK_SIZE
+from astrohud.cli.const import BENCH_MAX_TIME
+from astrohud.cli.const import BENCH_MIN_ROUNDS
+from astrohud.cli.const import EXPORT_FORMATS
+from astrohud.cli.const import SEARCH_DAYS
+from astrohud.cli.ephemeris import export_series
+from astrohud.cli.ephemeris import get_export_format
+from astrohud.cli.profiler import Profiler
+from astrohud.cli.util import format_event
+from astrohud.cli.util import format_event_row
+from astrohud.cli.util import get_image_format
 from astrohud.cli.util import print_horoscope
+from astrohud.cli.util import save_chart
+from astrohud.cli.util import write_atomic
+from astrohud.cli.watch import watch_horoscope
 from astrohud.lib.ephemeris.enums import HouseSystem
+from astrohud.lib.ephemeris.enums import Planet
+from astrohud.lib.ephemeris.enums import Sign
 from astrohud.lib.ephemeris.enums import Zodiac
 from astrohud.lib.ephemeris.models import EpheDate
 from astrohud.lib.ephemeris.models import EpheSettings
+from astrohud.lib.horoscope.const import ASPECT_DEGREES
+from astrohud.lib.horoscope.enums import Aspect
 from astrohud.lib.horoscope.models import Horoscope
+from astrohud.lib.search.enums import EventType
+from astrohud.lib.search.models import SearchQuery
+from astrohud.lib.search.models import search as search_events
+from astrohud.lib.series.const import SERIES_CHUNK_SIZE
+from astrohud.lib.series.models import PositionSeries
 from astrohud.restapi import flask_app
+from astrohud.restapi import lifecycle
+from astrohud.restapi.horo.const import IMAGE_FORMATS
+from astrohud.restapi.horo.const import LIVE_DELTA
+from astrohud.restapi.horo.models import parse_step
 
 
 LATITUDE = 38.5616433
@@ -23,6 +59,10 @@ HOUSE_SYS_OPTIONS = [k.value for k in HouseSystem]
 HOUSE_SYS_NAMES = ', '.join([f'{k.name} ({k.value})' for k in HouseSystem])
 ZODIAC_NAMES = [z.name for z in list(Zodiac)]
 CHART_NAMES = {c.name for c in ChartStyle}
+PLANET_NAMES = [p.name for p in Planet]
+SIGN_NAMES = [s.name for s in Sign]
+ASPECT_NAMES = [a.name for a in ASPECT_DEGREES]
+EVENT_NAMES = [e.name for e in EventType]
 
 
 def default_settings(function):
@@ -59,8 +99,16 @@ def default_settings(function):
 
 
 @click.group()
-def main():
+@click.option('--profile', default=False, is_flag=True, help='Print a table of stage timings after the command')
+@click.option('--profile-stats', type=click.Path(dir_okay=False, writable=True), help='Also save cProfile stats to path, for pstats.')
+@click.option('--profile-memory', type=click.Path(dir_okay=False, writable=True), help='Also save a tracemalloc snapshot to path.')
+@click.pass_context
+def main(ctx: click.Context, profile: bool, profile_stats: str, profile_memory: str):
     """Main entrypoint"""
+    if profile or profile_stats or profile_memory:
+        profiler = Profiler(profile_stats, profile_memory)
+        profiler.start()
+        ctx.call_on_close(profiler.finish)
 
 
 @main.command()
@@ -69,37 +117,263 @@ def main():
 @click.option('--background', type=click.Path(dir_okay=False, writable=True), multiple=True, help='If specified, overlay horoscope over image.')
 @click.option('--background-shift', type=float, multiple=True, help='If specified, percentile to shift the background overlay')
 @click.option('--style', type=click.Choice(CHART_NAMES, case_sensitive=False), default=ChartStyle.MODERN_WHEEL.name, help='Printed chart style.')
+@click.option(
+    '--watch', type=click.FloatRange(min=0, min_open=True), metavar='SECONDS',
+    help='If specified, print the horoscope for the current time and save its images every interval, until interrupted.'
+)
+@click.option('--watch-delta', type=float, default=LIVE_DELTA, show_default=True, help='Degrees a planet or the ascendant moves before watched images are redrawn without a transition.')
 @default_settings
-def horo(settings: EpheSettings, date: datetime, save_img: Tuple[str], background: Tuple[str], background_shift: Tuple[float], style: str):
+def horo(
+    settings: EpheSettings,
+    date: datetime,
+    save_img: Tuple[str],
+    background: Tuple[str],
+    background_shift: Tuple[float],
+    style: str,
+    watch: Optional[float],
+    watch_delta: float,
+):
     """Get a horoscope"""
+    image_formats = [get_image_format(save_path) for save_path in save_img]
+    if watch is not None:
+        watch_horoscope(settings, style, watch, watch_delta, save_img, image_formats, background, background_shift)
+        return
+
     date = date.astimezone(timezone.utc)
 
     horo = Horoscope(ed=EpheDate(date), settings=settings)
     print(date.astimezone(None))
     print_horoscope(horo)
 
-    chart_cls = CHART_STYLE_CLASSES[style]
-
     if save_img:
-        chart = chart_cls(horo)
-        render = PillowRenderer(chart)
-        render.draw_all()
-        img = render.img
+        save_chart(horo, style, save_img, image_formats, background, background_shift)
+
+
+@main.command()
+@click.argument('input_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('-O', '--output-dir', type=click.Path(file_okay=False, writable=True), required=True, help='Directory for the output files.')
+@click.option('--image-format', type=click.Choice(list(IMAGE_FORMATS), case_sensitive=False), default='png', show_default=True, help='Image format.')
+@click.option('--images/--no-images', default=True, is_flag=True, show_default=True, help='Save chart images')
+@click.option('--json/--no-json', 'write_json', default=True, is_flag=True, show_default=True, help='Save chart JSON, as returned by the API')
+@click.option('-w', '--workers', type=int, default=0, help='Worker processes. Defaults to the CPU count.')
+@click.option('--chunk-size', type=int, default=BATCH_CHUNK_SIZE, show_default=True, help='Charts per worker task.')
+@click.option('--style', type=click.Choice(CHART_NAMES, case_sensitive=False), default=ChartStyle.MODERN_WHEEL.name, help='Chart style.')
+@default_settings
+def batch(
+    settings: EpheSettings,
+    input_path: str,
+    output_dir: str,
+    image_format: str,
+    images: bool,
+    write_json: bool,
+    workers: int,
+    chunk_size: int,
+    style: str,
+):
+    """Render the charts of a CSV or JSONL file.
+
+    Each row has a date, and can override the location and settings with the fields
+    latitude, longitude, orb_limit, conjunction_limit, zodiac, house_sys and style.
+    Files are named by the name field, or the row number. Charts with existing files are skipped,
+    so an interrupted batch can be resumed by running it again.
+    """
+    latitude, longitude = settings.location
+    defaults = dict(
+        orb_limit=settings.orb_limit,
+        conjunction_limit=settings.conjunction_limit,
+        zodiac=settings.zodiac.name,
+        house_sys=HouseSystem(settings.house_sys.decode('latin1')).name,
+        latitude=latitude,
+        longitude=longitude,
+        style=style.upper(),
+    )
+    stats = run_batch(
+        input_path,
+        output_dir,
+        defaults,
+        extension=image_format.lower() if images else None,
+        write_json=write_json,
+        workers=workers or os.cpu_count() or 1,
+        chunk_size=chunk_size,
+        echo=lambda line: click.echo(line, err=True),
+    )
+
+    for index, error in sorted(stats.errors.items()):
+        click.echo(f'Row {index}: {error}', err=True)
+    click.echo(stats.summary())
+    if stats.failed:
+        raise SystemExit(1)
+
+
+@main.command()
+@click.option('-s', '--start', type=click.DateTime(), required=True, help='First date.')
+@click.option('-e', '--end', type=click.DateTime(), required=True, help='Last date, included if it falls on a step.')
+@click.option('--step', default='1d', show_default=True, help='Time between rows, in seconds or with a unit: s, m, h or d.')
+@click.option(
+    '-p', '--planet', 'planets', type=click.Choice(PLANET_NAMES, case_sensitive=False), multiple=True,
+    help='Planet to include. Can be repeated. Defaults to all planets.'
+)
+@click.option('-O', '--output', default='-', show_default=True, help='Output path, or - for stdout.')
+@click.option(
+    '--format', 'export_format', type=click.Choice(sorted(set(EXPORT_FORMATS.values()))),
+    help='Output format. Defaults to the output extension, or CSV.'
+)
+@click.option('--chunk-size', type=int, default=SERIES_CHUNK_SIZE, show_default=True, help='Dates computed at once. Memory is bounded by this.')
+@default_settings
+def ephemeris(
+    settings: EpheSettings,
+    start: datetime,
+    end: datetime,
+    step: str,
+    planets: Tuple[str],
+    output: str,
+    export_format: str,
+    chunk_size: int,
+):
+    """Export planet positions for a date range.
+
+    Each row has the date, planet, longitude, latitude, speed, sign, face, house, retrograde and dignity.
+    Orb settings are unused.
+    """
+    try:
+        step = parse_step(step)
+    except ValueError as error:
+        raise click.BadParameter(str(error), param_hint='--step')
+
+    selected = [getattr(Planet, name.upper()) for name in planets] or list(Planet)
+    series = PositionSeries(
+        settings,
+        selected,
+        start.astimezone(timezone.utc),
+        end.astimezone(timezone.utc),
+        step,
+        chunk_size=chunk_size,
+    )
+    if len(series) == 0:
+        raise click.BadParameter('End is before start', param_hint='--end')
+
+    export_format = export_format or get_export_format(output)
+    try:
+        export_series(series, output, export_format)
+    except RuntimeError as error:
+        raise click.ClickException(str(error))
+    if output != '-':
+        click.echo(f'{len(series)} rows written to {output}', err=True)
+
+
+@main.command()
+@click.argument('event', type=click.Choice(EVENT_NAMES, case_sensitive=False))
+@click.argument('planet', type=click.Choice(PLANET_NAMES, case_sensitive=False))
+@click.option('-s', '--start', type=click.DateTime(), default=datetime.now(timezone.utc), help='First date. Defaults to now.')
+@click.option('-e', '--end', type=click.DateTime(), help='Last date. Defaults to a century after the start.')
+@click.option('--sign', type=click.Choice(SIGN_NAMES, case_sensitive=False), help='Only find ingresses into this sign.')
+@click.option('--other', type=click.Choice(PLANET_NAMES, case_sensitive=False), help='Other planet of aspects.')
+@click.option('--aspect', type=click.Choice(ASPECT_NAMES, case_sensitive=False), help='Only find this aspect. Defaults to every aspect.')
+@click.option(
+    '--zodiac', default=Zodiac.TROPICAL.name, type=click.Choice(ZODIAC_NAMES, case_sensitive=False), show_default=True,
+    help=f'Zodiac system to use. Can be: {",".join(ZODIAC_NAMES)}'
+)
+@click.option('-n', '--limit', type=int, help='Stop after this many events.')
+@click.option('--json', 'as_json', default=False, is_flag=True, help='Print events as JSON lines')
+def search(
+    event: str,
+    planet: str,
+    start: datetime,
+    end: Optional[datetime],
+    sign: Optional[str],
+    other: Optional[str],
+    aspect: Optional[str],
+    zodiac: str,
+    limit: Optional[int],
+    as_json: bool,
+):
+    """Find the dates a planet enters a sign, turns retrograde or direct, or forms an exact aspect.
+
+    EVENT is one of INGRESS, STATION or ASPECT. Aspects need --other.
+    Dates are exact to the second, and printed in UTC as they are found.
+    """
+    event_type = getattr(EventType, event.upper())
+    if event_type == EventType.ASPECT and other is None:
+        raise click.BadParameter('Aspect searches need another planet', param_hint='--other')
+
+    start = start.astimezone(timezone.utc)
+    query = SearchQuery(
+        event=event_type,
+        planet=getattr(Planet, planet.upper()),
+        start=start,
+        end=start + timedelta(days=SEARCH_DAYS) if end is None else end.astimezone(timezone.utc),
+        zodiac=getattr(Zodiac, zodiac.upper()),
+        sign=None if sign is None else getattr(Sign, sign.upper()),
+        other=None if other is None else getattr(Planet, other.upper()),
+        aspect=None if aspect is None else getattr(Aspect, aspect.upper()),
+        limit=limit,
+    )
+
+    if not as_json:
+        print(format_event_row(['Date', 'Event', 'Planet', 'Longitude', 'Detail']))
+        print('=' * 28 + '=' * 20 * 4)
+    for found in search_events(query):
+        print(json.dumps(found.to_dict()) if as_json else format_event(found), flush=True)
+
+
+@main.command()
+@click.option('-k', '--filter', 'patterns', multiple=True, help='Only run benchmarks whose name contains this. Can be repeated.')
+@click.option('--min-rounds', type=int, default=BENCH_MIN_ROUNDS, show_default=True, help='Minimum rounds over the benchmark dates.')
+@click.option('--max-time', type=float, default=BENCH_MAX_TIME, show_default=True, help='Seconds to keep repeating rounds of each benchmark.')
+@click.option('--warmup/--no-warmup', default=True, is_flag=True, show_default=True, help='Run an untimed round first')
+@click.option('--memory/--no-memory', default=True, is_flag=True, show_default=True, help='Measure peak Python memory')
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), help='Save the JSON results to path. Defaults to stdout.')
+@click.option('--compare', type=click.Path(exists=True, dir_okay=False), help='JSON results of an earlier run to compare with.')
+@click.option('--list', 'list_only', default=False, is_flag=True, help='List the benchmarks and exit')
+def bench(
+    patterns: Tuple[str],
+    min_rounds: int,
+    max_time: float,
+    warmup: bool,
+    memory: bool,
+    output: str,
+    compare: str,
+    list_only: bool,
+):
+    """Benchmark horoscopes, chart layout and rendering on fixed dates.
+
+    A table of results is printed to stderr, and the JSON results can be saved to compare with later runs.
+    """
+    benchmarks = select_benchmarks(patterns)
+    if list_only:
+        for benchmark in benchmarks:
+            click.echo(benchmark.name)
+        return
+
+    base = dict()
+    if compare:
+        with open(compare) as f:
+            base = {result['name']: result for result in json.load(f)['benchmarks']}
+
+    dates = get_bench_dates()
+    results = []
+    click.echo(format_header(bool(base)), err=True)
+    for benchmark in benchmarks:
+        result = run_benchmark(benchmark, dates, min_rounds, max_time, warmup, memory)
+        results.append(result)
+        click.echo(format_result(result, base.get(result.name)), err=True)
 
-        for i, save_path in enumerate(save_img):
-            img_i = img
-            shift = 0
-            if (len(background_shift) > i):
-                shift = background_shift[i]
-            if len(background) > i:
-                img_i = render.overlay_image(background[i], shift)
-            img_i.save(save_path)
+    report = make_report(results, dates, min_rounds=min_rounds, max_time=max_time, warmup=warmup)
+    body = json.dumps(report, indent=2)
+    if output:
+        write_atomic(output, body.encode())
+    else:
+        click.echo(body)
 
 
 @main.command()
 @click.option('--debug/--no-debug', default=False, is_flag=True, show_default=True, help='Use debug features')
-def api(debug: bool):
+@click.option('--warmup/--no-warmup', default=True, is_flag=True, show_default=True, help='Warm up in the background, until /health/ready passes')
+def api(debug: bool, warmup: bool):
     """Run the backend API"""
+    # The debug reloader runs the app in a child process, so only warm up there
+    if warmup and (not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+        lifecycle.start_warmup()
     flask_app.run(debug=debug)
 
 
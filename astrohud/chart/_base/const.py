@@ -3,6 +3,9 @@
 MAX_RADIUS = 1500
 IMAGE_PAD = 150
 
+# Pixels a shape can drift from its rotated base shape and still be unchanged in a chart diff
+DIFF_TOLERANCE = 0.01
+
 COLOR_ALPHA = (255, 255, 255, 0)
 COLOR_BLACK = (0, 0, 0, 255)
 COLOR_WHITE = (255, 255, 255, 255)
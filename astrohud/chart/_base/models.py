@@ -2,13 +2,21 @@
 
 from abc import ABC
 from abc import abstractmethod
+from collections import defaultdict
+from contextlib import contextmanager
 from dataclasses import dataclass
+from itertools import islice
+from typing import Dict
+from typing import Iterator
 from typing import Set
 
 from PIL import Image
 from PIL import ImageDraw
 import numpy as np
 
+from astrohud.lib.math.models import OrderedSet
+from astrohud.lib.timing.models import timings
+
 from .const import COLOR_ALPHA
 from .const import IMAGE_PAD
 from .const import MAX_RADIUS
@@ -48,12 +56,34 @@ class BaseCoord:
 class BaseChart(ABC):
     """Abstract class for a chart type."""
     shapes: Set
+    shape_ids: Dict['BaseShape', str]
     width: float
+    center: XY
+    rotation: float  # Degrees the chart is turned clockwise around its center
 
     def __init__(self):
         """Constructor"""
-        self.shapes = set()
+        self.shapes = OrderedSet()
+        self.shape_ids = dict()
         self.width = (MAX_RADIUS + IMAGE_PAD) * 2 + 1
+        self.center = XY(MAX_RADIUS + IMAGE_PAD, MAX_RADIUS + IMAGE_PAD)
+        self.rotation = 0
+
+    @contextmanager
+    def shape_group(self, group: str) -> Iterator[None]:
+        """Give shapes added inside a stable id, from what they represent rather than where they are.
+
+        Ids are the group, the shape type, and the count of that type before it in the group,
+        like "planet:SUN/Line1". Shapes already in the chart keep their first id.
+        """
+        start = len(self.shapes)
+        yield
+        added = list(islice(reversed(self.shapes), len(self.shapes) - start))
+        counts = defaultdict(int)
+        for shape in reversed(added):
+            shape_type = type(shape).__name__
+            self.shape_ids[shape] = f'{group}/{shape_type}{counts[shape_type]}'
+            counts[shape_type] += 1
 
     @abstractmethod
     def convert_coord(coord: BaseCoord) -> XY:
@@ -77,6 +107,7 @@ class BaseRenderer(ABC):
         """Constructor"""
         self.chart = chart
 
+    @timings.timed('render')
     def draw_all(self):
         """Draw the whole chart"""
         for shape in self.chart.shapes:
@@ -4,7 +4,9 @@ from enum import Enum
 from typing import Any
 from typing import Dict
 from typing import List
+import math
 
+from astrohud.chart._base.const import DIFF_TOLERANCE
 from astrohud.chart._base.models import BaseCoord
 from astrohud.chart._base.models import BaseRenderer
 from astrohud.chart._base.models import BaseShape
@@ -21,6 +23,8 @@ class JsonRenderer(BaseRenderer):
         self.shapes = []
         self.json = dict(
             width=chart.width,
+            center=chart.center.array.tolist(),
+            rotation=chart.rotation,
             shapes=self.shapes,
         )
 
@@ -31,11 +35,12 @@ class JsonRenderer(BaseRenderer):
         shape_dict = dict(vars(shape))
         for key, value in shape_dict.items():
             if isinstance(value, BaseCoord):
-                shape_dict[key] = tuple(self.chart.convert_coord(value).array)
+                shape_dict[key] = self.chart.convert_coord(value).array.tolist()
             if isinstance(value, Enum):
                 shape_dict[key] = str(value)
 
         self.shapes.append(dict(
+            id=self.chart.shape_ids.get(shape),
             type=type(shape).__name__,
             **shape_dict,
         ))
@@ -43,3 +48,68 @@ class JsonRenderer(BaseRenderer):
 
     def finish(self):
         """Finish drawing"""
+
+
+
+def diff_charts(base: Dict[str, Any], chart: Dict[str, Any], tolerance: float = DIFF_TOLERANCE) -> Dict[str, Any]:
+    """Get the changes since a base chart, matched by shape id.
+
+    Wheel charts turn with the ascendant, so the base is turned by rotate degrees counterclockwise
+    around the center, except for the fixed shapes, such as the wheel circles, which stay in place.
+    Shapes within tolerance pixels of their base shape, turned or fixed, are unchanged.
+    Added and moved shapes are whole, so a moved shape replaces the base shape with its id.
+    """
+    rotate = (base['rotation'] - chart['rotation'] + 180) % 360 - 180
+    base_shapes = {shape['id']: shape for shape in base['shapes']}
+    shapes = {shape['id']: shape for shape in chart['shapes']}
+
+    fixed = []
+    moved = []
+    for shape_id, shape in shapes.items():
+        base_shape = base_shapes.get(shape_id)
+        if base_shape is None:
+            continue
+        if is_same_shape(shape, rotate_shape(base_shape, rotate, chart['center']), tolerance):
+            continue
+        if is_same_shape(shape, base_shape, tolerance):
+            fixed.append(shape_id)
+        else:
+            moved.append(shape)
+
+    return dict(
+        width=chart['width'],
+        center=chart['center'],
+        rotation=chart['rotation'],
+        rotate=rotate,
+        fixed=fixed,
+        added=[shape for shape_id, shape in shapes.items() if shape_id not in base_shapes],
+        removed=[shape_id for shape_id in base_shapes if shape_id not in shapes],
+        moved=moved,
+    )
+
+
+def rotate_shape(shape: Dict[str, Any], degrees: float, center: List[float]) -> Dict[str, Any]:
+    """Turn the points of a rendered shape counterclockwise around a center"""
+    if degrees == 0:
+        return shape
+
+    cos = math.cos(math.radians(degrees))
+    sin = math.sin(math.radians(degrees))
+    out = dict(shape)
+    for key, value in shape.items():
+        if isinstance(value, list):
+            dx, dy = value[0] - center[0], value[1] - center[1]
+            out[key] = [center[0] + dx * cos + dy * sin, center[1] + dy * cos - dx * sin]
+    return out
+
+
+def is_same_shape(shape: Dict[str, Any], other: Dict[str, Any], tolerance: float) -> bool:
+    """Check two rendered shapes are equal, with points within tolerance pixels"""
+    for key, value in shape.items():
+        other_value = other.get(key)
+        if isinstance(value, list) and isinstance(other_value, list):
+            if math.dist(value, other_value) > tolerance:
+                return False
+        elif value != other_value:
+            return False
+    return shape.keys() == other.keys()
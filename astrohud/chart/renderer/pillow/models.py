@@ -1,5 +1,8 @@
 """Pillow renderer"""
 
+from functools import lru_cache
+from functools import partial
+from io import BytesIO
 from typing import Optional
 from typing import Set
 from typing import Tuple
@@ -18,11 +21,14 @@ from astrohud.chart._base.models import BaseShape
 from astrohud.chart._base.models import XY
 from astrohud.chart.shapes.const import IMG_SIZE_BIG
 from astrohud.chart.shapes.const import IMG_SIZE_SMALL
+from astrohud.chart.shapes.models import IMG_FOLDER
 from astrohud.chart.shapes.models import Arc
 from astrohud.chart.shapes.models import Circle
 from astrohud.chart.shapes.models import Label
 from astrohud.chart.shapes.models import Line
+from astrohud.lib.datasets.models import Dataset
 from astrohud.lib.math.models import Angle
+from astrohud.lib.timing.models import timings
 
 
 FONT_FILE = os.path.join(os.path.dirname(__file__), '../../../assets/font/HackNerdFont-Regular.ttf')
@@ -30,6 +36,56 @@ BIG_FONT = ImageFont.truetype(FONT_FILE, size=96, encoding='unic')
 SMALL_FONT = ImageFont.truetype(FONT_FILE, size=48, encoding='unic')
 
 
+SYMBOL_FILES = sorted(filename for filename in os.listdir(IMG_FOLDER) if filename.endswith('.png'))
+SYMBOL_INDEX = {filename: i for i, filename in enumerate(SYMBOL_FILES)}
+
+
+def build_symbol_atlas(size: int) -> np.ndarray:
+    """Stack every symbol, resized, as RGBA pixels in the order of SYMBOL_FILES"""
+    atlas = np.empty((len(SYMBOL_FILES), size, size, 4), dtype=np.uint8)
+    for i, filename in enumerate(SYMBOL_FILES):
+        with Image.open(os.path.join(IMG_FOLDER, filename)) as img:
+            atlas[i] = np.asarray(img.convert('RGBA').resize((size, size)))
+    return atlas
+
+
+SYMBOL_DATASETS = {
+    size: Dataset(f'symbols-{size}', [os.path.join(IMG_FOLDER, f) for f in SYMBOL_FILES], partial(build_symbol_atlas, size))
+    for size in (IMG_SIZE_SMALL, IMG_SIZE_BIG)
+}
+
+
+@lru_cache(maxsize=None)
+def get_symbol(path: str, size: int) -> Image.Image:
+    """Get a symbol image, resized. Cached images are shared, and must not be modified.
+
+    Symbols from IMG_FOLDER are views of a shared dataset, so their pixels are not copied into each process.
+    """
+    directory, filename = os.path.split(path)
+    dataset = SYMBOL_DATASETS.get(size)
+    if dataset is not None and filename in SYMBOL_INDEX and os.path.normpath(directory) == os.path.normpath(IMG_FOLDER):
+        pixels = dataset.load()[SYMBOL_INDEX[filename]]
+        return Image.frombuffer('RGBA', (size, size), pixels, 'raw', 'RGBA', 0, 1)
+
+    with Image.open(path) as img:
+        return img.convert('RGBA').resize((size, size))
+
+
+def load_symbols():
+    """Preload every symbol in every size, so renders never read symbols from disk"""
+    for filename in SYMBOL_FILES:
+        for size in (IMG_SIZE_SMALL, IMG_SIZE_BIG):
+            get_symbol(os.path.join(IMG_FOLDER, filename), size)
+
+
+@timings.timed('encode')
+def encode_image(img: Image.Image, image_format: str = 'PNG') -> bytes:
+    """Encode an image in a Pillow image format"""
+    buffer = BytesIO()
+    img.save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
 class PillowRenderer(BaseRenderer):
     """Renderer using Pillow library"""
     img: Image
@@ -71,6 +127,10 @@ class PillowRenderer(BaseRenderer):
 
         img.alpha_composite(overlay, (x, y))
         return img
+
+    def encode(self, image_format: str = 'PNG') -> bytes:
+        """Encode the chart image in a Pillow image format"""
+        return encode_image(self.img, image_format)
     
     # Shape rendering
     
@@ -132,9 +192,7 @@ class PillowRenderer(BaseRenderer):
         """Get a symbol"""
         if not path:
             return None
-        img = Image.open(path)
-
-        return img.convert('RGBA').resize((size, size))
+        return get_symbol(path, size)
 
     def _get_pixels(self) -> Set[Tuple[int, int]]:
         """Get all non-alpha pixel locations"""
@@ -145,6 +203,7 @@ class PillowRenderer(BaseRenderer):
                 pixels.add(xy)
         return pixels
 
+    @timings.timed('outline')
     def _apply_outline(self) -> Image.Image:
         """Apply a black outline to any set pixels"""
         pixels = {xy: 0 for xy in self._get_pixels()}
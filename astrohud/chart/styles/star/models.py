@@ -66,18 +66,20 @@ class StarChart(BaseChart):
         """Draw the general wheel structure"""
 
         for segment, house in self.horoscope.houses.items():
-            for delta in [-0.1, 0.1]:
-                for dec in range(-90, 90, 5):
-                    ra = segment.a1.value + delta
-                    a = StarCoord(ra=ra, dec=dec)
-                    b = StarCoord(ra=ra, dec=dec + 5)
-                    self.shapes.add(Line(a, b))
+            with self.shape_group(f'house:{house.value}'):
+                for delta in [-0.1, 0.1]:
+                    for dec in range(-90, 90, 5):
+                        ra = segment.a1.value + delta
+                        a = StarCoord(ra=ra, dec=dec)
+                        b = StarCoord(ra=ra, dec=dec + 5)
+                        self.shapes.add(Line(a, b))
 
         signs = self.horoscope.sign_splitter.constellations.signs
         for sign, points in signs.items():
-            next_points = points[1:] + points[:1]
-            for p1, p2 in zip(points, next_points):
-                p2_closed = Angle(p2[0].value, p1[0].value)
-                a = StarCoord(ra=p1[0].value, dec=p1[1].value)
-                b = StarCoord(ra=p2_closed.value, dec=p2[1].value)
-                self.shapes.add(Line(a, b))
\ No newline at end of file
+            with self.shape_group(f'sign:{sign.name}'):
+                next_points = points[1:] + points[:1]
+                for p1, p2 in zip(points, next_points):
+                    p2_closed = Angle(p2[0].value, p1[0].value)
+                    a = StarCoord(ra=p1[0].value, dec=p1[1].value)
+                    b = StarCoord(ra=p2_closed.value, dec=p2[1].value)
+                    self.shapes.add(Line(a, b))
\ No newline at end of file
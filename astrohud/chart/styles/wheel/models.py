@@ -1,14 +1,16 @@
 """Models for Wheel chart"""
 
+from bisect import bisect_right
 from collections import defaultdict
 from dataclasses import dataclass
 from typing import Any
 from typing import Dict
 from typing import List
-from typing import Optional
 from typing import Tuple
 import math
 
+import numpy as np
+
 from astrohud.chart._base.const import IMAGE_PAD
 from astrohud.chart._base.const import MAX_RADIUS
 from astrohud.chart._base.models import BaseChart
@@ -23,9 +25,12 @@ from astrohud.lib.ephemeris.enums import Planet
 from astrohud.lib.ephemeris.enums import Sign
 from astrohud.lib.horoscope.enums import Aspect
 from astrohud.lib.horoscope.models import Horoscope
+from astrohud.lib.horoscope.models import PlanetTuple
 from astrohud.lib.math.models import Angle
 from astrohud.lib.math.models import AngleSegment
+from astrohud.lib.math.models import AngleSegmentArray
 from astrohud.lib.math.models import UnionFind
+from astrohud.lib.timing.models import timings
 
 from .enums import Collision
 
@@ -40,6 +45,7 @@ HOUSE_IN_RADIUS = MAX_RADIUS * 0.4
 
 PLANET_1_RADIUS = MAX_RADIUS * 0.7
 PLANET_2_RADIUS = MAX_RADIUS * 0.6
+PLANET_RADII = [PLANET_1_RADIUS, PLANET_2_RADIUS]
 TIP_1_RADIUS = MAX_RADIUS * 0.77
 TIP_2_RADIUS = MAX_RADIUS * 0.53
 TIP_RADIUS = MAX_RADIUS * 0.015
@@ -86,17 +92,22 @@ class WheelChart(BaseChart):
 
         self.asc_angle = horoscope.ascending.abs_angle
         self.mid_angle = horoscope.midheaven.abs_angle
+        self.rotation = self.asc_angle
         self.houses = horoscope.houses
         signs = list(horoscope.main_signs.items()) + list(horoscope.extra_signs.items())
         self.signs = [(i, tup[1], tup[0]) for i, tup in enumerate(signs)]
         self.main_signs = len(horoscope.main_signs)
         self.sign_collisions = defaultdict(CollisionState)
 
-        self._draw_structure()
-        self._draw_houses()
-        self._draw_ascmc()
-        self._draw_planets(horoscope)
-        self._draw_aspects(horoscope)
+        with timings.span('layout.structure'):
+            self._draw_structure()
+        with timings.span('layout.houses'):
+            self._draw_houses()
+            self._draw_ascmc()
+        with timings.span('layout.planets'):
+            self._draw_planets(horoscope)
+        with timings.span('layout.aspects'):
+            self._draw_aspects(horoscope)
     
     def convert_coord(self, coord: WheelCoord) -> XY:
         """Convert an ecliptic coordinate to chart XY."""
@@ -159,10 +170,11 @@ class WheelChart(BaseChart):
     def _draw_structure(self):
         """Draw the general wheel structure"""
 
-        self.shapes.add(Circle(center=WheelCoord(), edge=WheelCoord(rho=ZODIAC_OUT_RADIUS)))
-        self.shapes.add(Circle(center=WheelCoord(), edge=WheelCoord(rho=ZODIAC_IN_RADIUS)))
-        self.shapes.add(Circle(center=WheelCoord(), edge=WheelCoord(rho=HOUSE_OUT_RADIUS)))
-        self.shapes.add(Circle(center=WheelCoord(), edge=WheelCoord(rho=HOUSE_IN_RADIUS)))
+        with self.shape_group('wheel'):
+            self.shapes.add(Circle(center=WheelCoord(), edge=WheelCoord(rho=ZODIAC_OUT_RADIUS)))
+            self.shapes.add(Circle(center=WheelCoord(), edge=WheelCoord(rho=ZODIAC_IN_RADIUS)))
+            self.shapes.add(Circle(center=WheelCoord(), edge=WheelCoord(rho=HOUSE_OUT_RADIUS)))
+            self.shapes.add(Circle(center=WheelCoord(), edge=WheelCoord(rho=HOUSE_IN_RADIUS)))
 
         self._get_sign_collisions()
         
@@ -181,13 +193,15 @@ class WheelChart(BaseChart):
             c1_end = WheelCoord(rho=r_in_end, ra=phi2)
             c2_end = WheelCoord(rho=r_out_end, ra=phi2)
             
-            if self.sign_collisions[i].middle == Collision.OUTER:
-                self.shapes.add(Arc(c1_begin, c1_end, WheelCoord()))
+            group = f'sign:{sign.name}' if i < self.main_signs else f'extra_sign:{sign.name}'
+            with self.shape_group(group):
+                if self.sign_collisions[i].middle == Collision.OUTER:
+                    self.shapes.add(Arc(c1_begin, c1_end, WheelCoord()))
 
-            small = self.sign_collisions[i].middle != Collision.NONE
-            self._label_quad(c1_mid, c2_mid, label=sign, small=small)
-            self.shapes.add(Line(c1_begin, c2_begin))
-            self.shapes.add(Line(c1_end, c2_end))
+                small = self.sign_collisions[i].middle != Collision.NONE
+                self._label_quad(c1_mid, c2_mid, label=sign, small=small)
+                self.shapes.add(Line(c1_begin, c2_begin))
+                self.shapes.add(Line(c1_end, c2_end))
 
     def _draw_ascmc(self):
         """Draw ascending and midheaven points"""
@@ -203,8 +217,9 @@ class WheelChart(BaseChart):
             c2 = WheelCoord(rho=ZODIAC_OUT_RADIUS - TIP_RADIUS, ra=phi)
             c3 = WheelCoord(rho=ZODIAC_OUT_RADIUS - 2 * TIP_RADIUS, ra=phi)
 
-            self.shapes.add(Line(c1, c2))
-            self.shapes.add(Label(c3, label, small=True))
+            with self.shape_group(f'angle:{label}'):
+                self.shapes.add(Line(c1, c2))
+                self.shapes.add(Label(c3, label, small=True))
 
 
     def _draw_houses(self):
@@ -219,8 +234,9 @@ class WheelChart(BaseChart):
             c2 = WheelCoord(rho=HOUSE_OUT_RADIUS, ra=phi2)
             c4 = WheelCoord(rho=ZODIAC_IN_RADIUS, ra=phi)
 
-            self.shapes.add(Line(c1, c4))
-            self._label_quad(c1, c2, str(house.value))
+            with self.shape_group(f'house:{house.value}'):
+                self.shapes.add(Line(c1, c4))
+                self._label_quad(c1, c2, str(house.value))
 
     def _draw_tip(self, coord: WheelCoord, direction: float):
         """Draw a small planetary position tip"""
@@ -231,31 +247,104 @@ class WheelChart(BaseChart):
         )
         self.shapes.add(Line(coord, coord2))
 
-    def find_collision(self, phi: Angle, avoid: List[Angle]) -> Optional[Angle]:
-        for a in avoid:
-            if phi.distance(a) < NUDGE_ANGLE:
-                return a
-        return None
-
-    def nudge_coords(self, phi: Angle, avoid: List[Angle]) -> Angle:
-        a = self.find_collision(phi, avoid)
-        if a is None:
-            return phi
-        if a > phi:
-            return Angle(a.value - NUDGE_ANGLE)
-        return Angle(a.value + NUDGE_ANGLE)
+    def _space_ring(self, targets: List[float], separation: float, lo: float, hi: float) -> List[float]:
+        """Space sorted angles at least separation apart within [lo, hi], with the least squared displacement.
+
+        Solved as an isotonic regression with pool-adjacent-violators, so crowded
+        labels are spread evenly around the centre of their true positions.
+        The bounds are applied by clipping, which keeps the solution optimal.
+        The angles must fit, with hi - lo at least (len(targets) - 1) * separation.
+        """
+        blocks: List[List[float]] = []  # [total, count] of shifted targets
+        for k, target in enumerate(targets):
+            blocks.append([target - k * separation, 1])
+            while len(blocks) > 1 and blocks[-2][0] / blocks[-2][1] > blocks[-1][0] / blocks[-1][1]:
+                total, count = blocks.pop()
+                blocks[-1][0] += total
+                blocks[-1][1] += count
+
+        top = hi - (len(targets) - 1) * separation
+        shifted = [min(max(total / count, lo), top) for total, count in blocks for _ in range(int(count))]
+        return [y + k * separation for k, y in enumerate(shifted)]
+
+    def _get_label_segments(self, positions: List[float], cusps: List[float], separation: float) -> List[Tuple[float, float]]:
+        """Get the segments labels are kept in: between each sorted cusp, or else around the circle from the widest gap"""
+        if cusps:
+            return [(cusp, cusps[(i + 1) % len(cusps)] + (360 if i == len(cusps) - 1 else 0)) for i, cusp in enumerate(cusps)]
+
+        positions = sorted(positions)
+        gaps = [(positions[(i + 1) % len(positions)] - positions[i]) % 360 for i in range(len(positions))]
+        gaps[-1] = gaps[-1] or 360
+        widest = gaps.index(max(gaps))
+        cut = positions[widest] + gaps[widest] / 2
+        return [(cut, cut + 360)]
+
+    def _sweep_labels(
+        self,
+        angles: Dict[Any, float],
+        radii: List[float],
+        separation: float,
+        cusps: List[float],
+    ) -> Dict[Any, Tuple[float, float]]:
+        """Place labels on rings so neighbours on a ring are at least separation apart.
+
+        Labels stay between the sorted cusps around their angle, at least separation from them,
+        so each segment is a straight line and rings never wrap onto themselves. Without cusps,
+        the circle is cut in the middle of the widest gap. In each segment, labels are swept in
+        angular order and take the first ring with room, otherwise the ring that frees up first.
+        Each ring is then respaced around the true positions. A ring with too many labels for
+        the segment comes up to half a separation from the cusps, then is spread evenly.
+        Returns (angle, radius) for each label.
+        """
+        if not angles:
+            return dict()
+
+        positions = {key: Angle(angle).positive_value() for key, angle in angles.items()}
+        segments = self._get_label_segments(list(positions.values()), cusps, separation)
+        members: List[List[Tuple[float, Any]]] = [[] for _ in segments]
+        for key, position in positions.items():
+            index = bisect_right(cusps, position) - 1 if cusps else 0
+            start = segments[index][0]
+            members[index].append((start + (position - start) % 360, key))
+
+        placed = dict()
+        margins = [separation, separation / 2] if cusps else [separation / 2]
+        for (start, end), items in zip(segments, members):
+            rings: List[List[Tuple[Any, float]]] = [[] for _ in radii]
+            last = [-math.inf] * len(radii)
+            for position, key in sorted(items, key=lambda item: item[0]):
+                ring = next((r for r in range(len(radii)) if position - last[r] >= separation), None)
+                if ring is None:
+                    ring = last.index(min(last))
+                    last[ring] += separation
+                else:
+                    last[ring] = position
+                rings[ring].append((key, position))
+
+            for radius, ring in zip(radii, rings):
+                targets = [position for _, position in ring]
+                for margin in margins:
+                    if end - start - 2 * margin >= (len(targets) - 1) * separation:
+                        spaced = self._space_ring(targets, separation, start + margin, end - margin)
+                        break
+                else:
+                    step = (end - start) / len(targets) if targets else 0
+                    spaced = [start + (k + 0.5) * step for k in range(len(targets))]
+                for (key, _), position in zip(ring, spaced):
+                    placed[key] = (position, radius)
+        return placed
 
     def _draw_planets(self, horoscope: Horoscope):
         """Draw planets to the chart"""
 
-        placed_planets: List[Angle] = []
-        avoid = [seg.a1 for seg in self.houses]
+        cusps = sorted(seg.a1.positive_value() for seg in self.houses)
+        angles = {planet: horo.position.abs_angle for planet, horo in horoscope.planets.items()}
+        placements = self._sweep_labels(angles, PLANET_RADII, NUDGE_ANGLE, cusps)
+
         for planet, horo in horoscope.planets.items():
             phi = horo.position.abs_angle - self.asc_angle
-            nudge_phi = self.nudge_coords(Angle(horo.position.abs_angle), avoid).value - self.asc_angle
-            planet_radius = PLANET_1_RADIUS
-            if self.find_collision(Angle(nudge_phi), placed_planets):
-                planet_radius = PLANET_2_RADIUS
+            label_ra, planet_radius = placements[planet]
+            nudge_phi = label_ra - self.asc_angle
 
             signs = [i for i, s, _ in self.signs if s == horo.position.sign]
             sign_index = signs[0]
@@ -268,11 +357,11 @@ class WheelChart(BaseChart):
             c3 = WheelCoord(rho=HOUSE_OUT_RADIUS, ra=phi)
             c4 = WheelCoord(rho=in_radius, ra=phi)
             
-            self.shapes.add(Label(c1, planet))
-            self._draw_tip(c2, 1)
-            self._draw_tip(c3, -1)
-            self._draw_tip(c4, 1)
-            placed_planets.append(Angle(nudge_phi))
+            with self.shape_group(f'planet:{planet.name}'):
+                self.shapes.add(Label(c1, planet))
+                self._draw_tip(c2, 1)
+                self._draw_tip(c3, -1)
+                self._draw_tip(c4, 1)
 
     def _merge_conjunctions(self, horoscope: Horoscope) -> Dict[Planet, float]:
         """Merge aspects for conjunction planets"""
@@ -310,8 +399,9 @@ class WheelChart(BaseChart):
             c3 = WheelCoord(rho=HOUSE_IN_RADIUS + 8, ra=a1)
             c4 = WheelCoord(rho=HOUSE_IN_RADIUS + 8, ra=a2)
 
-            self.shapes.add(Circle(c1, c2, fill=True))
-            self.shapes.add(Arc(c3, c4, center=WheelCoord()))
+            with self.shape_group(f'aspect:{planets}'):
+                self.shapes.add(Circle(c1, c2, fill=True))
+                self.shapes.add(Arc(c3, c4, center=WheelCoord()))
 
 
 class ClassicWheelChart(WheelChart):
@@ -334,7 +424,8 @@ class ClassicWheelChart(WheelChart):
             c1 = WheelCoord(rho=HOUSE_IN_RADIUS, ra=a1)
             c2 = WheelCoord(rho=HOUSE_IN_RADIUS, ra=a2)
             
-            self.shapes.add(Line(c1, c2))
+            with self.shape_group(f'aspect:{planets}'):
+                self.shapes.add(Line(c1, c2))
 
 
 class ModernWheelChart(WheelChart):
@@ -363,56 +454,77 @@ class ModernWheelChart(WheelChart):
         elif aspect == Aspect.OPPOSITION:
             self.shapes.add(Arc(b, c, a))
 
-    def _get_aspect_arcs(self, positions: Dict[Planet, float], horoscope: Horoscope) -> Tuple[List[AngleSegment], List[Aspect]]:
-        """Get arcs for all aspects"""
+    def _get_aspect_arcs(self, positions: Dict[Planet, float], horoscope: Horoscope) -> Tuple[List[AngleSegment], List[Aspect], List[PlanetTuple]]:
+        """Get arcs for all aspects, with the planets of each"""
 
         arcs = list()
         aspects = list()
+        pairs = list()
+        seen = set()
         for planets, aspect in horoscope.aspects.items():
             a1 = positions[planets.planet1]
             a2 = positions[planets.planet2]
 
             if aspect.aspect != Aspect.CONJUNCTION:
                 arc = AngleSegment(a1, a2)
-                if arc not in arcs:
+                if arc not in seen:
+                    seen.add(arc)
                     arcs.append(arc)
                     aspects.append(aspect.aspect)
-        return arcs, aspects
+                    pairs.append(planets)
+        return arcs, aspects, pairs
 
-    def _get_arc_groups(self, arcs: List[AngleSegment], collision_matrix: List[List[bool]]) -> List[List[int]]:
+    def _get_collision_matrix(self, arcs: AngleSegmentArray) -> np.ndarray:
+        """Get a matrix where [i, j] is True if arc j collides with arc i"""
+
+        return arcs.check_collision(arcs[:, np.newaxis], limit=COLLISION_ANGLE)
+
+    def _get_arc_groups(self, arcs: List[AngleSegment], collision_matrix: np.ndarray) -> List[List[int]]:
         """Create groups for arcs so they don't collide"""
 
         arc_order = sorted(list(range(len(arcs))), key=lambda i: arcs[i].length())
+        levels = np.full(len(arcs), -1)
         arc_groups: List[List[int]] = [[]]
         for i in arc_order:
-            level = 0
-            while sum([collision_matrix[i][j] for j in arc_groups[level]]) > 0:
-                level += 1
-                if level >= len(arc_groups):
-                    arc_groups.append([])
-
+            # First level without a colliding arc
+            used = np.zeros(len(arc_groups) + 1, dtype=bool)
+            used[levels[collision_matrix[i] & (levels >= 0)]] = True
+            level = int(np.argmin(used))
+            if level >= len(arc_groups):
+                arc_groups.append([])
+
+            levels[i] = level
             arc_groups[level].append(i)
         return arc_groups
 
-    def _get_arc_bridged_segments(self, arcs: List[AngleSegment], collision_matrix: List[List[bool]], arc_groups: List[List[int]]) -> Dict[Angle, List[int]]:
+    def _get_arc_bridged_segments(self, arcs: List[AngleSegment], collision_matrix: np.ndarray, arc_groups: List[List[int]]) -> Dict[Angle, List[int]]:
         """Find crossovers in arcs"""
 
-        segments: Dict[Angle, List[int]] = defaultdict(list)
+        levels = np.zeros(len(arcs), dtype=int)
         for level, group in enumerate(arc_groups):
-            for i in group:
-                for level2 in range(level):
-                    for j in arc_groups[level2]:
-                        if collision_matrix[i][j]:
-                            for spoke in arcs[i]:
-                                if spoke.distance(arcs[j].a1) < 0.1:
-                                    continue
-                                if spoke.distance(arcs[j].a2) < 0.1:
-                                    continue
-                                if arcs[j].check_collision(spoke, limit=COLLISION_ANGLE):
-                                    segments[spoke].append(level2 + 1)
+            levels[group] = level
+
+        arc_array = AngleSegmentArray.from_segments(arcs)
+        # [i, j] is True if arc i collides with arc j on a lower level
+        lower = collision_matrix & (levels[np.newaxis, :] < levels[:, np.newaxis])
+
+        segments: Dict[Angle, List[int]] = defaultdict(list)
+        for side, spokes in enumerate((arc_array.a1, arc_array.a2)):
+            spokes = spokes[:, np.newaxis]
+            shared = (spokes.distance(arc_array.a1) < 0.1) | (spokes.distance(arc_array.a2) < 0.1)
+            crossed = lower & ~shared & arc_array.check_collision(spokes, limit=COLLISION_ANGLE)
+
+            # Only the distinct bridged levels per spoke matter
+            rows, cols = np.nonzero(crossed)
+            keys = np.unique(rows * len(arc_groups) + levels[cols])
+            arc_ids, bridged = np.divmod(keys, len(arc_groups))
+            starts = np.flatnonzero(np.diff(arc_ids, prepend=-1))
+            for i, arc_levels in zip(arc_ids[starts], np.split(bridged + 1, starts[1:])):
+                spoke = arcs[i].a1 if side == 0 else arcs[i].a2
+                segments[spoke].extend(arc_levels.tolist())
         return segments
 
-    def _draw_arc_aspects(self, arcs: List[AngleSegment], arc_groups: List[List[int]], aspects: List[Aspect], segments: Dict[Angle, List[int]]):
+    def _draw_arc_aspects(self, arcs: List[AngleSegment], arc_groups: List[List[int]], aspects: List[Aspect], pairs: List[PlanetTuple], segments: Dict[Angle, List[int]]):
         """Draw arcs for aspects"""
 
         radius = HOUSE_IN_RADIUS
@@ -422,34 +534,35 @@ class ModernWheelChart(WheelChart):
             radius -= step_radius
             radii += [radius]
             for i in group:
-                phi2, phi1 = arcs[i].a1.value, arcs[i].a2.value
-
-                c1 = WheelCoord(rho=radius, ra=phi1)
-                c2 = WheelCoord(rho=radius, ra=phi2)
-                c3 = WheelCoord(rho=radius + BUBBLE_RADIUS, ra=phi1)
-                c4 = WheelCoord(rho=radius + BUBBLE_RADIUS, ra=phi2)
-
-                self.shapes.add(Arc(c1, c2, WheelCoord()))
-                self.shapes.add(Circle(c1, c3))
-                self.shapes.add(Circle(c2, c4))
-                self._draw_aspect_tip(c1, aspects[i], -1)
-                self._draw_aspect_tip(c2, aspects[i], 1)
-
-                for angle in arcs[i]:
-                    parts = [0] + sorted(set(segments[angle])) + [-1]
-                    for l1, l2 in zip(parts[:-1], parts[1:]):
-                        if l2 >= len(radii):
-                            break
-                        r1 = radii[l1]
-                        r2 = radii[l2]
-                        if r1 != HOUSE_IN_RADIUS:
-                            r1 -= min(BRIDGE_RADIUS, step_radius / 4)
-                        if r2 != radius:
-                            r2 += min(BRIDGE_RADIUS, step_radius / 4)
-
-                        c3 = WheelCoord(rho=r1, ra=angle.value)
-                        c4 = WheelCoord(rho=r2, ra=angle.value)
-                        self.shapes.add(Line(c3, c4))
+                with self.shape_group(f'aspect:{pairs[i]}'):
+                    phi2, phi1 = arcs[i].a1.value, arcs[i].a2.value
+
+                    c1 = WheelCoord(rho=radius, ra=phi1)
+                    c2 = WheelCoord(rho=radius, ra=phi2)
+                    c3 = WheelCoord(rho=radius + BUBBLE_RADIUS, ra=phi1)
+                    c4 = WheelCoord(rho=radius + BUBBLE_RADIUS, ra=phi2)
+
+                    self.shapes.add(Arc(c1, c2, WheelCoord()))
+                    self.shapes.add(Circle(c1, c3))
+                    self.shapes.add(Circle(c2, c4))
+                    self._draw_aspect_tip(c1, aspects[i], -1)
+                    self._draw_aspect_tip(c2, aspects[i], 1)
+
+                    for angle in arcs[i]:
+                        parts = [0] + sorted(set(segments[angle])) + [-1]
+                        for l1, l2 in zip(parts[:-1], parts[1:]):
+                            if l2 >= len(radii):
+                                break
+                            r1 = radii[l1]
+                            r2 = radii[l2]
+                            if r1 != HOUSE_IN_RADIUS:
+                                r1 -= min(BRIDGE_RADIUS, step_radius / 4)
+                            if r2 != radius:
+                                r2 += min(BRIDGE_RADIUS, step_radius / 4)
+
+                            c3 = WheelCoord(rho=r1, ra=angle.value)
+                            c4 = WheelCoord(rho=r2, ra=angle.value)
+                            self.shapes.add(Line(c3, c4))
 
     def _draw_aspects(self, horoscope: Horoscope):
         """Draw all aspects with non-crossing arcs"""
@@ -457,10 +570,10 @@ class ModernWheelChart(WheelChart):
         super()._draw_aspects(horoscope)
 
         positions = self._merge_conjunctions(horoscope)    
-        arcs, aspects = self._get_aspect_arcs(positions, horoscope)
+        arcs, aspects, pairs = self._get_aspect_arcs(positions, horoscope)
 
-        collision_matrix = [[a1.check_collision(a2, limit=COLLISION_ANGLE) for a1 in arcs] for a2 in arcs]
+        collision_matrix = self._get_collision_matrix(AngleSegmentArray.from_segments(arcs))
         arc_groups = self._get_arc_groups(arcs, collision_matrix)
 
         segments = self._get_arc_bridged_segments(arcs, collision_matrix, arc_groups)
-        self._draw_arc_aspects(arcs, arc_groups, aspects, segments)
\ No newline at end of file
+        self._draw_arc_aspects(arcs, arc_groups, aspects, pairs, segments)
\ No newline at end of file
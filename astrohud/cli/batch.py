@@ -0,0 +1,185 @@
+"""Render many charts to files with a pool of worker processes"""
+
+from collections import defaultdict
+from concurrent.futures import as_completed
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+import csv
+import json
+import os
+import time
+
+from astrohud.lib.ephemeris.models import EpheDate
+from astrohud.restapi._base.models import WorkerPool
+from astrohud.restapi.horo.const import IMAGE_FORMATS
+from astrohud.restapi.horo.models import ChartRequest
+from astrohud.restapi.horo.models import init_render_worker
+
+from .const import BATCH_CHUNK_SIZE
+from .const import BATCH_FIELDS
+from .const import PROGRESS_INTERVAL
+from .util import write_atomic
+
+
+@dataclass(frozen=True)
+class BatchItem:
+    """A chart to render, and the name of its output files"""
+    index: int
+    name: str
+    chart_request: ChartRequest
+
+    def get_path(self, output_dir: str, extension: str) -> str:
+        """Get the path of an output file"""
+        return os.path.join(output_dir, f'{self.name}.{extension}')
+
+
+@dataclass
+class BatchStats:
+    """Progress of a batch"""
+    total: int = 0
+    skipped: int = 0
+    done: int = 0
+    failed: int = 0
+    errors: Dict[int, str] = field(default_factory=dict)
+    start: float = field(default_factory=time.perf_counter)
+
+    def get_rate(self) -> float:
+        """Get the charts rendered per second"""
+        return self.done / max(time.perf_counter() - self.start, 1e-9)
+
+    def summary(self) -> str:
+        """Get a progress line"""
+        finished = self.skipped + self.done + self.failed
+        return (
+            f'{finished}/{self.total} charts: {self.done} rendered, {self.skipped} skipped, {self.failed} failed, '
+            f'{self.get_rate():.1f} charts/s'
+        )
+
+
+def read_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """Read input rows from a CSV file with a header, or a JSON object per line. Empty CSV cells are missing."""
+    with open(path, newline='') as f:
+        if path.lower().endswith('.csv'):
+            for row in csv.DictReader(f):
+                yield {key: value for key, value in row.items() if value not in (None, '')}
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def parse_item(index: int, row: Dict[str, Any], defaults: Dict[str, Any]) -> BatchItem:
+    """Get a batch item from an input row, with the defaults for missing fields.
+
+    Output files are named by the name field, or the row number.
+    """
+    payload = dict(defaults, **{key: row[key] for key in BATCH_FIELDS if key in row})
+    if 'date' not in payload:
+        raise ValueError('Missing date')
+
+    name = str(row.get('name') or f'{index:06d}')
+    if os.path.basename(name) != name or name.startswith('.'):
+        raise ValueError(f'Invalid name: {name}')
+    return BatchItem(index=index, name=name, chart_request=ChartRequest.from_payload(**payload, quantum=0))
+
+
+def render_chunk(items: List[BatchItem], output_dir: str, extension: Optional[str], write_json: bool) -> List[Tuple[int, Optional[str]]]:
+    """Render items sharing horoscope settings in date order, in a worker process, and write their files.
+
+    Each horoscope is advanced from the previous one. Get the index of each item, with an error or None.
+    """
+    results = []
+    horo = None
+    horo_date = None
+    for item in items:
+        chart_request = item.chart_request
+        try:
+            if horo is None:
+                horo = chart_request.get_horoscope()
+            elif chart_request.date != horo_date:
+                horo = horo.advance_to(EpheDate(chart_request.date), tolerance=0)
+            horo_date = chart_request.date
+
+            if extension is not None:
+                image_format, _ = IMAGE_FORMATS[extension]
+                write_atomic(item.get_path(output_dir, extension), chart_request.render(image_format, horo))
+            if write_json:
+                write_atomic(item.get_path(output_dir, 'json'), chart_request.encode(horo))
+        except Exception as error:
+            horo = None
+            results.append((item.index, str(error)))
+        else:
+            results.append((item.index, None))
+    return results
+
+
+def run_batch(
+    input_path: str,
+    output_dir: str,
+    defaults: Dict[str, Any],
+    extension: Optional[str] = 'png',
+    write_json: bool = True,
+    workers: int = 1,
+    chunk_size: int = BATCH_CHUNK_SIZE,
+    echo: Callable[[str], None] = print,
+) -> BatchStats:
+    """Render every chart of an input file to an output directory.
+
+    Charts whose files all exist are skipped, so an interrupted batch resumes where it stopped.
+    Files are written atomically, so a partial file is never mistaken for a finished one.
+    Charts are grouped by horoscope settings and sorted by date, then rendered in chunks by warm workers.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    extensions = ([extension] if extension is not None else []) + (['json'] if write_json else [])
+
+    stats = BatchStats()
+    groups = defaultdict(list)
+    for index, row in enumerate(read_rows(input_path)):
+        stats.total += 1
+        try:
+            item = parse_item(index, row, defaults)
+        except (AttributeError, KeyError, TypeError, ValueError) as error:
+            stats.failed += 1
+            stats.errors[index] = f'Invalid row: {error}'
+            continue
+
+        if all(os.path.exists(item.get_path(output_dir, ext)) for ext in extensions):
+            stats.skipped += 1
+            continue
+        groups[item.chart_request.horo_key()].append(item)
+
+    pool = WorkerPool(workers, initializer=init_render_worker)
+    try:
+        pool.start()
+        echo(f'Started {workers} workers in {time.perf_counter() - stats.start:.1f}s')
+        stats.start = time.perf_counter()
+
+        futures = []
+        for group in groups.values():
+            group.sort(key=lambda item: item.chart_request.date)
+            for start in range(0, len(group), chunk_size):
+                futures.append(pool.submit(render_chunk, group[start:start + chunk_size], output_dir, extension, write_json))
+
+        last_echo = time.perf_counter()
+        for future in as_completed(futures):
+            for index, error in future.result():
+                if error is None:
+                    stats.done += 1
+                else:
+                    stats.failed += 1
+                    stats.errors[index] = error
+
+            if time.perf_counter() - last_echo >= PROGRESS_INTERVAL:
+                last_echo = time.perf_counter()
+                echo(stats.summary())
+    finally:
+        pool.shutdown()
+
+    return stats
@@ -0,0 +1,260 @@
+"""Benchmarks for horoscopes, chart layout and rendering, on fixed dates"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from datetime import timezone
+from functools import partial
+from importlib.metadata import PackageNotFoundError
+from importlib.metadata import version
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+import gc
+import platform
+import statistics
+import time
+import tracemalloc
+
+import numpy as np
+import PIL
+
+from astrohud.chart.renderer.json.models import JsonRenderer
+from astrohud.chart.renderer.pillow.models import PillowRenderer
+from astrohud.chart.styles.const import CHART_STYLE_CLASSES
+from astrohud.chart.styles.const import CHART_STYLE_DESCRIPTIONS
+from astrohud.lib.constellations.models import SignSplitter
+from astrohud.lib.ephemeris.enums import Zodiac
+from astrohud.lib.ephemeris.models import EpheDate
+from astrohud.lib.ephemeris.models import EpheSettings
+from astrohud.lib.horoscope.models import Horoscope
+
+from .const import BENCH_DATES
+from .const import BENCH_FORMAT_VERSION
+from .const import BENCH_HOUSE_SYS
+from .const import BENCH_LOCATION
+from .const import BENCH_MAX_TIME
+from .const import BENCH_MIN_ROUNDS
+from .const import BENCH_ORB_LIMIT
+
+
+@dataclass(frozen=True)
+class Benchmark:
+    """A function timed once per date.
+
+    Setup is untimed, and gets the date to return the function to time.
+    """
+    name: str
+    setup: Callable[[datetime], Callable[[], Any]]
+
+
+@dataclass
+class BenchResult:
+    """Latencies of a benchmark, in seconds, and its peak Python memory in bytes"""
+    name: str
+    latencies: List[float]
+    peak_memory: Optional[int] = None
+
+    def get_median(self) -> float:
+        """Get the median latency"""
+        return statistics.median(self.latencies)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get builtin values"""
+        mean = statistics.fmean(self.latencies)
+        return dict(
+            name=self.name,
+            calls=len(self.latencies),
+            latency=dict(
+                min=min(self.latencies),
+                median=self.get_median(),
+                mean=mean,
+                stdev=statistics.stdev(self.latencies) if len(self.latencies) > 1 else 0.0,
+                max=max(self.latencies),
+            ),
+            throughput=1 / mean if mean > 0 else None,
+            peak_memory=self.peak_memory,
+        )
+
+
+def get_settings(zodiac: Zodiac = Zodiac.TROPICAL) -> EpheSettings:
+    """Get the benchmark settings, which match the CLI defaults"""
+    return EpheSettings(
+        orb_limit=BENCH_ORB_LIMIT,
+        conjunction_limit=BENCH_ORB_LIMIT,
+        location=BENCH_LOCATION,
+        zodiac=zodiac,
+        house_sys=bytes(BENCH_HOUSE_SYS, 'latin1'),
+    )
+
+
+def get_horoscope(date: datetime, zodiac: Zodiac = Zodiac.TROPICAL) -> Horoscope:
+    """Compute a benchmark horoscope"""
+    return Horoscope(ed=EpheDate(date), settings=get_settings(zodiac))
+
+
+def setup_horoscope(zodiac: Zodiac, date: datetime) -> Callable[[], Any]:
+    """Time the ephemeris and horoscope, with cached sign splitters"""
+    settings = get_settings(zodiac)
+    return lambda: Horoscope(ed=EpheDate(date), settings=settings)
+
+
+def setup_sign_splitter(zodiac: Zodiac, date: datetime) -> Callable[[], Any]:
+    """Time building a sign splitter, bypassing the cache"""
+    obliquity = EpheDate(date).obliquity
+    return lambda: SignSplitter(obliquity, zodiac)
+
+
+def setup_layout(style: str, date: datetime) -> Callable[[], Any]:
+    """Time laying out the chart shapes"""
+    horo = get_horoscope(date)
+    return lambda: CHART_STYLE_CLASSES[style](horo)
+
+
+def setup_json(style: str, date: datetime) -> Callable[[], Any]:
+    """Time rendering the chart shapes to JSON"""
+    chart = CHART_STYLE_CLASSES[style](get_horoscope(date))
+    return lambda: JsonRenderer(chart).draw_all()
+
+
+def setup_pillow(style: str, date: datetime) -> Callable[[], Any]:
+    """Time drawing the chart image, including its outline"""
+    chart = CHART_STYLE_CLASSES[style](get_horoscope(date))
+    return lambda: PillowRenderer(chart).draw_all()
+
+
+def setup_outline(style: str, date: datetime) -> Callable[[], Any]:
+    """Time outlining a chart image with its shapes drawn"""
+    render = PillowRenderer(CHART_STYLE_CLASSES[style](get_horoscope(date)))
+    for shape in render.chart.shapes:
+        render.draw_shape(shape)
+    return render._apply_outline
+
+
+def setup_png(style: str, date: datetime) -> Callable[[], Any]:
+    """Time encoding a drawn chart image as PNG"""
+    render = PillowRenderer(CHART_STYLE_CLASSES[style](get_horoscope(date)))
+    render.draw_all()
+    return lambda: render.encode('PNG')
+
+
+def get_benchmarks() -> List[Benchmark]:
+    """Get every benchmark, for each zodiac or published chart style"""
+    benchmarks = []
+    for zodiac in Zodiac:
+        benchmarks.append(Benchmark(f'horoscope[{zodiac.name}]', partial(setup_horoscope, zodiac)))
+    for zodiac in Zodiac:
+        benchmarks.append(Benchmark(f'sign_splitter[{zodiac.name}]', partial(setup_sign_splitter, zodiac)))
+    for style in CHART_STYLE_DESCRIPTIONS:
+        benchmarks.append(Benchmark(f'layout[{style}]', partial(setup_layout, style)))
+        benchmarks.append(Benchmark(f'json[{style}]', partial(setup_json, style)))
+        benchmarks.append(Benchmark(f'pillow[{style}]', partial(setup_pillow, style)))
+        benchmarks.append(Benchmark(f'outline[{style}]', partial(setup_outline, style)))
+        benchmarks.append(Benchmark(f'png[{style}]', partial(setup_png, style)))
+    return benchmarks
+
+
+def select_benchmarks(patterns: Iterable[str]) -> List[Benchmark]:
+    """Get the benchmarks whose name contains any of the patterns, or all of them if there are none"""
+    patterns = list(patterns)
+    return [
+        benchmark for benchmark in get_benchmarks()
+        if not patterns or any(pattern in benchmark.name for pattern in patterns)
+    ]
+
+
+def measure_peak_memory(func: Callable[[], Any]) -> int:
+    """Get the peak Python memory allocated during a call, in bytes"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run_benchmark(
+    benchmark: Benchmark,
+    dates: List[datetime],
+    min_rounds: int = BENCH_MIN_ROUNDS,
+    max_time: float = BENCH_MAX_TIME,
+    warmup: bool = True,
+    memory: bool = True,
+) -> BenchResult:
+    """Time a benchmark in rounds over the dates, until it ran min_rounds and max_time seconds passed.
+
+    Warmup runs one untimed round first, so caches are filled as in a long-running process.
+    Peak memory is measured on a separate call for the first date, since tracing slows every allocation.
+    """
+    if warmup:
+        for date in dates:
+            benchmark.setup(date)()
+
+    latencies = []
+    rounds = 0
+    start = time.perf_counter()
+    while rounds < min_rounds or time.perf_counter() - start < max_time:
+        for date in dates:
+            func = benchmark.setup(date)
+            call_start = time.perf_counter()
+            func()
+            latencies.append(time.perf_counter() - call_start)
+        rounds += 1
+
+    peak_memory = measure_peak_memory(benchmark.setup(dates[0])) if memory else None
+    return BenchResult(benchmark.name, latencies, peak_memory)
+
+
+def get_version() -> Optional[str]:
+    """Get the installed astrohud version, if any"""
+    try:
+        return version('astrohud')
+    except PackageNotFoundError:
+        return None
+
+
+def make_report(results: List[BenchResult], dates: List[datetime], **options: Any) -> Dict[str, Any]:
+    """Get the JSON report of a run, with the environment and options needed to compare it"""
+    return dict(
+        format=BENCH_FORMAT_VERSION,
+        created=datetime.now(timezone.utc).isoformat(),
+        environment=dict(
+            astrohud=get_version(),
+            python=platform.python_version(),
+            numpy=np.__version__,
+            pillow=PIL.__version__,
+            platform=platform.platform(),
+        ),
+        dates=[date.isoformat() for date in dates],
+        options=options,
+        benchmarks=[result.to_dict() for result in results],
+    )
+
+
+def get_bench_dates() -> List[datetime]:
+    """Get the fixed benchmark dates"""
+    return [datetime.fromisoformat(date) for date in BENCH_DATES]
+
+
+def format_header(compare: bool) -> str:
+    """Get the header of the results table"""
+    header = f'{"Benchmark":<28}{"Calls":>6}{"Median ms":>12}{"Mean ms":>12}{"Calls/s":>10}{"Peak KiB":>10}'
+    if compare:
+        header += f'{"Median vs base":>16}'
+    return header
+
+
+def format_result(result: BenchResult, base: Optional[Dict[str, Any]] = None) -> str:
+    """Get a row of the results table, with the median relative to a base result if any"""
+    data = result.to_dict()
+    latency = data['latency']
+    peak = '' if result.peak_memory is None else f'{result.peak_memory / 1024:.0f}'
+    line = f'{result.name:<28}{data["calls"]:>6}{latency["median"] * 1e3:>12.2f}{latency["mean"] * 1e3:>12.2f}'
+    line += f'{data["throughput"] or 0:>10.1f}{peak:>10}'
+    if base is not None:
+        line += f'{latency["median"] / base["latency"]["median"]:>15.2f}x'
+    return line
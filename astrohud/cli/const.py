@@ -0,0 +1,48 @@
+"""Constants for CLI commands"""
+
+
+# Charts rendered by a worker per task. Charts in a chunk share horoscope settings.
+BATCH_CHUNK_SIZE = 32
+
+# Seconds between progress lines
+PROGRESS_INTERVAL = 2.0
+
+# Fields a batch input row can set, overriding the command options
+BATCH_FIELDS = ('date', 'latitude', 'longitude', 'orb_limit', 'conjunction_limit', 'zodiac', 'house_sys', 'style')
+
+# Fixed benchmark dates, matching the sample charts, and settings matching the CLI defaults
+BENCH_DATES = ('2021-07-26T12:00:00+00:00', '2021-08-12T21:00:00+00:00', '2024-10-15T03:00:00+00:00')
+BENCH_LOCATION = (38.5616433, -121.6265455)
+BENCH_ORB_LIMIT = 2
+BENCH_HOUSE_SYS = 'W'
+
+# Each benchmark runs at least this many rounds over the dates, and more until the time budget in seconds is spent
+BENCH_MIN_ROUNDS = 1
+BENCH_MAX_TIME = 2.0
+
+# Version of the benchmark JSON output, bumped when benchmarks or fields change
+BENCH_FORMAT_VERSION = 1
+
+# Rows of the profile table, with the timing stages each one adds up, and the row whose stages contain them if any
+PROFILE_STAGES = (
+    ('ephemeris', ('planets',), None),
+    ('splitters', ('sign_splitter', 'house_splitter'), None),
+    ('aspects', ('aspects',), None),
+    ('layout', ('layout',), None),
+    ('draw', ('render',), None),
+    ('outline', ('outline',), 'draw'),
+    ('encode', ('encode',), None),
+    ('save', ('save',), None),
+)
+
+# Stack frames kept for each allocation in tracemalloc snapshots
+PROFILE_TRACEMALLOC_FRAMES = 25
+
+# Ephemeris export formats, by file extension
+EXPORT_FORMATS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+}
+
+# Days searched from the start date when no end date is given
+SEARCH_DAYS = 100 * 365.25
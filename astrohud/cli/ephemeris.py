@@ -0,0 +1,61 @@
+"""Export planet positions to CSV or Parquet files"""
+
+from typing import BinaryIO
+import os
+import sys
+
+from astrohud.lib.series.models import PositionSeries
+from astrohud.lib.series.models import encode_csv
+
+from .const import EXPORT_FORMATS
+from .util import open_atomic
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+def get_export_format(path: str) -> str:
+    """Get the export format for a path's extension, defaulting to CSV"""
+    return EXPORT_FORMATS.get(os.path.splitext(path)[1].lower(), 'csv')
+
+
+def write_csv(series: PositionSeries, f: BinaryIO):
+    """Write a position series as CSV, one chunk of rows at a time"""
+    for body in encode_csv(series):
+        f.write(body)
+
+
+def write_parquet(series: PositionSeries, f: BinaryIO):
+    """Write a position series as Parquet, with one row group per chunk"""
+    if pyarrow is None:
+        raise RuntimeError('Parquet output needs pyarrow. Install it with `pip install pyarrow`.')
+
+    writer = None
+    try:
+        for chunk in series:
+            table = pyarrow.Table.from_pandas(chunk.to_frame(), preserve_index=False)
+            if writer is None:
+                writer = pyarrow.parquet.ParquetWriter(f, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def export_series(series: PositionSeries, path: str, export_format: str):
+    """Export a position series to a path, or to stdout for '-'.
+
+    Rows are written as they are computed, so memory is bounded by the series chunk size.
+    Files are replaced once complete, so an interrupted export leaves no partial file.
+    """
+    write = write_parquet if export_format == 'parquet' else write_csv
+    if path == '-':
+        write(series, sys.stdout.buffer)
+        sys.stdout.buffer.flush()
+        return
+
+    with open_atomic(path) as f:
+        write(series, f)
@@ -0,0 +1,154 @@
+"""Profile CLI commands with the library timing hooks"""
+
+from dataclasses import dataclass
+from typing import Dict
+from typing import List
+from typing import Optional
+import cProfile
+import sys
+import time
+import tracemalloc
+
+from astrohud.lib.timing.models import TimingListener
+from astrohud.lib.timing.models import timings
+
+from .const import PROFILE_STAGES
+from .const import PROFILE_TRACEMALLOC_FRAMES
+
+
+@dataclass
+class StageTotal:
+    """Calls and total duration of a stage"""
+    calls: int = 0
+    seconds: float = 0.0
+
+    def add(self, other: 'StageTotal'):
+        """Add the calls and duration of another total"""
+        self.calls += other.calls
+        self.seconds += other.seconds
+
+
+class StageProfile(TimingListener):
+    """Totals of every stage and counter, in the order they were first recorded"""
+    stages: Dict[str, StageTotal]
+    counters: Dict[str, int]
+
+    def __init__(self):
+        """Constructor"""
+        self.stages = dict()
+        self.counters = dict()
+
+    def observe(self, stage: str, seconds: float, labels: Dict[str, str]):
+        """Record the duration of a stage, whatever its labels"""
+        total = self.stages.get(stage)
+        if total is None:
+            total = self.stages[stage] = StageTotal()
+        total.calls += 1
+        total.seconds += seconds
+
+    def increment(self, counter: str, amount: int):
+        """Increment a counter"""
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def get_total(self, stages: List[str]) -> StageTotal:
+        """Get the sum of some stages"""
+        total = StageTotal()
+        for stage in stages:
+            if stage in self.stages:
+                total.add(self.stages[stage])
+        return total
+
+
+class Profiler:
+    """Profile a CLI run with the library timing hooks, and optionally cProfile and tracemalloc.
+
+    Only the current process is profiled, so stages run by worker processes are missing.
+    """
+    stats_path: Optional[str]
+    memory_path: Optional[str]
+    profile: StageProfile
+    cprofile: Optional[cProfile.Profile]
+    start_time: float
+
+    def __init__(self, stats_path: Optional[str] = None, memory_path: Optional[str] = None):
+        """Constructor"""
+        self.stats_path = stats_path
+        self.memory_path = memory_path
+        self.profile = StageProfile()
+        self.cprofile = None
+
+    def start(self):
+        """Start recording"""
+        timings.add_listener(self.profile)
+        if self.memory_path:
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+        if self.stats_path:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+        self.start_time = time.perf_counter()
+
+    def stop(self) -> float:
+        """Stop recording and save any cProfile stats and tracemalloc snapshot. Get the seconds recorded."""
+        seconds = time.perf_counter() - self.start_time
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.stats_path)
+        if self.memory_path and tracemalloc.is_tracing():
+            tracemalloc.take_snapshot().dump(self.memory_path)
+            tracemalloc.stop()
+        timings.remove_listener(self.profile)
+        return seconds
+
+    def finish(self):
+        """Stop recording and print the stage table to stderr, keeping stdout for the command output"""
+        seconds = self.stop()
+        print(file=sys.stderr)
+        print(format_profile(self.profile, seconds), file=sys.stderr)
+
+
+def format_row(name: str, total: StageTotal, seconds: float) -> str:
+    """Get a row of the stage table, without calls for a total of no calls"""
+    calls = str(total.calls) if total.calls else ''
+    mean = f'{total.seconds / total.calls * 1e3:.1f} ms' if total.calls else ''
+    row = [name, calls, f'{total.seconds * 1e3:.1f} ms', mean, f'{total.seconds / seconds:.1%}']
+    return ''.join(f'{cell:<20}' for cell in row)
+
+
+def format_profile(profile: StageProfile, seconds: float) -> str:
+    """Get the stage table of a profile, with the run's time outside any stage.
+
+    Stages named like 'layout.houses' are shown under the row of their 'layout' stage.
+    Stages outside PROFILE_STAGES are listed last, and may overlap the rows above.
+    """
+    seconds = max(seconds, 1e-9)
+    lines = [''.join(f'{cell:<20}' for cell in ['Stage', 'Calls', 'Total', 'Mean', 'Share'])]
+    lines.append('=' * 20 * 5)
+
+    shown = set()
+    other = seconds
+    for name, stages, parent in PROFILE_STAGES:
+        shown.update(stages)
+        total = profile.get_total(stages)
+        if total.calls == 0:
+            continue
+        if parent is None:
+            other -= total.seconds
+        lines.append(format_row(name if parent is None else f'  {name}', total, seconds))
+
+        for stage, sub_total in profile.stages.items():
+            if stage.split('.')[0] in stages and stage not in stages:
+                shown.add(stage)
+                lines.append(format_row(f'  {stage}', sub_total, seconds))
+
+    for stage, total in profile.stages.items():
+        if stage not in shown:
+            lines.append(format_row(stage, total, seconds))
+
+    lines.append(format_row('other', StageTotal(seconds=max(other, 0)), seconds))
+    lines.append(format_row('total', StageTotal(seconds=seconds), seconds))
+
+    if profile.counters:
+        lines.append('')
+        for counter, value in profile.counters.items():
+            lines.append(''.join(f'{cell:<20}' for cell in [counter, str(value)]))
+    return '\n'.join(lines)
@@ -1,4 +1,20 @@
+from contextlib import contextmanager
+from typing import BinaryIO
+from typing import Iterator
+from typing import List
+from typing import Sequence
+import os
+import uuid
+
+from PIL import Image
+import click
+
+from astrohud.chart.renderer.pillow.models import PillowRenderer
+from astrohud.chart.renderer.pillow.models import encode_image
+from astrohud.chart.styles.const import CHART_STYLE_CLASSES
 from astrohud.lib.horoscope.models import Horoscope
+from astrohud.lib.search.models import SearchEvent
+from astrohud.lib.timing.models import timings
 
 
 def print_horoscope(horoscope: Horoscope):
@@ -48,3 +64,75 @@ def print_horoscope(horoscope: Horoscope):
         row = [f'{cell:<20}' for cell in row]
         print(''.join(row))
 
+
+@contextmanager
+def open_atomic(path: str) -> Iterator[BinaryIO]:
+    """Open a file to write through a temporary file in the same directory, so readers never see part of it.
+
+    The file is only replaced if the block finishes without an exception.
+    """
+    directory, name = os.path.split(path)
+    tmp_path = os.path.join(directory, f'.tmp-{uuid.uuid4().hex}-{name}')
+    try:
+        with open(tmp_path, 'xb') as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def write_atomic(path: str, body: bytes):
+    """Write a file through a temporary file in the same directory, so readers never see part of it"""
+    with open_atomic(path) as f:
+        f.write(body)
+
+
+def save_chart(
+    horoscope: Horoscope,
+    style: str,
+    paths: Sequence[str],
+    image_formats: Sequence[str],
+    backgrounds: Sequence[str] = (),
+    background_shifts: Sequence[float] = (),
+):
+    """Draw a chart and atomically save it to each path, overlaid on the matching background if any"""
+    with timings.span('layout', style=style):
+        chart = CHART_STYLE_CLASSES[style](horoscope)
+    render = PillowRenderer(chart)
+    render.draw_all()
+
+    for i, path in enumerate(paths):
+        img = render.img
+        shift = background_shifts[i] if len(background_shifts) > i else 0
+        if len(backgrounds) > i:
+            img = render.overlay_image(backgrounds[i], shift)
+        body = encode_image(img, image_formats[i])
+        with timings.span('save'):
+            write_atomic(path, body)
+
+
+def get_image_format(path: str) -> str:
+    """Get the Pillow image format for a path's extension"""
+    image_format = Image.registered_extensions().get(os.path.splitext(path)[1].lower())
+    if image_format is None:
+        raise click.BadParameter(f'Unknown image extension for {path}', param_hint='--save-img')
+    return image_format
+
+
+def format_event(event: SearchEvent) -> str:
+    """Format a search event as a table row, with its sign, direction or aspect"""
+    if event.sign is not None:
+        detail = event.sign.name
+    elif event.retrograde is not None:
+        detail = 'RETROGRADE' if event.retrograde else 'DIRECT'
+    else:
+        detail = f'{event.aspect.name} {event.other.name}'
+
+    return format_event_row([event.date.isoformat(), event.event.name, event.planet.name, f'{event.longitude:5.1f}°', detail])
+
+
+def format_event_row(row: List[str]) -> str:
+    """Format a row of the search table, with room for ISO dates"""
+    return f'{row[0]:<28}' + ''.join(f'{cell:<20}' for cell in row[1:])
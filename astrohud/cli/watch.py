@@ -0,0 +1,60 @@
+"""Keep printing the current horoscope and saving its chart"""
+
+from datetime import datetime
+from datetime import timezone
+from typing import Optional
+from typing import Sequence
+import sys
+import time
+
+import click
+
+from astrohud.lib.ephemeris.models import EpheDate
+from astrohud.lib.ephemeris.models import EpheSettings
+from astrohud.lib.horoscope.models import Horoscope
+
+from .util import print_horoscope
+from .util import save_chart
+
+
+def watch_horoscope(
+    settings: EpheSettings,
+    style: str,
+    interval: float,
+    delta: float,
+    paths: Sequence[str],
+    image_formats: Sequence[str],
+    backgrounds: Sequence[str] = (),
+    background_shifts: Sequence[float] = (),
+):
+    """Print the horoscope for the current time every interval seconds, and save its chart, until interrupted.
+
+    One horoscope is advanced from tick to tick, reusing its sign splitters. Images are only redrawn
+    after a transition, or once a planet or the ascendant moved by delta degrees since the last drawing.
+    Ticks are skipped while a drawing takes longer than the interval.
+    """
+    horo: Optional[Horoscope] = None
+    drawn: Optional[Horoscope] = None
+    next_tick = time.monotonic()
+    try:
+        while True:
+            date = datetime.now(timezone.utc)
+            if horo is None:
+                horo = Horoscope(ed=EpheDate(date), settings=settings)
+            else:
+                horo = horo.advance_to(EpheDate(date))
+
+            if sys.stdout.isatty():
+                click.clear()
+            print(date.astimezone(None))
+            print_horoscope(horo)
+            sys.stdout.flush()
+
+            if paths and (drawn is None or horo.get_transitions(drawn) or horo.get_max_shift(drawn) >= delta):
+                save_chart(horo, style, paths, image_formats, backgrounds, background_shifts)
+                drawn = horo
+
+            next_tick = max(next_tick + interval, time.monotonic())
+            time.sleep(max(0, next_tick - time.monotonic()))
+    except KeyboardInterrupt:
+        pass
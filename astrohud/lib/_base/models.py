@@ -4,11 +4,16 @@ from abc import ABC
 from abc import abstractmethod
 from typing import Dict
 from typing import Generic
+from typing import List
 from typing import Tuple
 from typing import TypeVar
 
+import numpy as np
+
 from astrohud.lib.math.models import Angle
+from astrohud.lib.math.models import AngleArray
 from astrohud.lib.math.models import AngleSegment
+from astrohud.lib.math.models import AngleSegmentArray
 
 
 T = TypeVar('T')
@@ -40,6 +45,16 @@ class BaseSplitter(ABC,Generic[T]):
     def get_ra_limits(self, item: T, dec: float = 0) -> AngleSegment:
         """Get the min and max ra for the item"""
         pass
+
+    @abstractmethod
+    def is_flat(self) -> bool:
+        """Check if splitting is independent of declination"""
+        pass
+
+    @abstractmethod
+    def get_ring(self, dec: float = 0) -> 'Splitter2D[T]':
+        """Get the right ascension splitter used at a declination"""
+        pass
     
 
 class Splitter2D(BaseSplitter[T]):
@@ -59,6 +74,81 @@ class Splitter2D(BaseSplitter[T]):
 
         return None
 
+    def is_flat(self) -> bool:
+        """Check if splitting is independent of declination"""
+        return True
+
+    def get_ring(self, dec: float = 0) -> 'Splitter2D[T]':
+        """Get the right ascension splitter used at a declination"""
+        return self
+
+    def split_array(self, ra: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Get the ring indices, face indices and degrees into the segments for an array of positions.
+
+        Indices follow the order of self.ring, and are -1 (with face -1) where no segment matches.
+        """
+        ra = np.asarray(ra, dtype=float)
+        if not self.ring:
+            return np.full(ra.shape, -1), np.full(ra.shape, -1), np.zeros(ra.shape)
+
+        segments = AngleSegmentArray.from_segments(self.ring)
+        hits = segments.check_collision(AngleArray(ra)[..., np.newaxis], limit=0)
+        found = hits.any(axis=-1)
+        index = np.where(found, hits.argmax(axis=-1), -1)
+
+        degree = AngleArray(ra).compare(segments.a1.value[index])
+        face = np.minimum((degree * 3 // segments.length()[index]).astype(int), 2)
+        face = np.where(found, face, -1)
+        degree = np.where(found, degree, 0)
+        return index, face, degree
+
+
+class EqualSplitter(Splitter2D[T]):
+    """Split across right ascension into equal segments, using arithmetic"""
+
+    items: List[T]
+    start: float
+    width: float
+    limits: Dict[T, AngleSegment]
+
+    def __init__(self, items: List[T], start: float = 0):
+        """Constructor"""
+        super().__init__()
+        self.items = items
+        self.start = start
+        self.width = 360 / len(items)
+        self.limits = dict()
+        for i, item in enumerate(items):
+            segment_start = start + i * self.width
+            segment = AngleSegment(segment_start, segment_start + self.width)
+            self.ring[segment] = item
+            self.limits[item] = segment
+
+    def split(self, ra: float, dec: float = 0) -> T:
+        """Split an ecliptic position"""
+        index = int((ra - self.start) % 360 // self.width) % len(self.items)
+        return self.items[index]
+
+    def split_face(self, ra: float) -> Tuple[T, int, float]:
+        """Get the item, face index and degrees into the item"""
+        offset = (ra - self.start) % 360
+        index = int(offset // self.width) % len(self.items)
+        degree = offset - index * self.width
+        face = min(int(degree * 3 // self.width), 2)
+        return self.items[index], face, degree
+
+    def split_array(self, ra: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Get the item indices, face indices and degrees into the items for an array of positions"""
+        offset = np.mod(np.asarray(ra, dtype=float) - self.start, 360)
+        index = (offset // self.width).astype(int) % len(self.items)
+        degree = offset - index * self.width
+        face = np.minimum((degree * 3 // self.width).astype(int), 2)
+        return index, face, degree
+
+    def get_ra_limits(self, item: T, dec: float = 0) -> AngleSegment:
+        """Get the min and max ra for the item"""
+        return self.limits.get(item)
+
 
 class Splitter3D(BaseSplitter[Splitter2D[T]]):
     """Split across right ascension and declination"""
@@ -72,4 +162,12 @@ class Splitter3D(BaseSplitter[Splitter2D[T]]):
     def get_ra_limits(self, item: T, dec: float = 0) -> AngleSegment:
         """Get the min and max ra for the item"""
         splitter = self._split_deg(dec)
-        return splitter.get_ra_limits(item)
\ No newline at end of file
+        return splitter.get_ra_limits(item)
+
+    def is_flat(self) -> bool:
+        """Check if splitting is independent of declination"""
+        return len(self.ring) == 0
+
+    def get_ring(self, dec: float = 0) -> Splitter2D[T]:
+        """Get the right ascension splitter used at a declination"""
+        return self._split_deg(dec)
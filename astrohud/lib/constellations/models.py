@@ -1,34 +1,55 @@
 """Models for constellations."""
 
 from collections import defaultdict
+from functools import lru_cache
 from typing import Dict
 from typing import List
 from typing import Tuple
+import csv
 import math
 import os
 
-import pandas as pd
+import numpy as np
 
+from astrohud.lib._base.models import EqualSplitter
+from astrohud.lib.datasets.models import Dataset
 from astrohud.lib._base.models import Splitter2D
 from astrohud.lib._base.models import Splitter3D
 from astrohud.lib.ephemeris.enums import Sign
 from astrohud.lib.ephemeris.enums import Zodiac
 from astrohud.lib.math.models import Angle
 from astrohud.lib.math.models import AngleSegment
+from astrohud.lib.timing.models import timings
 
 
 CONSTELLATIONS: Dict[Sign, List[Tuple[float, float]]] = defaultdict(list)
+SIGN_SPLITTER_CACHE_SIZE = 16
+# Obliquities are rounded to this step, in degrees, so that nearby dates share one sign splitter
+OBLIQUITY_STEP = 1e-4
+CONSTELLATION_PATH = os.path.join(os.path.dirname(__file__), '../../assets/data/constellations_all.csv')
+CONSTELLATION_DTYPE = np.dtype([('sign', np.int16), ('angle', np.float64), ('declination', np.float64)])
 
 
-def init_constellations():
-    dirname = os.path.dirname(__file__)
+def build_constellation_table() -> np.ndarray:
+    """Parse the constellation boundaries, in file order, with right ascensions converted to degrees"""
+    with open(CONSTELLATION_PATH, newline='') as f:
+        rows = [
+            (
+                getattr(Sign, row['Sign'].upper()).value,
+                ((float(row['Seconds']) / 60 + float(row['Minutes'])) / 60 + float(row['Hours'])) * 15,
+                float(row['Declination']),
+            )
+            for row in csv.DictReader(f)
+        ]
+    return np.array(rows, dtype=CONSTELLATION_DTYPE)
+
+
+CONSTELLATION_DATASET = Dataset('constellations', [CONSTELLATION_PATH], build_constellation_table)
 
-    constellation_path = os.path.join(dirname, '../../assets/data/constellations_all.csv')
-    df = pd.read_csv(constellation_path)
-    df['Angle'] = ((df.Seconds / 60 + df.Minutes) / 60 + df.Hours) * 15
-    df['Sign'] = df.Sign.apply(lambda n: getattr(Sign, n.upper()))
-    for _, row in df.iterrows():
-        CONSTELLATIONS[row.Sign].append((row.Angle, row.Declination))
+
+def init_constellations():
+    for sign, angle, declination in CONSTELLATION_DATASET.load().tolist():
+        CONSTELLATIONS[Sign(sign)].append((angle, declination))
 
 
 class Constellations:
@@ -88,12 +109,7 @@ class SignSplitter(Splitter3D[Sign]):
                 segment = AngleSegment(declination - 1, declination + 1)
                 self.ring[segment] = ring
         else:
-            ring = Splitter2D[Sign]()
-            for i in range(12):
-                start = i * 30
-                ring.ring[AngleSegment(start, start + 30)] = Sign(i)
-
-            self.default = ring
+            self.default = EqualSplitter[Sign]([Sign(i) for i in range(12)])
 
     def _get_iau_ring(self, declination: float) -> Splitter2D[Sign]:
         out = Splitter2D[Sign]()
@@ -116,4 +132,19 @@ class SignSplitter(Splitter3D[Sign]):
             if arc is not None:
                 out.ring[arc] = sign
 
-        return out
\ No newline at end of file
+        return out
+
+
+def get_sign_splitter(obliquity: float, zodiac: Zodiac) -> SignSplitter:
+    """Get a sign splitter for the obliquity rounded to OBLIQUITY_STEP, shared with recent calls in the same step.
+
+    Splitters must not be modified.
+    """
+    return get_rounded_sign_splitter(round(obliquity / OBLIQUITY_STEP), zodiac)
+
+
+@lru_cache(maxsize=SIGN_SPLITTER_CACHE_SIZE)
+def get_rounded_sign_splitter(obliquity_steps: int, zodiac: Zodiac) -> SignSplitter:
+    """Get a sign splitter for an obliquity in steps of OBLIQUITY_STEP"""
+    with timings.span('sign_splitter'):
+        return SignSplitter(obliquity_steps * OBLIQUITY_STEP, zodiac)
@@ -0,0 +1 @@
+"""Module for read-only datasets shared between processes."""
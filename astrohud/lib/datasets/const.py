@@ -0,0 +1,8 @@
+"""Constants for datasets"""
+
+import os
+import tempfile
+
+
+# Directory of memory-mapped dataset files, shared by every process on the host
+DATASET_DIR = os.environ.get('ASTROHUD_DATASET_DIR', os.path.join(tempfile.gettempdir(), 'astrohud-datasets'))
@@ -0,0 +1,94 @@
+"""Models for datasets"""
+
+from threading import Lock
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+import hashlib
+import os
+import uuid
+
+import numpy as np
+
+from .const import DATASET_DIR
+
+
+# Every dataset, by name
+DATASETS: Dict[str, 'Dataset'] = dict()
+
+
+class Dataset:
+    """Read-only array built from source files, and shared between processes through a memory-mapped file.
+
+    The first process to load a dataset builds it and saves it to DATASET_DIR, named by a hash of its
+    sources and version. Other processes map the same file, so the OS page cache holds one copy for all of them.
+    Bump the version when the build function changes. If the file cannot be written, the array is kept in memory.
+    """
+    name: str
+    sources: List[str]
+    build: Callable[[], np.ndarray]
+    version: int
+    array: Optional[np.ndarray]
+
+    def __init__(self, name: str, sources: List[str], build: Callable[[], np.ndarray], version: int = 1):
+        """Constructor. Registers the dataset in DATASETS."""
+        self.name = name
+        self.sources = list(sources)
+        self.build = build
+        self.version = version
+        self.array = None
+        self.lock = Lock()
+        DATASETS[name] = self
+
+    def get_path(self) -> str:
+        """Get the file path, which changes with the sources and version"""
+        digest = hashlib.sha256(f'{self.name}:{self.version}'.encode())
+        for source in sorted(self.sources):
+            stat = os.stat(source)
+            digest.update(f'{os.path.abspath(source)}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+        return os.path.join(DATASET_DIR, f'{self.name}-{digest.hexdigest()[:16]}.npy')
+
+    def load(self) -> np.ndarray:
+        """Get the array, mapping its file, and building it first if missing"""
+        with self.lock:
+            if self.array is None:
+                self.array = self._load()
+            return self.array
+
+    def _load(self) -> np.ndarray:
+        """Map the file, building it first if missing"""
+        path = self.get_path()
+        try:
+            return np.load(path, mmap_mode='r')
+        except FileNotFoundError:
+            pass
+
+        array = self.build()
+        try:
+            save_array(path, array)
+        except OSError:
+            array.setflags(write=False)
+            return array
+        return np.load(path, mmap_mode='r')
+
+
+def save_array(path: str, array: np.ndarray):
+    """Save an array through a temporary file in the same directory, so readers never map part of it"""
+    directory, name = os.path.split(path)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f'.tmp-{uuid.uuid4().hex}-{name}')
+    try:
+        with open(tmp_path, 'xb') as f:
+            np.save(f, array, allow_pickle=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def load_datasets():
+    """Load every dataset, so processes started afterwards map existing files instead of building them"""
+    for dataset in list(DATASETS.values()):
+        dataset.load()
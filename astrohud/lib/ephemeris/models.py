@@ -2,13 +2,16 @@
 
 from dataclasses import dataclass
 from datetime import datetime
+from datetime import timedelta
 from datetime import timezone
+from typing import Optional
 from typing import Tuple
 import os
 
 import swisseph as swe
 
 from astrohud.lib._base.models import BaseSplitter
+from astrohud.lib._base.models import EqualSplitter
 from astrohud.lib._base.models import Splitter2D
 from astrohud.lib.ephemeris.enums import House
 from astrohud.lib.ephemeris.enums import Planet
@@ -16,6 +19,7 @@ from astrohud.lib.ephemeris.enums import Sign
 from astrohud.lib.ephemeris.enums import Zodiac
 from astrohud.lib.math.models import Angle
 from astrohud.lib.math.models import AngleSegment
+from astrohud.lib.timing.models import timings
 
 
 def init_ephe():
@@ -42,11 +46,45 @@ class EpheDate:
     def __init__(self, date: datetime):
         assert date.tzinfo == timezone.utc
         date_tup = date.timetuple()[:6]
-        _, self.ut = swe.utc_to_jd(*date_tup, swe.GREG_CAL)
-        
+        _, ut = swe.utc_to_jd(*date_tup, swe.GREG_CAL)
+        timings.count('swe_calls')
+        self._set_ut(ut)
+
+    def _set_ut(self, ut: float):
+        """Set the julian day and the matching obliquity"""
+        self.ut = ut
         results, _ = swe.calc_ut(self.ut, swe.ECL_NUT, 0)
+        timings.count('swe_calls')
         self.obliquity = results[0]
 
+    @classmethod
+    def from_ut(cls, ut: float):
+        """Construct from a julian day"""
+        ed = cls.__new__(cls)
+        ed._set_ut(ut)
+        return ed
+
+    def advance(self, dt: timedelta):
+        """Get the date shifted by a time delta"""
+        return EpheDate.from_ut(self.ut + dt / timedelta(days=1))
+
+
+def ut_to_date(ut: float) -> datetime:
+    """Get the UTC date of a julian day, rounded to the second"""
+    year, month, day, hour, minute, seconds = swe.jdut1_to_utc(ut, swe.GREG_CAL)
+    timings.count('swe_calls')
+    return datetime(year, month, day, hour, minute, tzinfo=timezone.utc) + timedelta(seconds=round(seconds))
+
+
+def calc_planet(ut: float, planet: Planet, zodiac: Zodiac) -> Tuple[float, float, float]:
+    """Get the ecliptic longitude, latitude and speed of a planet"""
+    flags = swe.FLG_SPEED
+    if zodiac == Zodiac.SIDEREAL:
+        flags |= swe.FLG_SIDEREAL
+    results, flags = swe.calc_ut(ut, planet.value, flags=flags)
+    timings.count('swe_calls')
+    return results[0], results[1], results[3]
+
 
 class SignPosition:
     """The position within a single sign"""
@@ -58,6 +96,9 @@ class SignPosition:
     speed: float        # degrees / day
     house: House        # House
 
+    sign_limits: Optional[AngleSegment]  # Segment of the sign
+    face_limits: Optional[AngleSegment]  # Segment of the face
+
     def __init__(
         self,
         signs: BaseSplitter[Sign],
@@ -70,23 +111,59 @@ class SignPosition:
         self.abs_angle = ra
         self.declination = dec
         self.speed = speed
-        self.sign = signs.split(ra, dec)
         self.house = houses.split(ra, dec)
 
-        self.face = self._get_face(signs)
+        ring = signs.get_ring(dec)
+        if isinstance(ring, EqualSplitter):
+            self.sign, self.face, _ = ring.split_face(ra)
+            self.sign_limits = ring.get_ra_limits(self.sign)
+            self.face_limits = None
+        else:
+            self.sign = signs.split(ra, dec)
+            self.face = self._get_face(signs)
 
     def _get_face(self, signs: BaseSplitter[Sign]) -> int:
         """Get the face of the sign region"""
-        sign_limits = signs.get_ra_limits(self.sign, self.declination)
-        face_length = sign_limits.length() / 3
+        self.sign_limits = signs.get_ra_limits(self.sign, self.declination)
+        self.face_limits = None
+        if self.sign_limits is None:
+            return -1
+
+        face_length = self.sign_limits.length() / 3
         for face_index in range(3):
-            face_start = face_index * face_length + sign_limits.a1.standard_value()
+            face_start = face_index * face_length + self.sign_limits.a1.standard_value()
             face = AngleSegment(face_start, face_start + face_length)
             if face.check_collision(Angle(self.abs_angle), 0):
+                self.face_limits = face
                 return face_index
 
         return -1
 
+    def moved(
+        self,
+        signs: BaseSplitter[Sign],
+        houses: BaseSplitter[House],
+        ra: float,
+        dec: float = 0,
+        speed: float = 0
+    ):
+        """Get a new position, reusing the sign and face if it did not leave them"""
+        if not signs.is_flat() or self.face_limits is None:
+            return SignPosition(signs, houses, ra, dec, speed)
+        if not self.face_limits.check_collision(Angle(ra), 0):
+            return SignPosition(signs, houses, ra, dec, speed)
+
+        out = SignPosition.__new__(SignPosition)
+        out.abs_angle = ra
+        out.declination = dec
+        out.speed = speed
+        out.sign = self.sign
+        out.house = houses.split(ra, dec)
+        out.face = self.face
+        out.sign_limits = self.sign_limits
+        out.face_limits = self.face_limits
+        return out
+
     @classmethod
     def from_planet(
         cls,
@@ -97,17 +174,12 @@ class SignPosition:
         houses: BaseSplitter[House]
     ):
         """Construct for a planet"""
-        flags = swe.FLG_SPEED
-        if zodiac == Zodiac.SIDEREAL:
-            flags |= swe.FLG_SIDEREAL
-        results, flags = swe.calc_ut(ut, planet.value, flags=flags)
-        ra = results[0]
-        dec = results[1]
-        speed = results[3]
+        ra, dec, speed = calc_planet(ut, planet, zodiac)
         return cls(signs, houses, ra, dec, speed)
 
 
 class HouseSplitter(Splitter2D[House]):
+    @timings.timed('house_splitter')
     def __init__(self, ut: float, settings: EpheSettings):
         """Constructor"""
         super().__init__()
@@ -121,6 +193,7 @@ class HouseSplitter(Splitter2D[House]):
             hsys=settings.house_sys,
             **flag_args
         )
+        timings.count('swe_calls')
 
         # TODO: Fix combination of W/N House Sys with IAU/Stellar zodiac
 
@@ -149,3 +149,12 @@ ESSENTIAL_SCORE.update({
     Dignity.DIGNITY: 5,
 })
 RETROGRADE_SCORE = -2
+
+
+# Indices for the dignity table
+PLANET_INDEX = {planet: i for i, planet in enumerate(Planet)}
+NO_SIGN_INDEX = len(Sign)
+
+
+# Maximum obliquity drift, in degrees, before a sign splitter is rebuilt, for every zodiac
+OBLIQUITY_TOLERANCE = 1e-4
@@ -38,3 +38,11 @@ class Dignity(Enum):
     DECAN = 4
     EXALTATION = 5
     DIGNITY = 6
+
+
+class TransitionKind(Enum):
+    SIGN = 0
+    FACE = 1
+    HOUSE = 2
+    STATION = 3
+    ASPECT = 4
@@ -1,13 +1,21 @@
 """Models for horoscopes"""
 
+from copy import copy
 from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any
 from typing import Dict
+from typing import Iterator
 from typing import List
 from typing import Optional
 from typing import Tuple
+from typing import Union
+
+import numpy as np
 
 from astrohud.lib._base.models import BaseSplitter
 from astrohud.lib.constellations.models import SignSplitter
+from astrohud.lib.constellations.models import get_sign_splitter
 from astrohud.lib.ephemeris.enums import House
 from astrohud.lib.ephemeris.enums import Planet
 from astrohud.lib.ephemeris.enums import Sign
@@ -16,19 +24,92 @@ from astrohud.lib.ephemeris.models import EpheDate
 from astrohud.lib.ephemeris.models import EpheSettings
 from astrohud.lib.ephemeris.models import HouseSplitter
 from astrohud.lib.ephemeris.models import SignPosition
+from astrohud.lib.ephemeris.models import calc_planet
 from astrohud.lib.horoscope.const import ASPECT_DEGREES
 from astrohud.lib.horoscope.const import DECANS
 from astrohud.lib.horoscope.const import ELEMENT_ASSOCIATION
 from astrohud.lib.horoscope.const import ESSENTIAL_SCORE
 from astrohud.lib.horoscope.const import EXALTATIONS
+from astrohud.lib.horoscope.const import NO_SIGN_INDEX
+from astrohud.lib.horoscope.const import OBLIQUITY_TOLERANCE
+from astrohud.lib.horoscope.const import PLANET_INDEX
 from astrohud.lib.horoscope.const import RETROGRADE_SCORE
 from astrohud.lib.horoscope.const import RULERS
 from astrohud.lib.horoscope.const import TRIPLICITIES
 from astrohud.lib.horoscope.const import TRIPLICITY_TIME
 from astrohud.lib.horoscope.enums import Aspect
 from astrohud.lib.horoscope.enums import Dignity
+from astrohud.lib.horoscope.enums import TransitionKind
 from astrohud.lib.math.models import Angle
 from astrohud.lib.math.models import AngleSegment
+from astrohud.lib.timing.models import timings
+
+
+def compile_dignity_table() -> np.ndarray:
+    """Compile the dignity rules into a table of Dignity values.
+
+    The table is indexed by (planet, sign, opposite sign, face, triplicity time).
+    Missing signs use NO_SIGN_INDEX. Rules are applied from lowest to highest
+    priority, so that stronger dignities overwrite weaker ones.
+    """
+    n_signs = NO_SIGN_INDEX + 1
+    planet_ids = np.arange(len(PLANET_INDEX)).reshape(-1, 1, 1, 1, 1)
+
+    def sign_planets(mapping: Dict[Sign, Planet]) -> np.ndarray:
+        """Get the planet index associated with each sign, or -1"""
+        out = np.full(n_signs, -1)
+        for sign, planet in mapping.items():
+            if planet is not None:
+                out[sign.value] = PLANET_INDEX[planet]
+        return out
+
+    rulers = sign_planets(RULERS)
+    exaltations = np.full(len(PLANET_INDEX), -1)
+    for planet, (sign, _) in EXALTATIONS.items():
+        exaltations[PLANET_INDEX[planet]] = sign.value
+    exaltations = exaltations.reshape(-1, 1, 1, 1, 1)
+    decans = np.full((n_signs, 3), -1)
+    for sign, planets in DECANS.items():
+        decans[sign.value] = [PLANET_INDEX[p] for p in planets]
+    triplicities = np.full((n_signs, 3), -1)
+    for sign, element in ELEMENT_ASSOCIATION.items():
+        triplicities[sign.value] = [PLANET_INDEX[p] for p in TRIPLICITIES[element]]
+
+    sign_ids = np.arange(n_signs)
+    is_ruler = planet_ids == rulers.reshape(1, -1, 1, 1, 1)
+    is_opposite_ruler = planet_ids == rulers.reshape(1, 1, -1, 1, 1)
+    is_exalted = exaltations == sign_ids.reshape(1, -1, 1, 1, 1)
+    is_fallen = exaltations == sign_ids.reshape(1, 1, -1, 1, 1)
+    is_decan = planet_ids == decans.reshape(1, -1, 1, 3, 1)
+    is_triplicity = planet_ids == triplicities.reshape(1, -1, 1, 1, 3)
+
+    table = np.full((len(PLANET_INDEX), n_signs, n_signs, 3, 3), Dignity.NORMAL.value, dtype=np.int8)
+    rules = [
+        (is_triplicity, Dignity.TRIPLICITY),
+        (is_decan, Dignity.DECAN),
+        (is_fallen, Dignity.FALL),
+        (is_exalted, Dignity.EXALTATION),
+        (is_opposite_ruler, Dignity.DETRIMENT),
+        (is_ruler, Dignity.DIGNITY),
+    ]
+    for mask, dignity in rules:
+        table[np.broadcast_to(mask, table.shape)] = dignity.value
+    return table
+
+
+DIGNITY_TABLE = compile_dignity_table()
+
+
+def get_dignity_index(planet: Planet, sign: Optional[Sign], opposite: Optional[Sign], face: int, house: House) -> Tuple[int, int, int, int, int]:
+    """Get the index of a planet's dignity in DIGNITY_TABLE"""
+    sign_index = NO_SIGN_INDEX if sign is None else sign.value
+    opposite_index = NO_SIGN_INDEX if opposite is None else opposite.value
+    return PLANET_INDEX[planet], sign_index, opposite_index, face, TRIPLICITY_TIME[house]
+
+
+def lookup_dignities(planets: np.ndarray, signs: np.ndarray, opposites: np.ndarray, faces: np.ndarray, times: np.ndarray) -> np.ndarray:
+    """Get Dignity values for columns of table indices"""
+    return DIGNITY_TABLE[planets, signs, opposites, faces, times]
 
 
 @dataclass(frozen=True)
@@ -47,61 +128,75 @@ class PlanetTuple:
         return f'{self.planet1.name},{self.planet2.name}'
 
 
+@dataclass(frozen=True)
+class Transition:
+    """A change of a planet's sign, face, house or direction, or of the aspect between two planets"""
+    kind: TransitionKind
+    subject: Union[Planet, PlanetTuple]
+    before: Any
+    after: Any
+
+
 class PlanetHoroscope:
     """Horoscope summary for a single planet"""
 
+    planet: Planet
     position: SignPosition
+    opposite: Optional[Sign]
+    opposite_limits: Optional[AngleSegment]
     dignity: Dignity
     retrograde: bool
     score: float = 0
 
     def __init__(self, ed: EpheDate, planet: Planet, zodiac: Zodiac, signs: BaseSplitter[Sign], houses: BaseSplitter[House]):
         """Constructor"""
+        self.planet = planet
         self.position = SignPosition.from_planet(ed.ut, planet, zodiac, signs, houses)
-        self.dignity = self._get_planet_dignity(planet, signs)
+        self._assign_opposite(signs)
+        self.dignity = self._get_planet_dignity(planet)
         self.retrograde = self.position.speed < 0
         self._assign_scores()
 
+    def advance(self, ed: EpheDate, zodiac: Zodiac, signs: BaseSplitter[Sign], houses: BaseSplitter[House]):
+        """Get the horoscope at a new date, reusing the dignity if no boundary was crossed"""
+        ra, dec, speed = calc_planet(ed.ut, self.planet, zodiac)
+
+        out = copy(self)
+        out.position = self.position.moved(signs, houses, ra, dec, speed)
+        out.retrograde = out.position.speed < 0
+
+        unchanged = (
+            out.position.sign == self.position.sign and
+            out.position.face == self.position.face and
+            out.position.house == self.position.house and
+            self.opposite_limits is not None and
+            self.opposite_limits.check_collision(Angle(ra + 180), 0)
+        )
+        if not unchanged:
+            out._assign_opposite(signs)
+            out.dignity = out._get_planet_dignity(out.planet)
+
+        out.score = 0
+        out._assign_scores()
+        return out
+
+    def _assign_opposite(self, signs: BaseSplitter[Sign]):
+        """Assign the sign opposite to the planet"""
+        self.opposite = signs.split(self.position.abs_angle + 180, -self.position.declination)
+        self.opposite_limits = None
+        if signs.is_flat() and self.opposite is not None:
+            self.opposite_limits = signs.get_ra_limits(self.opposite, -self.position.declination)
+
     def _assign_scores(self) -> Tuple[float, float]:
         """Assign scores based on horo aspects"""
         self.score += ESSENTIAL_SCORE[self.dignity]
         if self.retrograde:
             self.score += RETROGRADE_SCORE
 
-    def _get_decan(self) -> Optional[Planet]:
-        """Get the ruling decan of the region"""
-        sign = self.position.sign
-
-        if sign not in DECANS:
-            return None
-        
-        return DECANS[sign][self.position.face]
-
-    def _get_planet_dignity(self, planet: Planet, signs: BaseSplitter[Sign]) -> Dignity:
+    def _get_planet_dignity(self, planet: Planet) -> Dignity:
         """Get the dignity type of a planet"""
-        sign = self.position.sign
-        house = self.position.house
-        opposite = signs.split(self.position.abs_angle + 180, -self.position.declination)
-        triplicity = None
-        if sign in ELEMENT_ASSOCIATION:
-            triplicity = TRIPLICITIES[ELEMENT_ASSOCIATION[sign]][TRIPLICITY_TIME[house]]
-
-        decan = self._get_decan()            
-
-        if RULERS[sign] == planet:
-            return Dignity.DIGNITY
-        if RULERS[opposite] == planet:
-            return Dignity.DETRIMENT
-        if planet in EXALTATIONS:
-            if EXALTATIONS[planet][0] == sign:
-                return Dignity.EXALTATION
-            if EXALTATIONS[planet][0] == opposite:
-                return Dignity.FALL
-        if planet == decan:
-            return Dignity.DECAN
-        if planet == triplicity:
-            return Dignity.TRIPLICITY
-        return Dignity.NORMAL
+        index = get_dignity_index(planet, self.position.sign, self.opposite, self.position.face, self.position.house)
+        return Dignity(int(DIGNITY_TABLE[index]))
     
 
 class AspectHoroscope:
@@ -150,41 +245,130 @@ class Horoscope:
     def __init__(self, ed: EpheDate, settings: EpheSettings):
         self.date = ed
         self.settings = settings
-        self.sign_splitter = SignSplitter(ed.obliquity, settings.zodiac)
+        self.sign_splitter = get_sign_splitter(ed.obliquity, settings.zodiac)
         self.house_splitter = HouseSplitter(ed.ut, settings)
 
         self.planets = dict()
-        extra_signs = []
-        for planet in list(Planet):
-            self.planets[planet] = PlanetHoroscope(
-                ed,
-                planet,
-                settings.zodiac,
-                self.sign_splitter,
-                self.house_splitter
-            )
-            pos = self.planets[planet].position
-            extra_signs.append((pos.sign, pos.abs_angle, pos.declination))
+        with timings.span('planets'):
+            for planet in list(Planet):
+                self.planets[planet] = PlanetHoroscope(
+                    ed,
+                    planet,
+                    settings.zodiac,
+                    self.sign_splitter,
+                    self.house_splitter
+                )
 
         self._get_all_aspects(settings)
+        self._get_houses()
+        self._get_main_signs()
+        self._get_extra_signs()
+
+    def advance(self, dt: timedelta, tolerance: float = OBLIQUITY_TOLERANCE):
+        """Get the horoscope at a shifted time, only recomputing sections that could have changed"""
+        return self.advance_to(self.date.advance(dt), tolerance)
+
+    def advance_to(self, ed: EpheDate, tolerance: float = OBLIQUITY_TOLERANCE):
+        """Get the horoscope at another date, only recomputing sections that could have changed.
+
+        Non-equal sign splitters are reused while the obliquity changed by at most tolerance.
+        Use a tolerance of 0 for results identical to a new Horoscope.
+        """
+        out = Horoscope.__new__(Horoscope)
+        out.date = ed
+        out.settings = self.settings
+        out.house_splitter = HouseSplitter(ed.ut, self.settings)
+
+        if self._can_reuse_signs(ed, tolerance):
+            out.sign_splitter = self.sign_splitter
+            out.main_signs = self.main_signs
+            with timings.span('planets'):
+                out.planets = {
+                    planet: horo.advance(ed, self.settings.zodiac, out.sign_splitter, out.house_splitter)
+                    for planet, horo in self.planets.items()
+                }
+        else:
+            out.sign_splitter = get_sign_splitter(ed.obliquity, self.settings.zodiac)
+            out._get_main_signs()
+            with timings.span('planets'):
+                out.planets = {
+                    planet: PlanetHoroscope(ed, planet, self.settings.zodiac, out.sign_splitter, out.house_splitter)
+                    for planet in self.planets
+                }
+
+        out._get_all_aspects(self.settings)
+        out._get_houses()
+        out._get_extra_signs()
+        return out
 
+    def timeline(self, step: timedelta, count: int) -> Iterator['Horoscope']:
+        """Iterate over horoscopes at regular time steps, starting with this one"""
+        horo = self
+        for _ in range(count):
+            yield horo
+            horo = horo.advance(step)
+
+    def get_transitions(self, previous: 'Horoscope') -> List[Transition]:
+        """Get the transitions since a previous horoscope with the same settings"""
+        transitions = []
+        for planet, horo in self.planets.items():
+            before = previous.planets[planet]
+            changes = (
+                (TransitionKind.SIGN, before.position.sign, horo.position.sign),
+                (TransitionKind.FACE, before.position.face, horo.position.face),
+                (TransitionKind.HOUSE, before.position.house, horo.position.house),
+                (TransitionKind.STATION, before.retrograde, horo.retrograde),
+            )
+            for kind, old, new in changes:
+                if old != new:
+                    transitions.append(Transition(kind, planet, old, new))
+
+        for pair in sorted(previous.aspects.keys() | self.aspects.keys(), key=str):
+            old = previous.aspects[pair].aspect if pair in previous.aspects else Aspect.NONE
+            new = self.aspects[pair].aspect if pair in self.aspects else Aspect.NONE
+            if old != new:
+                transitions.append(Transition(TransitionKind.ASPECT, pair, old, new))
+        return transitions
+
+    def get_max_shift(self, previous: 'Horoscope') -> float:
+        """Get the largest angle, in degrees, that a planet or the ascendant moved since a previous horoscope"""
+        angles = [(horo.position.abs_angle, previous.planets[planet].position.abs_angle) for planet, horo in self.planets.items()]
+        angles.append((self.ascending.abs_angle, previous.ascending.abs_angle))
+        return max(abs((new - old + 180) % 360 - 180) for new, old in angles)
+
+    def _can_reuse_signs(self, ed: EpheDate, tolerance: float) -> bool:
+        """Check if the sign splitter is still valid for a new date.
+
+        It is if the new date gets the same shared splitter, which a new Horoscope would use too.
+        Otherwise, it is reused within tolerance, since every splitter carries constellations drawn for its obliquity.
+        """
+        if get_sign_splitter(ed.obliquity, self.settings.zodiac) is self.sign_splitter:
+            return True
+        return abs(ed.obliquity - self.date.obliquity) <= tolerance
+
+    def _get_houses(self):
+        """Get the houses and angles"""
         self.ascending, self.midheaven = self.house_splitter.get_ascmc(self.sign_splitter)
         self.houses = self.house_splitter.ring
-        
-        # Add main signs
+
+    def _get_main_signs(self):
+        """Get the signs along the ecliptic"""
         self.main_signs = dict()
         for sign in self.sign_splitter._split_deg(0).ring.values():
             seg = self.sign_splitter.get_ra_limits(sign, 0)
             self.main_signs[seg] = sign
-        
-        # Add extra signs
+
+    def _get_extra_signs(self):
+        """Get the signs off the ecliptic that contain planets"""
         self.extra_signs = dict()
-        for sign, ra, dec in extra_signs:
-            if sign == self.sign_splitter.split(ra, 0):
+        for horo in self.planets.values():
+            pos = horo.position
+            if pos.sign == self.sign_splitter.split(pos.abs_angle, 0):
                 continue
-            seg = self.sign_splitter.get_ra_limits(sign, dec)
-            self.extra_signs[seg] = sign
+            seg = self.sign_splitter.get_ra_limits(pos.sign, pos.declination)
+            self.extra_signs[seg] = pos.sign
     
+    @timings.timed('aspects')
     def _get_all_aspects(self, settings: EpheSettings) -> Dict[PlanetTuple, AspectHoroscope]:
         self.aspects = dict()
         for p1, ph1 in self.planets.items():
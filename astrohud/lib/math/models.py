@@ -1,13 +1,22 @@
 """Models for math"""
 
+from collections.abc import MutableSet
 from typing import Any
 from typing import Dict
+from typing import Iterable
 from typing import Iterator
 from typing import Tuple
 
+import numpy as np
+
 
 class Angle:
-    """Math utility for an angle, in degrees"""
+    """Math utility for an angle, in degrees.
+
+    Instances must be treated as immutable, since normalized values are cached.
+    """
+
+    __slots__ = ('value', 'center', '_standard', '_positive')
 
     value: float
     center: float
@@ -15,16 +24,19 @@ class Angle:
     def __init__(self, value: float, center: float = 0):
         """Constructor"""
         offset = center - 180
-        self.value = ((value - offset) % 360) + offset
+        value = ((value - offset) % 360) + offset
+        self.value = value
         self.center = center
+        self._standard = ((value + 180) % 360) - 180
+        self._positive = value % 360
 
     def standard_value(self) -> float:
         """Get unique standardized value"""
-        return Angle(self.value).value
+        return self._standard
     
     def positive_value(self) -> float:
         """Get unique positive value"""
-        return Angle(self.value, 180).value
+        return self._positive
 
     # Comparison methods
 
@@ -33,7 +45,7 @@ class Angle:
         if not isinstance(other, Angle):
             return False
         
-        return self.standard_value() == other.standard_value()
+        return self._standard == other._standard
     
     def compare(self, other: Any) -> float:
         """Compare against another angle, and return a float.
@@ -44,8 +56,7 @@ class Angle:
             error = f"Operation not supported between instances of 'Angle' and '{type(other).__name__}'"
             raise TypeError(error)
         
-        diff = Angle(self.value, other.value)
-        return diff.value - diff.center
+        return ((self.value - other.value + 180) % 360) - 180
     
     def __lt__(self, other: Any):
         """Check value less than, around a common center"""
@@ -61,19 +72,19 @@ class Angle:
 
     def __hash__(self) -> int:
         """Get hash code"""
-        return hash(self.standard_value())
+        return hash(self._standard)
     
     def __repr__(self) -> str:
         """Get string representation"""
         return f'Angle({self.value}, {self.center})'
-    
+
     # Math methods
 
     def average(self, other: Any) -> Any:
         """Get the average of two angles."""
         comp = self.compare(other)
         comp /= 2
-        return Angle(other.standard_value() + comp)
+        return Angle(other._standard + comp)
     
     def distance(self, other: Any) -> float:
         """Get the distance between two angles."""
@@ -92,19 +103,27 @@ class Angle:
 
 
 class AngleSegment:
-    """Math utility for a segment between two angles."""
+    """Math utility for a segment between two angles.
+
+    Instances must be treated as immutable, since the hash is cached.
+    """
+
+    __slots__ = ('a1', 'a2', '_hash')
 
     a1: Angle
     a2: Angle
 
     def __init__(self, a1: int|float|Angle, a2: int|float|Angle):
         """Constructor"""
-        if not isinstance(a1, Angle):
-            a1 = Angle(a1)
-        if not isinstance(a2, Angle):
-            a2 = Angle(a2)
+        # Same as Angle.sort, without allocating intermediate angles
+        v1 = a1.value if isinstance(a1, Angle) else ((a1 + 180) % 360) - 180
+        v2 = a2.value if isinstance(a2, Angle) else ((a2 + 180) % 360) - 180
+        if ((v2 - v1 + 180) % 360) - 180 < 0:
+            v1, v2 = v2, v1
 
-        self.a1, self.a2 = Angle.sort(a1, a2)
+        self.a1 = Angle(v1, v1)
+        self.a2 = Angle(v2, v1)
+        self._hash = hash((self.a1._standard, self.a2._standard))
 
     # Comparison methods
 
@@ -119,7 +138,7 @@ class AngleSegment:
 
     def __hash__(self) -> int:
         """Get hash code"""
-        return hash((self.a1, self.a2))
+        return self._hash
     
     def __repr__(self) -> str:
         """Get string representation"""
@@ -134,13 +153,15 @@ class AngleSegment:
     def check_collision(self, other: Any, limit: float) -> bool:
         """Check if it collides with another AngleSegment or Angle, within a given limit"""
         if isinstance(other, Angle):
-            other = AngleSegment(other, other)
+            other1 = other2 = other
+        else:
+            other1, other2 = other.a1, other.a2
 
-        comp_start = self.a2.compare(other.a2)
+        comp_start = self.a2.compare(other2)
         if comp_start < 0:
-            cross = self.a2.compare(other.a1) + limit
+            cross = self.a2.compare(other1) + limit
         else:
-            cross = other.a2.compare(self.a1) + limit
+            cross = other2.compare(self.a1) + limit
         return cross > 0
     
     def length(self) -> float:
@@ -152,6 +173,222 @@ class AngleSegment:
         return self.a1.average(self.a2)
 
 
+class AngleArray:
+    """Vectorized counterpart to Angle, over a NumPy array of degrees"""
+
+    value: np.ndarray
+    center: np.ndarray
+
+    def __init__(self, value: Any, center: Any = 0):
+        """Constructor"""
+        value = np.asarray(value, dtype=float)
+        center = np.asarray(center, dtype=float)
+        offset = center - 180
+        self.value = np.mod(value - offset, 360) + offset
+        self.center = center
+
+    @classmethod
+    def from_angles(cls, angles: Iterable[Angle]) -> Any:
+        """Construct from a list of angles"""
+        return cls([a.value for a in angles])
+
+    def standard_value(self) -> np.ndarray:
+        """Get unique standardized values"""
+        return np.mod(self.value + 180, 360) - 180
+
+    def positive_value(self) -> np.ndarray:
+        """Get unique positive values"""
+        return np.mod(self.value, 360)
+
+    def __len__(self) -> int:
+        """Get the number of angles"""
+        return len(self.value)
+
+    def __getitem__(self, key: Any) -> Any:
+        """Index the angles, keeping the same shape semantics as NumPy"""
+        out = AngleArray.__new__(AngleArray)
+        out.value = self.value[key]
+        out.center = np.broadcast_to(self.center, self.value.shape)[key]
+        return out
+
+    def __iter__(self) -> Iterator[Angle]:
+        """Iterate over scalar angles"""
+        center = np.broadcast_to(self.center, self.value.shape)
+        return (Angle(v, c) for v, c in zip(self.value.tolist(), center.tolist()))
+
+    def __repr__(self) -> str:
+        """Get string representation"""
+        return f'AngleArray({self.value!r})'
+
+    # Comparison methods
+
+    def compare(self, other: Any) -> np.ndarray:
+        """Compare against other angles, broadcasting like NumPy.
+
+        A positive return value implies other is greater.
+        """
+        return _compare_values(self.value, _angle_values(other))
+
+    def __eq__(self, other: Any) -> np.ndarray:
+        """Check value equality"""
+        if not isinstance(other, (Angle, AngleArray)):
+            return NotImplemented
+        other_standard = other.standard_value()
+        return self.standard_value() == other_standard
+
+    def __lt__(self, other: Any) -> np.ndarray:
+        """Check value less than, around a common center"""
+        return self.compare(other) < 0
+
+    def __le__(self, other: Any) -> np.ndarray:
+        """Check value less than or equal, around a common center"""
+        return self.compare(other) <= 0
+
+    __hash__ = None
+
+    # Math methods
+
+    def average(self, other: Any) -> Any:
+        """Get the average of two sets of angles."""
+        comp = self.compare(other) / 2
+        return AngleArray(np.mod(_angle_values(other) + 180, 360) - 180 + comp)
+
+    def distance(self, other: Any) -> np.ndarray:
+        """Get the distance between two sets of angles."""
+        return np.abs(self.compare(other))
+
+    @classmethod
+    def sort(cls, a1: Any, a2: Any) -> Tuple[Any, Any]:
+        """Sort two sets of angles elementwise"""
+        swap = a2 < a1
+        v1 = np.where(swap, a2.value, a1.value)
+        v2 = np.where(swap, a1.value, a2.value)
+        return AngleArray(v1, v1), AngleArray(v2, v1)
+
+
+class AngleSegmentArray:
+    """Vectorized counterpart to AngleSegment, over NumPy arrays of degrees"""
+
+    a1: AngleArray
+    a2: AngleArray
+
+    def __init__(self, a1: Any, a2: Any):
+        """Constructor"""
+        if not isinstance(a1, AngleArray):
+            a1 = AngleArray(a1)
+        if not isinstance(a2, AngleArray):
+            a2 = AngleArray(a2)
+
+        self.a1, self.a2 = AngleArray.sort(a1, a2)
+
+    @classmethod
+    def from_segments(cls, segments: Iterable[AngleSegment]) -> Any:
+        """Construct from a list of segments"""
+        segments = list(segments)
+        out = cls.__new__(cls)
+        out.a1 = AngleArray([s.a1.value for s in segments], [s.a1.center for s in segments])
+        out.a2 = AngleArray([s.a2.value for s in segments], [s.a2.center for s in segments])
+        return out
+
+    def __len__(self) -> int:
+        """Get the number of segments"""
+        return len(self.a1)
+
+    def __getitem__(self, key: Any) -> Any:
+        """Index the segments, keeping the same shape semantics as NumPy"""
+        out = AngleSegmentArray.__new__(AngleSegmentArray)
+        out.a1 = self.a1[key]
+        out.a2 = self.a2[key]
+        return out
+
+    def __iter__(self) -> Iterator[AngleSegment]:
+        """Iterate over scalar segments"""
+        return (AngleSegment(a1, a2) for a1, a2 in zip(self.a1, self.a2))
+
+    def __repr__(self) -> str:
+        """Get string representation"""
+        return f'AngleSegmentArray({self.a1.value!r}, {self.a2.value!r})'
+
+    # Math methods
+
+    def check_collision(self, other: Any, limit: float) -> np.ndarray:
+        """Check collisions against other segments or angles within a limit, broadcasting like NumPy"""
+        if isinstance(other, (Angle, AngleArray)):
+            other1 = other2 = other
+        else:
+            other1, other2 = other.a1, other.a2
+
+        self1 = self.a1.value
+        self2 = self.a2.value
+        other1 = _angle_values(other1)
+        other2 = _angle_values(other2)
+
+        comp_start = _compare_values(self2, other2)
+        cross = np.where(
+            comp_start < 0,
+            _compare_values(self2, other1),
+            _compare_values(other2, self1),
+        )
+        return cross + limit > 0
+
+    def length(self) -> np.ndarray:
+        """Get the segment lengths"""
+        return self.a1.distance(self.a2)
+
+    def middle(self) -> AngleArray:
+        """Get the middle angles"""
+        return self.a1.average(self.a2)
+
+
+def _angle_values(angles: Any) -> Any:
+    """Get the raw degree values of an Angle, AngleArray or number"""
+    if isinstance(angles, (Angle, AngleArray)):
+        return angles.value
+    return np.asarray(angles, dtype=float)
+
+
+def _compare_values(values1: Any, values2: Any) -> np.ndarray:
+    """Vectorized Angle.compare over raw degree values"""
+    return np.mod(np.subtract(values1, values2) + 180, 360) - 180
+
+
+class OrderedSet(MutableSet):
+    """Set which iterates in insertion order"""
+    items: Dict[Any, None]
+
+    def __init__(self, items: Iterable[Any] = ()):
+        """Constructor"""
+        self.items = dict.fromkeys(items)
+
+    def __contains__(self, item: Any) -> bool:
+        """Check membership"""
+        return item in self.items
+
+    def __iter__(self) -> Iterator[Any]:
+        """Iterate in insertion order"""
+        return iter(self.items)
+
+    def __len__(self) -> int:
+        """Get the number of items"""
+        return len(self.items)
+
+    def __reversed__(self) -> Iterator[Any]:
+        """Iterate from the last inserted item"""
+        return reversed(self.items)
+
+    def add(self, item: Any):
+        """Add an item, keeping its first position"""
+        self.items[item] = None
+
+    def discard(self, item: Any):
+        """Remove an item if present"""
+        self.items.pop(item, None)
+
+    def __repr__(self) -> str:
+        """Get string representation"""
+        return f'OrderedSet({list(self.items)!r})'
+
+
 class UnionFind:
     """Simple union-find datastructure"""
     parents: Dict[Any, Any]
@@ -0,0 +1 @@
+"""Module for finding dates of astral events."""
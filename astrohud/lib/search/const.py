@@ -0,0 +1,21 @@
+"""Constants for search"""
+
+from astrohud.lib.ephemeris.enums import Planet
+
+
+# Days between scanned dates. Events closer together than the step can be missed.
+SCAN_STEP = 1.0
+SCAN_STEPS = {
+    Planet.MOON: 0.125,
+}
+
+# Events are refined to half a second, so dates are exact once rounded to the second
+SEARCH_PRECISION = 0.5 / 86400
+
+# Dates scanned at once
+SEARCH_CHUNK_SIZE = 1024
+
+# Aspect states, by the angle from the exact aspect
+ASPECT_BEFORE = 0  # Within 90 degrees, before the exact aspect
+ASPECT_AFTER = 1   # Within 90 degrees, after the exact aspect
+ASPECT_FAR = 2     # Further than 90 degrees, where the angle wraps around
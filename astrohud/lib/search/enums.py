@@ -0,0 +1,9 @@
+"""Enums for search"""
+
+from enum import Enum
+
+
+class EventType(Enum):
+    INGRESS = 0  # A planet enters a sign
+    STATION = 1  # A planet turns retrograde or direct
+    ASPECT = 2   # Two planets form an exact aspect
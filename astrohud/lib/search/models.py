@@ -0,0 +1,302 @@
+"""Models for search"""
+
+from abc import ABC
+from abc import abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+import math
+
+import numpy as np
+
+from astrohud.lib._base.models import BaseSplitter
+from astrohud.lib.constellations.models import get_sign_splitter
+from astrohud.lib.ephemeris.enums import Planet
+from astrohud.lib.ephemeris.enums import Sign
+from astrohud.lib.ephemeris.enums import Zodiac
+from astrohud.lib.ephemeris.models import EpheDate
+from astrohud.lib.ephemeris.models import calc_planet
+from astrohud.lib.ephemeris.models import ut_to_date
+from astrohud.lib.horoscope.const import ASPECT_DEGREES
+from astrohud.lib.horoscope.const import NO_SIGN_INDEX
+from astrohud.lib.horoscope.const import OBLIQUITY_TOLERANCE
+from astrohud.lib.horoscope.enums import Aspect
+from astrohud.lib.series.models import calc_planet_array
+from astrohud.lib.series.models import split_signs
+
+from .const import ASPECT_AFTER
+from .const import ASPECT_BEFORE
+from .const import ASPECT_FAR
+from .const import SCAN_STEP
+from .const import SCAN_STEPS
+from .const import SEARCH_CHUNK_SIZE
+from .const import SEARCH_PRECISION
+from .enums import EventType
+
+
+@dataclass(frozen=True)
+class SearchQuery:
+    """Query for the dates of one type of event.
+
+    Ingresses can be limited to one sign, and aspects to one aspect. Aspects need another planet.
+    """
+    event: EventType
+    planet: Planet
+    start: datetime
+    end: datetime
+    zodiac: Zodiac = Zodiac.TROPICAL
+    sign: Optional[Sign] = None
+    other: Optional[Planet] = None
+    aspect: Optional[Aspect] = None
+    limit: Optional[int] = None
+
+    def get_planets(self) -> List[Planet]:
+        """Get the planets involved"""
+        if self.other is None:
+            return [self.planet]
+        return [self.planet, self.other]
+
+    def get_step(self) -> float:
+        """Get the days between scanned dates, fine enough for the fastest planet"""
+        return min(SCAN_STEPS.get(planet, SCAN_STEP) for planet in self.get_planets())
+
+
+@dataclass
+class SearchEvent:
+    """An event found by a search"""
+    date: datetime
+    event: EventType
+    planet: Planet
+    longitude: float
+    sign: Optional[Sign] = None
+    retrograde: Optional[bool] = None
+    other: Optional[Planet] = None
+    aspect: Optional[Aspect] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get builtin values, with enum names and an ISO date"""
+        return dict(
+            date=self.date.isoformat(),
+            event=self.event.name,
+            planet=self.planet.name,
+            longitude=self.longitude,
+            sign=None if self.sign is None else self.sign.name,
+            retrograde=self.retrograde,
+            other=None if self.other is None else self.other.name,
+            aspect=None if self.aspect is None else self.aspect.name,
+        )
+
+
+class EventFinder(ABC):
+    """Find events of one type, as changes between discrete states.
+
+    States are computed for columns of dates while scanning, then for single dates while bisecting each change.
+    """
+    query: SearchQuery
+
+    def __init__(self, query: SearchQuery):
+        """Constructor"""
+        self.query = query
+
+    def prepare(self, ut: float):
+        """Prepare to scan dates from a julian day"""
+        pass
+
+    @abstractmethod
+    def get_states(self, uts: np.ndarray) -> np.ndarray:
+        """Get a row of states for each julian day, with one column per tracked state"""
+        pass
+
+    @abstractmethod
+    def is_event(self, column: int, before: int, after: int) -> bool:
+        """Check if a change of state is a matching event"""
+        pass
+
+    @abstractmethod
+    def make_event(self, ut: float, column: int, before: int, after: int) -> SearchEvent:
+        """Describe an event"""
+        pass
+
+    def get_state(self, ut: float, column: int) -> int:
+        """Get the state of a column for a single julian day"""
+        return int(self.get_states(np.array([ut]))[0, column])
+
+    def refine(self, a: float, b: float, column: int, before: int) -> Tuple[float, int]:
+        """Bisect the first julian day after a where a column leaves its state, and get the new state"""
+        after = None
+        while b - a > SEARCH_PRECISION:
+            mid = (a + b) / 2
+            state = self.get_state(mid, column)
+            if state == before:
+                a = mid
+            else:
+                b, after = mid, state
+
+        if after is None:
+            after = self.get_state(b, column)
+        return b, after
+
+
+class IngressFinder(EventFinder):
+    """Find the dates a planet enters a sign"""
+    signs: Optional[BaseSplitter[Sign]]
+    obliquity: Optional[float]
+
+    def __init__(self, query: SearchQuery):
+        """Constructor"""
+        super().__init__(query)
+        self.signs = None
+        self.obliquity = None
+
+    def prepare(self, ut: float):
+        """Get the sign splitter, rebuilding it once the obliquity drifts past OBLIQUITY_TOLERANCE"""
+        obliquity = EpheDate.from_ut(ut).obliquity
+        if self.signs is None or abs(obliquity - self.obliquity) > OBLIQUITY_TOLERANCE:
+            self.signs = get_sign_splitter(obliquity, self.query.zodiac)
+            self.obliquity = obliquity
+
+    def get_states(self, uts: np.ndarray) -> np.ndarray:
+        """Get the Sign value of the planet"""
+        longitude, latitude, _ = calc_planet_array(uts, self.query.planet, self.query.zodiac)
+        sign, _ = split_signs(self.signs, longitude, latitude)
+        return sign[:, np.newaxis]
+
+    def get_state(self, ut: float, column: int) -> int:
+        """Get the Sign value of the planet for a single julian day, splitting it like SignPosition"""
+        longitude, latitude, _ = calc_planet(ut, self.query.planet, self.query.zodiac)
+        sign = self.signs.split(longitude, latitude)
+        return NO_SIGN_INDEX if sign is None else sign.value
+
+    def is_event(self, column: int, before: int, after: int) -> bool:
+        """Check the planet entered the queried sign, if any"""
+        if after == NO_SIGN_INDEX:
+            return False
+        return self.query.sign is None or after == self.query.sign.value
+
+    def make_event(self, ut: float, column: int, before: int, after: int) -> SearchEvent:
+        """Describe an ingress"""
+        longitude, _, _ = calc_planet(ut, self.query.planet, self.query.zodiac)
+        return SearchEvent(ut_to_date(ut), EventType.INGRESS, self.query.planet, longitude, sign=Sign(after))
+
+
+class StationFinder(EventFinder):
+    """Find the dates a planet turns retrograde or direct"""
+
+    def get_states(self, uts: np.ndarray) -> np.ndarray:
+        """Get 1 where the planet is retrograde"""
+        _, _, speed = calc_planet_array(uts, self.query.planet, self.query.zodiac)
+        return (speed < 0).astype(int)[:, np.newaxis]
+
+    def is_event(self, column: int, before: int, after: int) -> bool:
+        """Every change of direction is a station"""
+        return True
+
+    def make_event(self, ut: float, column: int, before: int, after: int) -> SearchEvent:
+        """Describe a station"""
+        longitude, _, _ = calc_planet(ut, self.query.planet, self.query.zodiac)
+        return SearchEvent(ut_to_date(ut), EventType.STATION, self.query.planet, longitude, retrograde=bool(after))
+
+
+class AspectFinder(EventFinder):
+    """Find the dates two planets form an exact aspect.
+
+    Each aspect angle, on either side, is a column. Its state is whether the angle between the planets
+    is before or after the exact aspect, or too far for the sign of the difference to mean anything.
+    """
+    aspects: List[Aspect]
+    targets: np.ndarray
+
+    def __init__(self, query: SearchQuery):
+        """Constructor"""
+        super().__init__(query)
+        if query.other is None:
+            raise ValueError('Aspect searches need another planet')
+
+        aspects = list(ASPECT_DEGREES) if query.aspect is None else [query.aspect]
+        columns = []
+        for aspect in aspects:
+            degrees = ASPECT_DEGREES[aspect]
+            columns.extend((aspect, target) for target in sorted({degrees, -degrees % 360}))
+        self.aspects = [aspect for aspect, _ in columns]
+        self.targets = np.array([target for _, target in columns], dtype=float)
+
+    def get_states(self, uts: np.ndarray) -> np.ndarray:
+        """Get the aspect state of each column"""
+        longitude1, _, _ = calc_planet_array(uts, self.query.planet, self.query.zodiac)
+        longitude2, _, _ = calc_planet_array(uts, self.query.other, self.query.zodiac)
+        difference = (longitude1 - longitude2)[:, np.newaxis] - self.targets
+        offset = (difference + 180) % 360 - 180
+        states = np.where(offset < 0, ASPECT_BEFORE, ASPECT_AFTER)
+        return np.where(np.abs(offset) >= 90, ASPECT_FAR, states)
+
+    def is_event(self, column: int, before: int, after: int) -> bool:
+        """Check the angle crossed the exact aspect, rather than wrapping around"""
+        return {before, after} == {ASPECT_BEFORE, ASPECT_AFTER}
+
+    def make_event(self, ut: float, column: int, before: int, after: int) -> SearchEvent:
+        """Describe an aspect"""
+        longitude, _, _ = calc_planet(ut, self.query.planet, self.query.zodiac)
+        return SearchEvent(
+            ut_to_date(ut),
+            EventType.ASPECT,
+            self.query.planet,
+            longitude,
+            other=self.query.other,
+            aspect=self.aspects[column],
+        )
+
+
+FINDERS = {
+    EventType.INGRESS: IngressFinder,
+    EventType.STATION: StationFinder,
+    EventType.ASPECT: AspectFinder,
+}
+
+
+def search(query: SearchQuery, progress: Optional[Callable[[float], None]] = None) -> Iterator[SearchEvent]:
+    """Find events in date order, up to the query limit.
+
+    Dates are scanned in chunks at the query step, and each change of state is bisected to the second.
+    The progress callback gets the fraction of the range scanned after each chunk.
+    """
+    finder = FINDERS[query.event](query)
+    start_ut = EpheDate(query.start).ut
+    end_ut = EpheDate(query.end).ut
+    step = query.get_step()
+    count = max(0, math.ceil((end_ut - start_ut) / step)) + 1
+
+    found = 0
+    last_ut = None
+    last_states = None
+    for chunk_start in range(0, count, SEARCH_CHUNK_SIZE):
+        steps = np.arange(chunk_start, min(chunk_start + SEARCH_CHUNK_SIZE, count))
+        uts = np.minimum(start_ut + steps * step, end_ut)
+        finder.prepare(uts[0])
+        states = finder.get_states(uts)
+        if last_states is not None:
+            uts = np.concatenate([[last_ut], uts])
+            states = np.concatenate([last_states[np.newaxis], states])
+
+        events = []
+        for row, column in zip(*np.nonzero(states[1:] != states[:-1])):
+            before = int(states[row, column])
+            ut, after = finder.refine(uts[row], uts[row + 1], column, before)
+            if finder.is_event(column, before, after):
+                events.append((ut, column, before, after))
+
+        for ut, column, before, after in sorted(events):
+            yield finder.make_event(ut, column, before, after)
+            found += 1
+            if query.limit is not None and found >= query.limit:
+                return
+
+        last_ut = uts[-1]
+        last_states = states[-1]
+        if progress is not None:
+            progress(min(1, (last_ut - start_ut) / max(end_ut - start_ut, SEARCH_PRECISION)))
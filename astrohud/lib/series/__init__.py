@@ -0,0 +1 @@
+"""Module for planet position time series."""
@@ -0,0 +1,8 @@
+"""Constants for series"""
+
+
+# Dates computed at once. Memory is bounded by this times the number of planets.
+SERIES_CHUNK_SIZE = 256
+
+# Columns of PositionChunk.iter_rows and PositionChunk.to_frame
+SERIES_COLUMNS = ('date', 'planet', 'longitude', 'latitude', 'speed', 'sign', 'face', 'house', 'retrograde', 'dignity')
@@ -0,0 +1,303 @@
+"""Models for series"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from datetime import timedelta
+from typing import TYPE_CHECKING
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+import csv
+import io
+import json
+
+import numpy as np
+import swisseph as swe
+
+from astrohud.lib._base.models import BaseSplitter
+from astrohud.lib.constellations.models import OBLIQUITY_STEP
+from astrohud.lib.constellations.models import get_rounded_sign_splitter
+from astrohud.lib.constellations.models import get_sign_splitter
+from astrohud.lib.ephemeris.enums import House
+from astrohud.lib.ephemeris.enums import Planet
+from astrohud.lib.ephemeris.enums import Sign
+from astrohud.lib.ephemeris.enums import Zodiac
+from astrohud.lib.ephemeris.models import EpheDate
+from astrohud.lib.ephemeris.models import EpheSettings
+from astrohud.lib.horoscope.const import NO_SIGN_INDEX
+from astrohud.lib.horoscope.const import PLANET_INDEX
+from astrohud.lib.horoscope.const import TRIPLICITY_TIME
+from astrohud.lib.horoscope.enums import Dignity
+from astrohud.lib.horoscope.models import lookup_dignities
+from astrohud.lib.math.models import AngleArray
+from astrohud.lib.math.models import AngleSegmentArray
+from astrohud.lib.timing.models import timings
+
+from .const import SERIES_CHUNK_SIZE
+from .const import SERIES_COLUMNS
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Triplicity time by House value, with 0 for no house
+HOUSE_TIMES = np.array([0] + [TRIPLICITY_TIME[House(i + 1)] for i in range(len(House))])
+
+# Names by column value, with None for missing signs and houses
+SIGN_NAMES: List[Optional[str]] = [Sign(i).name for i in range(NO_SIGN_INDEX)] + [None]
+HOUSE_NAMES: List[Optional[str]] = [None] + [House(i + 1).name for i in range(len(House))]
+DIGNITY_NAMES = {dignity.value: dignity.name for dignity in Dignity}
+
+# Categories of the named columns of PositionChunk.to_frame, indexed by column value
+SIGN_CATEGORIES = [Sign(i).name for i in range(NO_SIGN_INDEX)]
+HOUSE_CATEGORIES = [House(i + 1).name for i in range(len(House))]
+DIGNITY_CATEGORIES = [Dignity(i).name for i in range(len(Dignity))]
+
+
+@dataclass
+class PositionChunk:
+    """Planet positions for a chunk of dates, as columns with one row per date and planet.
+
+    Rows are ordered by date, then planet. Missing signs are NO_SIGN_INDEX and missing houses are 0.
+    """
+    dates: List[datetime]
+    planets: List[Planet]
+    longitude: np.ndarray
+    latitude: np.ndarray
+    speed: np.ndarray
+    sign: np.ndarray
+    face: np.ndarray
+    house: np.ndarray
+    retrograde: np.ndarray
+    dignity: np.ndarray
+
+    def __len__(self) -> int:
+        """Get the number of rows"""
+        return len(self.longitude)
+
+    def get_row_dates(self) -> List[datetime]:
+        """Get the date of each row"""
+        return [date for date in self.dates for _ in self.planets]
+
+    def get_row_planets(self) -> List[Planet]:
+        """Get the planet of each row"""
+        return self.planets * len(self.dates)
+
+    def iter_rows(self) -> Iterator[Tuple]:
+        """Iterate over rows of builtin values, in the order of SERIES_COLUMNS. Faces count from 1."""
+        dates = [date.isoformat() for date in self.get_row_dates()]
+        planets = [planet.name for planet in self.get_row_planets()]
+        return zip(
+            dates,
+            planets,
+            self.longitude.tolist(),
+            self.latitude.tolist(),
+            self.speed.tolist(),
+            [SIGN_NAMES[i] for i in self.sign.tolist()],
+            [None if i < 0 else i + 1 for i in self.face.tolist()],
+            [HOUSE_NAMES[i] for i in self.house.tolist()],
+            self.retrograde.tolist(),
+            [DIGNITY_NAMES[i] for i in self.dignity.tolist()],
+        )
+
+    def to_frame(self) -> 'pd.DataFrame':
+        """Get a data frame with the columns of SERIES_COLUMNS, like iter_rows.
+
+        Names are categorical with fixed categories, so frames of every chunk share one schema.
+        Pandas is only imported here, since it takes tens of megabytes in every process that imports it.
+        """
+        import pandas as pd
+
+        planet_codes = np.tile(np.arange(len(self.planets)), len(self.dates))
+        columns = dict(
+            date=pd.DatetimeIndex(self.dates).repeat(len(self.planets)),
+            planet=pd.Categorical.from_codes(planet_codes, [planet.name for planet in self.planets]),
+            longitude=self.longitude,
+            latitude=self.latitude,
+            speed=self.speed,
+            sign=pd.Categorical.from_codes(np.where(self.sign == NO_SIGN_INDEX, -1, self.sign), SIGN_CATEGORIES),
+            face=pd.array(np.where(self.face < 0, None, self.face + 1), dtype='Int8'),
+            house=pd.Categorical.from_codes(self.house - 1, HOUSE_CATEGORIES),
+            retrograde=self.retrograde,
+            dignity=pd.Categorical.from_codes(self.dignity, DIGNITY_CATEGORIES),
+        )
+        return pd.DataFrame({column: columns[column] for column in SERIES_COLUMNS})
+
+
+class PositionSeries:
+    """Planet positions at regular time steps, computed in chunks of dates.
+
+    Positions are computed with one Swiss Ephemeris call per planet and date, into arrays.
+    Signs, faces, houses and dignities are then split for whole columns at once.
+    """
+    settings: EpheSettings
+    planets: List[Planet]
+    start: datetime
+    step: timedelta
+    count: int
+    chunk_size: int
+
+    def __init__(
+        self,
+        settings: EpheSettings,
+        planets: List[Planet],
+        start: datetime,
+        end: datetime,
+        step: timedelta,
+        chunk_size: int = SERIES_CHUNK_SIZE,
+    ):
+        """Constructor. The range includes start, and end if it falls on a step."""
+        self.settings = settings
+        self.planets = list(planets)
+        self.start = start
+        self.step = step
+        self.count = max(0, (end - start) // step + 1)
+        self.chunk_size = chunk_size
+
+    def __len__(self) -> int:
+        """Get the number of rows"""
+        return self.count * len(self.planets)
+
+    def __iter__(self) -> Iterator[PositionChunk]:
+        """Iterate over chunks of positions"""
+        for chunk_start in range(0, self.count, self.chunk_size):
+            steps = range(chunk_start, min(chunk_start + self.chunk_size, self.count))
+            yield self._get_chunk([self.start + self.step * i for i in steps])
+
+    def _get_chunk(self, dates: List[datetime]) -> PositionChunk:
+        """Compute positions for a chunk of dates"""
+        eds = [EpheDate(date) for date in dates]
+        uts = np.array([ed.ut for ed in eds])
+        obliquity = np.array([ed.obliquity for ed in eds])
+
+        columns = [calc_planet_array(uts, planet, self.settings.zodiac) for planet in self.planets]
+        longitude, latitude, speed = (np.stack(c, axis=1) for c in zip(*columns))
+
+        sign = np.full(longitude.shape, NO_SIGN_INDEX)
+        face = np.full(longitude.shape, -1)
+        opposite = np.full(longitude.shape, NO_SIGN_INDEX)
+        for rows, signs in self._get_sign_runs(obliquity):
+            sign[rows], face[rows] = split_signs(signs, longitude[rows], latitude[rows])
+            opposite[rows], _ = split_signs(signs, longitude[rows] + 180, -latitude[rows])
+
+        house = split_houses(calc_cusps_array(uts, self.settings), longitude)
+        planet_index = np.array([PLANET_INDEX[planet] for planet in self.planets])
+        dignity = lookup_dignities(
+            np.broadcast_to(planet_index, longitude.shape),
+            sign,
+            opposite,
+            face,
+            HOUSE_TIMES[house],
+        )
+
+        return PositionChunk(
+            dates=dates,
+            planets=self.planets,
+            longitude=longitude.ravel(),
+            latitude=latitude.ravel(),
+            speed=speed.ravel(),
+            sign=sign.ravel(),
+            face=face.ravel(),
+            house=house.ravel(),
+            retrograde=(speed < 0).ravel(),
+            dignity=dignity.ravel(),
+        )
+
+    def _get_sign_runs(self, obliquity: np.ndarray) -> Iterator[Tuple[slice, BaseSplitter[Sign]]]:
+        """Get runs of dates sharing a sign splitter, whose obliquity rounds to the same OBLIQUITY_STEP, like Horoscope"""
+        if self.settings.zodiac in (Zodiac.TROPICAL, Zodiac.SIDEREAL):
+            yield slice(0, len(obliquity)), get_sign_splitter(obliquity[0], self.settings.zodiac)
+            return
+
+        steps = np.round(obliquity / OBLIQUITY_STEP).astype(int).tolist()
+        run_start = 0
+        for i in range(1, len(steps) + 1):
+            if i == len(steps) or steps[i] != steps[run_start]:
+                yield slice(run_start, i), get_rounded_sign_splitter(steps[run_start], self.settings.zodiac)
+                run_start = i
+
+
+def dump_row(row: Tuple) -> bytes:
+    """Encode a row as a compact JSON object, with orjson if it is installed"""
+    data = dict(zip(SERIES_COLUMNS, row))
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+def encode_ndjson(series: PositionSeries) -> Iterator[bytes]:
+    """Encode a position series as NDJSON, one chunk at a time"""
+    for chunk in series:
+        yield b''.join(dump_row(row) + b'\n' for row in chunk.iter_rows())
+
+
+def encode_csv(series: PositionSeries) -> Iterator[bytes]:
+    """Encode a position series as CSV with a header, one chunk at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(SERIES_COLUMNS)
+    for chunk in series:
+        writer.writerows(chunk.iter_rows())
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def calc_planet_array(uts: np.ndarray, planet: Planet, zodiac: Zodiac) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Get the ecliptic longitudes, latitudes and speeds of a planet for an array of julian days"""
+    flags = swe.FLG_SPEED
+    if zodiac == Zodiac.SIDEREAL:
+        flags |= swe.FLG_SIDEREAL
+
+    out = np.empty((len(uts), 3))
+    calc_ut = swe.calc_ut
+    for i, ut in enumerate(uts.tolist()):
+        results, _ = calc_ut(ut, planet.value, flags)
+        out[i] = results[0], results[1], results[3]
+    timings.count('swe_calls', len(uts))
+    return out[:, 0], out[:, 1], out[:, 2]
+
+
+def calc_cusps_array(uts: np.ndarray, settings: EpheSettings) -> np.ndarray:
+    """Get the house cusps for an array of julian days, with one row per day"""
+    flag_args = dict()
+    if settings.zodiac == Zodiac.SIDEREAL:
+        flag_args['flags'] = swe.FLG_SIDEREAL
+
+    latitude, longitude = settings.location
+    cusps = np.array([
+        swe.houses_ex(ut, latitude, longitude, hsys=settings.house_sys, **flag_args)[0]
+        for ut in uts.tolist()
+    ])
+    timings.count('swe_calls', len(uts))
+    return cusps
+
+
+def split_signs(signs: BaseSplitter[Sign], ra: np.ndarray, dec: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Get the Sign values and faces for arrays of positions, like SignPosition"""
+    flat_ra = ra.ravel()
+    sign = np.full(flat_ra.shape, NO_SIGN_INDEX)
+    face = np.full(flat_ra.shape, -1)
+
+    rings = dict()
+    for i, d in enumerate(dec.ravel().tolist()):
+        rings.setdefault(signs.get_ring(d), []).append(i)
+
+    for ring, rows in rings.items():
+        ring_signs = np.array([item.value for item in ring.ring.values()] + [NO_SIGN_INDEX])
+        index, face[rows], _ = ring.split_array(flat_ra[rows])
+        sign[rows] = ring_signs[index]
+    return sign.reshape(ra.shape), face.reshape(ra.shape)
+
+
+def split_houses(cusps: np.ndarray, ra: np.ndarray) -> np.ndarray:
+    """Get the House values for positions, given one row of cusps per date and one row of positions per date, like HouseSplitter"""
+    houses = AngleSegmentArray(cusps, np.roll(cusps, -1, axis=1))
+    hits = houses[:, np.newaxis, :].check_collision(AngleArray(ra)[..., np.newaxis], limit=0)
+    return np.where(hits.any(axis=-1), hits.argmax(axis=-1) + 1, 0)
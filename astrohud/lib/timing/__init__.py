@@ -0,0 +1 @@
+"""Module for timing library stages."""
@@ -0,0 +1,109 @@
+"""Models for timing"""
+
+from abc import ABC
+from abc import abstractmethod
+from contextlib import nullcontext
+from functools import wraps
+from typing import Callable
+from typing import ContextManager
+from typing import Dict
+from typing import List
+import time
+
+
+class TimingListener(ABC):
+    """Receives stage durations and counter increments"""
+
+    @abstractmethod
+    def observe(self, stage: str, seconds: float, labels: Dict[str, str]):
+        """Record the duration of a stage"""
+        pass
+
+    @abstractmethod
+    def increment(self, counter: str, amount: int):
+        """Increment a counter"""
+        pass
+
+
+class Span:
+    """Time a stage, and report it to the listeners on exit"""
+    __slots__ = ('timings', 'stage', 'labels', 'start')
+
+    def __init__(self, timings: 'Timings', stage: str, labels: Dict[str, str]):
+        """Constructor"""
+        self.timings = timings
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timings.observe(self.stage, time.perf_counter() - self.start, self.labels)
+
+
+NULL_SPAN = nullcontext()
+
+
+class Timings:
+    """Hooks for timing library stages and counting calls.
+
+    Timing is enabled while a listener is registered. Otherwise span returns a shared
+    no-op context and count returns immediately, so instrumented code runs at full speed.
+    """
+    enabled: bool
+    listeners: List[TimingListener]
+
+    def __init__(self):
+        """Constructor"""
+        self.enabled = False
+        self.listeners = []
+
+    def add_listener(self, listener: TimingListener):
+        """Register a listener, enabling timing"""
+        self.listeners = self.listeners + [listener]
+        self.enabled = True
+
+    def remove_listener(self, listener: TimingListener):
+        """Unregister a listener, disabling timing if it was the last one"""
+        self.listeners = [other for other in self.listeners if other is not listener]
+        self.enabled = bool(self.listeners)
+
+    def span(self, stage: str, **labels: str) -> ContextManager:
+        """Get a context manager timing a stage"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, stage, labels)
+
+    def timed(self, stage: str) -> Callable[[Callable], Callable]:
+        """Decorate a function to time each call as a stage"""
+        def decorator(func: Callable) -> Callable:
+            """Decorator around function"""
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                """Wrap function in a span"""
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with Span(self, stage, dict()):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def count(self, counter: str, amount: int = 1):
+        """Increment a counter"""
+        if not self.enabled:
+            return
+        for listener in self.listeners:
+            listener.increment(counter, amount)
+
+    def observe(self, stage: str, seconds: float, labels: Dict[str, str]):
+        """Report the duration of a stage"""
+        for listener in self.listeners:
+            listener.observe(stage, seconds, labels)
+
+
+# Shared by the whole library
+timings = Timings()
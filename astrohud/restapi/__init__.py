@@ -3,7 +3,15 @@
 from flask import Flask
 from flask_restx import Api
 
+from astrohud.restapi.health.controllers import api as health_api
+from astrohud.restapi.health.controllers import lifecycle
 from astrohud.restapi.horo.controllers import api as horo_api
+from astrohud.restapi.horo.controllers import collect_metrics as horo_collect_metrics
+from astrohud.restapi.horo.controllers import warm_up as horo_warm_up
+from astrohud.restapi.jobs.controllers import api as jobs_api
+from astrohud.restapi.jobs.controllers import recover_jobs
+from astrohud.restapi.metrics.controllers import api as metrics_api
+from astrohud.restapi.metrics.controllers import metrics
 
 
 api = Api(
@@ -12,6 +20,13 @@ api = Api(
 )
 
 api.add_namespace(horo_api)
+api.add_namespace(health_api)
+api.add_namespace(jobs_api)
+api.add_namespace(metrics_api)
+
+lifecycle.add_step(recover_jobs)
+lifecycle.add_step(horo_warm_up)
+metrics.add_collector(horo_collect_metrics)
 
 flask_app = Flask(__name__)
 api.init_app(flask_app)
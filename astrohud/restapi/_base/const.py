@@ -0,0 +1,25 @@
+"""Constants used throughout the restapi module"""
+
+import os
+
+
+# Response cache
+
+CACHE_SIZE = int(os.environ.get('ASTROHUD_CACHE_SIZE', 256))
+CACHE_DIR = os.environ.get('ASTROHUD_CACHE_DIR') or None
+IMAGE_CACHE_SIZE = int(os.environ.get('ASTROHUD_IMAGE_CACHE_SIZE', 32))
+
+
+# Response compression. Bodies smaller than the minimum size are sent uncompressed.
+
+COMPRESS_MIN_SIZE = int(os.environ.get('ASTROHUD_COMPRESS_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.environ.get('ASTROHUD_GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('ASTROHUD_BROTLI_QUALITY', 5))
+
+
+# Worker processes
+
+WORKER_COUNT = int(os.environ.get('ASTROHUD_WORKERS', 0)) or os.cpu_count() or 1
+RENDER_WORKER_COUNT = int(os.environ.get('ASTROHUD_RENDER_WORKERS', 0)) or WORKER_COUNT
+RENDER_QUEUE_SIZE = int(os.environ.get('ASTROHUD_RENDER_QUEUE_SIZE', 0)) or RENDER_WORKER_COUNT * 2
+RENDER_TIMEOUT = float(os.environ.get('ASTROHUD_RENDER_TIMEOUT', 30))
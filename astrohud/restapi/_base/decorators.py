@@ -5,6 +5,7 @@ from functools import wraps
 
 from flask_restx import Model
 from flask_restx import Api
+from flask_restx.reqparse import RequestParser
 from flask import request
 
 
@@ -21,4 +22,34 @@ def input_schema(api: Api, schema: Model):
 
         return wrapper
 
-    return decorator
\ No newline at end of file
+    return decorator
+
+
+def input_list_schema(api: Api, schema: Model):
+    """Make an endpoint use a list of a schema as an input to the request body"""
+    def decorator(func: Callable):
+        """Decorator around function"""
+        @wraps(func)
+        @api.expect([schema], validate=True)
+        def wrapper(*args, **kwargs):
+            """Wrap function and call with the list as items"""
+            return func(*args, items=request.json, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def input_args(api: Api, parser: RequestParser):
+    """Make an endpoint use a parser for its query arguments"""
+    def decorator(func: Callable):
+        """Decorator around function"""
+        @wraps(func)
+        @api.expect(parser)
+        def wrapper(*args, **kwargs):
+            """Wrap function and call with the parsed arguments"""
+            return func(*args, **parser.parse_args(), **kwargs)
+
+        return wrapper
+
+    return decorator
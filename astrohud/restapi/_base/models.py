@@ -0,0 +1,464 @@
+"""Models used throughout the restapi module"""
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from dataclasses import field
+from threading import Condition
+from threading import Lock
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+
+from flask import Response
+from flask import request
+
+from astrohud.lib.datasets.models import load_datasets
+
+from .const import BROTLI_QUALITY
+from .const import COMPRESS_MIN_SIZE
+from .const import GZIP_LEVEL
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Supported content codings, in order of preference
+CONTENT_ENCODINGS: List[str] = (['br'] if brotli is not None else []) + ['gzip']
+
+
+def dump_json(data: Any) -> bytes:
+    """Encode JSON compactly, with orjson if it is installed"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a body with a content coding from CONTENT_ENCODINGS"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+@dataclass
+class CachedResponse:
+    """Response body with a strong ETag.
+
+    Compressed bodies are kept alongside, so each encoding is compressed once per entry.
+    """
+    body: bytes
+    etag: str
+    mimetype: str = 'application/json'
+    compressible: bool = True
+    encoded: Dict[str, bytes] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_body(cls, body: bytes, mimetype: str = 'application/json', compressible: bool = True):
+        """Construct from a body, hashing it for the ETag"""
+        return cls(body=body, etag=hashlib.sha256(body).hexdigest(), mimetype=mimetype, compressible=compressible)
+
+    def get_encoding(self) -> Optional[str]:
+        """Get the content coding for the request, or None to send the body as is"""
+        if not self.compressible or len(self.body) < COMPRESS_MIN_SIZE:
+            return None
+        return request.accept_encodings.best_match(CONTENT_ENCODINGS)
+
+    def get_body(self, encoding: Optional[str]) -> bytes:
+        """Get the body in a content coding, compressing it on first use"""
+        if encoding is None:
+            return self.body
+
+        body = self.encoded.get(encoding)
+        if body is None:
+            body = self.encoded[encoding] = compress(self.body, encoding)
+        return body
+
+    def make_response(self) -> Response:
+        """Make a flask response, negotiating Accept-Encoding and honoring If-None-Match.
+
+        Each encoding has its own ETag, since strong ETags identify the exact bytes.
+        Chart endpoints are safe queries even when POSTed, so a match is a 304 for any method.
+        """
+        encoding = self.get_encoding()
+        etag = self.etag if encoding is None else f'{self.etag}-{encoding}'
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(self.get_body(encoding), mimetype=self.mimetype)
+
+        if encoding is not None:
+            response.content_encoding = encoding
+        if self.compressible:
+            response.vary.add('Accept-Encoding')
+        response.set_etag(etag)
+        return response
+
+
+class SingleFlight:
+    """Share one in-flight computation between concurrent callers with the same key"""
+    calls: Dict[str, Future]
+    leaders: int
+    coalesced: int
+
+    def __init__(self):
+        """Constructor"""
+        self.calls = dict()
+        self.leaders = 0
+        self.coalesced = 0
+        self.lock = Lock()
+
+    def do(self, key: str, compute: Callable[[], Any]) -> Any:
+        """Compute a result, or wait for the same key's computation already in flight.
+
+        Exceptions are shared with every waiting caller.
+        """
+        with self.lock:
+            future = self.calls.get(key)
+            if future is None:
+                future = self.calls[key] = Future()
+                self.leaders += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = compute()
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+
+class Broadcast:
+    """Latest value published to any number of waiting readers.
+
+    Readers skip values published while they were busy, so a slow reader never falls behind.
+    """
+    value: Any
+    version: int
+    closed: bool
+
+    def __init__(self):
+        """Constructor"""
+        self.value = None
+        self.version = 0
+        self.closed = False
+        self.condition = Condition()
+
+    def publish(self, value: Any):
+        """Publish a new value, waking every reader"""
+        with self.condition:
+            self.value = value
+            self.version += 1
+            self.condition.notify_all()
+
+    def close(self):
+        """Stop publishing, waking every reader"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def wait(self, version: int, timeout: Optional[float] = None) -> Tuple[int, Any]:
+        """Wait for a value newer than a version, and get the latest version and value.
+
+        The version is unchanged if the timeout passed or the broadcast closed first.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.version > version or self.closed, timeout)
+            if self.version > version:
+                return self.version, self.value
+            return version, None
+
+
+class ResponseCache:
+    """Cache of response bodies by key.
+
+    Entries live in a bounded in-memory LRU, and optionally in a directory
+    which survives restarts and is shared between workers.
+    Entries can also be found by ETag, with an index of the keys by ETag kept in both tiers.
+    Concurrent misses for the same key share one computation.
+    Responses are compressed for clients that accept it, unless the cache is not compressible.
+    """
+    max_size: int
+    directory: Optional[str]
+    mimetype: str
+    compressible: bool
+    entries: OrderedDict
+    etags: Dict[str, str]
+    flight: SingleFlight
+    hits: int
+    computed: int
+
+    def __init__(
+        self,
+        max_size: int,
+        directory: Optional[str] = None,
+        mimetype: str = 'application/json',
+        compressible: bool = True,
+    ):
+        """Constructor"""
+        self.max_size = max_size
+        self.directory = directory
+        self.mimetype = mimetype
+        self.compressible = compressible
+        self.entries = OrderedDict()
+        self.etags = dict()
+        self.flight = SingleFlight()
+        self.hits = 0
+        self.computed = 0
+        self.lock = Lock()
+
+        if directory is not None:
+            os.makedirs(os.path.join(directory, 'etag'), exist_ok=True)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Get an entry, or None if not cached"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        body = self._read_file(key)
+        if body is None:
+            return None
+
+        entry = CachedResponse.from_body(body, self.mimetype, self.compressible)
+        self._put_memory(key, entry)
+        with self.lock:
+            self.hits += 1
+        return entry
+
+    def find(self, etag: str) -> Optional[CachedResponse]:
+        """Get an entry by ETag, or None if not cached.
+
+        The ETag of any content coding of the entry, such as '<etag>-gzip', finds it too.
+        """
+        etag = etag.strip('"').split('-')[0]
+        if not etag.isascii() or not etag.isalnum():
+            return None
+
+        with self.lock:
+            key = self.etags.get(etag)
+        if key is None:
+            key = self._read_etag_file(etag)
+        if key is None:
+            return None
+
+        entry = self.get(key)
+        if entry is None or entry.etag != etag:
+            return None
+        return entry
+
+    def put(self, key: str, body: bytes) -> CachedResponse:
+        """Add a computed body to the cache"""
+        entry = CachedResponse.from_body(body, self.mimetype, self.compressible)
+        self._put_memory(key, entry)
+        self._write_file(key, body)
+        self._write_etag_file(entry.etag, key)
+        with self.lock:
+            self.computed += 1
+        return entry
+
+    def get_or_compute(self, key: str, compute: Callable[[], bytes]) -> CachedResponse:
+        """Get an entry, computing and caching its body if missing.
+
+        Concurrent callers for a missing key wait on the first caller's computation.
+        """
+        entry = self.get(key)
+        if entry is None:
+            entry = self.flight.do(key, lambda: self.get(key) or self.put(key, compute()))
+        return entry
+
+    def stats(self) -> Dict[str, int]:
+        """Get the cache counters"""
+        with self.lock:
+            return dict(
+                size=len(self.entries),
+                hits=self.hits,
+                computed=self.computed,
+                coalesced=self.flight.coalesced,
+            )
+
+    def clear(self):
+        """Clear the in-memory entries"""
+        with self.lock:
+            self.entries.clear()
+            self.etags.clear()
+
+    def _put_memory(self, key: str, entry: CachedResponse):
+        """Add an entry to the LRU, evicting the oldest if full"""
+        if self.max_size <= 0:
+            return
+
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            self.etags[entry.etag] = key
+            while len(self.entries) > self.max_size:
+                old_key, old_entry = self.entries.popitem(last=False)
+                if self.etags.get(old_entry.etag) == old_key:
+                    del self.etags[old_entry.etag]
+
+    def _get_path(self, key: str) -> str:
+        """Get the file path for a key"""
+        return os.path.join(self.directory, key)
+
+    def _get_etag_path(self, etag: str) -> str:
+        """Get the path of the file holding the key of an ETag"""
+        return os.path.join(self.directory, 'etag', etag)
+
+    def _read_file(self, key: str) -> Optional[bytes]:
+        """Read a body from the directory, if any"""
+        if self.directory is None:
+            return None
+        return self._read_path(self._get_path(key))
+
+    def _read_etag_file(self, etag: str) -> Optional[str]:
+        """Read the key of an ETag from the directory, if any"""
+        if self.directory is None:
+            return None
+        key = self._read_path(self._get_etag_path(etag))
+        return None if key is None else key.decode()
+
+    def _write_file(self, key: str, body: bytes):
+        """Atomically write a body to the directory, if any"""
+        if self.directory is not None:
+            self._write_path(self._get_path(key), body)
+
+    def _write_etag_file(self, etag: str, key: str):
+        """Atomically write the key of an ETag to the directory, if any"""
+        if self.directory is not None:
+            self._write_path(self._get_etag_path(etag), key.encode())
+
+    def _read_path(self, path: str) -> Optional[bytes]:
+        """Read a file, or None if it does not exist"""
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_path(self, path: str, data: bytes):
+        """Atomically write a file in the directory"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+class PoolFullError(RuntimeError):
+    """Raised when a worker pool has too many pending tasks"""
+
+
+class WorkerPool:
+    """Process pool shared by requests, started on first use.
+
+    Workers are spawned rather than forked, since the server process may be multi-threaded.
+    Shared datasets are loaded before starting workers, so workers map their files instead of building them.
+    If max_pending is set, submitting more tasks than that raises PoolFullError instead of queueing.
+    """
+    max_workers: int
+    max_pending: Optional[int]
+    initializer: Optional[Callable]
+    executor: Optional[ProcessPoolExecutor]
+    pending: int
+
+    def __init__(self, max_workers: int, initializer: Optional[Callable] = None, max_pending: Optional[int] = None):
+        """Constructor"""
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.initializer = initializer
+        self.executor = None
+        self.pending = 0
+        self.lock = Lock()
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        """Get the executor, starting it if needed"""
+        with self.lock:
+            if self.executor is None:
+                load_datasets()
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=self.initializer,
+                )
+            return self.executor
+
+    def start(self):
+        """Start every worker and wait for their initializers to finish"""
+        executor = self.get_executor()
+        futures = [executor.submit(_noop) for _ in range(self.max_workers)]
+        for future in futures:
+            future.result()
+
+    def submit(self, func: Callable, *args: Any) -> Future:
+        """Submit a task, restarting the executor if a worker died"""
+        with self.lock:
+            if self.max_pending is not None and self.pending >= self.max_pending:
+                raise PoolFullError(f'{self.pending} tasks are already pending')
+            self.pending += 1
+
+        try:
+            executor = self.get_executor()
+            try:
+                future = executor.submit(func, *args)
+            except BrokenProcessPool:
+                self.shutdown(executor)
+                future = self.get_executor().submit(func, *args)
+        except BaseException:
+            self._task_done()
+            raise
+
+        future.add_done_callback(self._task_done)
+        return future
+
+    def shutdown(self, executor: Optional[ProcessPoolExecutor] = None):
+        """Shut down the executor, if it is still the current one"""
+        with self.lock:
+            if self.executor is None or (executor is not None and executor is not self.executor):
+                return
+            executor, self.executor = self.executor, None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _task_done(self, future: Optional[Future] = None):
+        """Release a pending slot"""
+        with self.lock:
+            self.pending -= 1
+
+
+def _noop():
+    """Do nothing, in a worker process"""
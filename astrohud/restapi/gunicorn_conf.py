@@ -0,0 +1,33 @@
+"""Gunicorn configuration for the REST API.
+
+Run with `gunicorn -c python:astrohud.restapi.gunicorn_conf astrohud.restapi:flask_app`.
+"""
+
+import os
+
+
+bind = os.environ.get('ASTROHUD_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('ASTROHUD_GUNICORN_WORKERS', 2))
+
+# Live streams hold a thread each for as long as they are open.
+# Threaded workers keep heartbeating meanwhile, where a sync worker would be blocked and killed at its timeout.
+worker_class = 'gthread'
+threads = int(os.environ.get('ASTROHUD_GUNICORN_THREADS', 32))
+
+
+def on_starting(server):
+    """Build the shared datasets once in the master process, so every worker maps the same files"""
+    from astrohud.chart.renderer.pillow.models import SYMBOL_DATASETS
+    from astrohud.lib.constellations.models import CONSTELLATION_DATASET
+    for dataset in [CONSTELLATION_DATASET, *SYMBOL_DATASETS.values()]:
+        dataset.load()
+
+
+def post_fork(server, worker):
+    """Warm up each worker in the background.
+
+    Gunicorn kills workers that do not heartbeat within its timeout, so warmup must not block.
+    Load balancers should wait on /health/ready instead.
+    """
+    from astrohud.restapi import lifecycle
+    lifecycle.start_warmup()
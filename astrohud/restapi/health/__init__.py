@@ -0,0 +1 @@
+"""Submodule for health namespace"""
\ No newline at end of file
@@ -0,0 +1,40 @@
+"""Controllers for the health namespace"""
+
+from typing import Any
+from typing import Dict
+from typing import Tuple
+
+from flask_restx import Namespace
+from flask_restx import Resource
+
+from .models import Lifecycle
+from .schema import readiness
+from .schema import register_schema
+
+
+api = Namespace('health', description='Check server health')
+register_schema(api)
+
+lifecycle = Lifecycle()
+
+
+@api.route('/live')
+class Live(Resource):
+    """Liveness probe"""
+
+    def get(self) -> Dict[str, Any]:
+        """Check the server is running"""
+        return dict(live=True)
+
+
+@api.route('/ready')
+class Ready(Resource):
+    """Readiness probe"""
+
+    @api.marshal_with(readiness, code=200)
+    @api.response(503, 'Warmup has not finished, or failed', readiness)
+    def get(self) -> Tuple[Dict[str, Any], int]:
+        """Check the server has finished warming up"""
+        ready = lifecycle.is_ready()
+        data = dict(ready=ready, warmup_seconds=lifecycle.warmup_seconds, error=lifecycle.error)
+        return data, 200 if ready else 503
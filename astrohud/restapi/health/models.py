@@ -0,0 +1,63 @@
+"""Models for health endpoint"""
+
+from threading import Event
+from threading import Lock
+from threading import Thread
+from typing import Callable
+from typing import List
+from typing import Optional
+import logging
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class Lifecycle:
+    """One-time warmup of a server process, and its readiness"""
+    steps: List[Callable[[], None]]
+    finished: Event
+    started: bool
+    warmup_seconds: Optional[float]
+    error: Optional[str]
+
+    def __init__(self):
+        """Constructor"""
+        self.steps = []
+        self.finished = Event()
+        self.started = False
+        self.warmup_seconds = None
+        self.error = None
+        self.lock = Lock()
+
+    def add_step(self, step: Callable[[], None]):
+        """Add a warmup step"""
+        self.steps.append(step)
+
+    def is_ready(self) -> bool:
+        """Check the warmup finished without errors"""
+        return self.finished.is_set() and self.error is None
+
+    def warmup(self):
+        """Run every warmup step once. Failures are logged, and keep the process from being ready."""
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+
+        start = time.perf_counter()
+        try:
+            for step in self.steps:
+                step()
+        except Exception as error:
+            logger.exception('Warmup failed')
+            self.error = str(error)
+        finally:
+            self.warmup_seconds = time.perf_counter() - start
+            self.finished.set()
+
+    def start_warmup(self) -> Thread:
+        """Run the warmup in a background thread"""
+        thread = Thread(target=self.warmup, name='astrohud-warmup', daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,17 @@
+"""Schema for the health endpoints"""
+
+from flask_restx import fields
+from flask_restx import Model
+from flask_restx import Namespace
+
+
+readiness = Model('Readiness', dict(
+    ready=fields.Boolean(),
+    warmup_seconds=fields.Float(),
+    error=fields.String(),
+))
+
+
+def register_schema(api: Namespace):
+    """Register schema with the api"""
+    api.add_model(readiness.name, readiness)
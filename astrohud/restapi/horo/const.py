@@ -0,0 +1,55 @@
+"""Constants for horo endpoint"""
+
+import os
+
+from astrohud.lib.ephemeris.enums import HouseSystem
+
+
+# Requests for now within the same quantum, in seconds, share one chart
+TIME_QUANTUM = int(os.environ.get('ASTROHUD_TIME_QUANTUM', 60))
+
+# Bump when the chart output changes, to invalidate on-disk caches
+CHART_CACHE_VERSION = 4
+
+# Maximum number of charts in one batch request
+MAX_BATCH_SIZE = int(os.environ.get('ASTROHUD_MAX_BATCH_SIZE', 1000))
+
+# Pillow format and mimetype for each image extension
+IMAGE_FORMATS = {
+    'png': ('PNG', 'image/png'),
+    'webp': ('WEBP', 'image/webp'),
+}
+
+# Maximum number of rows in one ephemeris request
+MAX_EPHEMERIS_ROWS = int(os.environ.get('ASTROHUD_MAX_EPHEMERIS_ROWS', 1000000))
+
+# Mimetype for each ephemeris format
+EPHEMERIS_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Seconds in each ephemeris step unit
+STEP_UNITS = {
+    's': 1,
+    'm': 60,
+    'h': 60 * 60,
+    'd': 24 * 60 * 60,
+}
+
+# Seconds between live chart updates, and between heartbeats on idle live streams
+LIVE_INTERVAL = float(os.environ.get('ASTROHUD_LIVE_INTERVAL', 5))
+LIVE_HEARTBEAT = float(os.environ.get('ASTROHUD_LIVE_HEARTBEAT', 15))
+
+# Default degrees a planet or the ascendant moves before a live chart is sent without a transition
+LIVE_DELTA = 1.0
+
+# Diff events kept by each live feed, for streams a few charts apart
+LIVE_DIFF_CACHE_SIZE = 8
+
+# Maximum number of distinct live streams computed at once
+MAX_LIVE_FEEDS = int(os.environ.get('ASTROHUD_MAX_LIVE_FEEDS', 64))
+
+# Settings for throwaway warmup charts
+WARMUP_ORB_LIMIT = 2
+WARMUP_HOUSE_SYS = HouseSystem.PLACIDUS
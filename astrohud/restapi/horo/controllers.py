@@ -1,31 +1,66 @@
 """Controllers for the horoscope namespace"""
 
-from datetime import datetime
-from datetime import timezone
+from collections import defaultdict
+from concurrent.futures import TimeoutError
+from concurrent.futures import as_completed
 from typing import Any
 from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+import math
+import os
+
+from flask import Response
+from flask import stream_with_context
 
 from flask_restx import Namespace
 from flask_restx import Resource
 
-from astrohud.chart.styles.const import CHART_STYLE_CLASSES
 from astrohud.chart.styles.const import CHART_STYLE_DESCRIPTIONS
-from astrohud.chart.renderer.json.models import JsonRenderer
 from astrohud.lib.ephemeris.const import HOUSE_SYS_DESCRIPTIONS
 from astrohud.lib.ephemeris.const import PLANET_DESCRIPTIONS
 from astrohud.lib.ephemeris.const import ZODIAC_DESCRIPTIONS
-from astrohud.lib.ephemeris.enums import HouseSystem
-from astrohud.lib.ephemeris.enums import Zodiac
-from astrohud.lib.ephemeris.models import EpheDate
-from astrohud.lib.ephemeris.models import EpheSettings
+from astrohud.lib.constellations.models import get_rounded_sign_splitter
 from astrohud.lib.ephemeris.models import init_ephe
-from astrohud.lib.horoscope.models import Horoscope
-from astrohud.lib.horoscope.models import Horoscope
+from astrohud.lib.timing.models import timings
+from astrohud.restapi._base.const import CACHE_DIR
+from astrohud.restapi._base.const import CACHE_SIZE
+from astrohud.restapi._base.const import IMAGE_CACHE_SIZE
+from astrohud.restapi._base.const import RENDER_QUEUE_SIZE
+from astrohud.restapi._base.const import RENDER_TIMEOUT
+from astrohud.restapi._base.const import RENDER_WORKER_COUNT
+from astrohud.restapi._base.const import WORKER_COUNT
+from astrohud.restapi._base.decorators import input_args
+from astrohud.restapi._base.decorators import input_list_schema
 from astrohud.restapi._base.decorators import input_schema
+from astrohud.restapi._base.models import PoolFullError
+from astrohud.restapi._base.models import ResponseCache
+from astrohud.restapi._base.models import WorkerPool
+from astrohud.restapi.metrics.models import MetricFamily
 
+from .const import EPHEMERIS_FORMATS
+from .const import IMAGE_FORMATS
+from .const import MAX_BATCH_SIZE
+from .const import MAX_EPHEMERIS_ROWS
+from .const import MAX_LIVE_FEEDS
+from .models import ChartRequest
+from .models import EphemerisRequest
+from .models import LiveFeedsFullError
+from .models import LiveHub
+from .models import LiveRequest
 from .models import Option
+from .models import encode_chart_diff
+from .models import encode_charts
+from .models import encode_line
+from .models import init_render_worker
+from .models import warm_up_charts
+from .schema import cache_stats
+from .schema import chart_diff_settings
+from .schema import ephemeris_args
 from .schema import horo_settings
 from .schema import horoscope
+from .schema import live_args
 from .schema import register_schema
 from .schema import settings_options
 
@@ -33,6 +68,31 @@ from .schema import settings_options
 api = Namespace('horo', description='Create horoscopes')
 register_schema(api)
 
+chart_cache = ResponseCache(CACHE_SIZE, os.path.join(CACHE_DIR, 'chart') if CACHE_DIR else None)
+diff_cache = ResponseCache(CACHE_SIZE)
+batch_pool = WorkerPool(WORKER_COUNT, initializer=init_ephe)
+
+image_caches = {
+    extension: ResponseCache(
+        IMAGE_CACHE_SIZE,
+        os.path.join(CACHE_DIR, extension) if CACHE_DIR else None,
+        mimetype=mimetype,
+        compressible=False,
+    )
+    for extension, (_, mimetype) in IMAGE_FORMATS.items()
+}
+render_pool = WorkerPool(RENDER_WORKER_COUNT, initializer=init_render_worker, max_pending=RENDER_QUEUE_SIZE)
+
+live_hub = LiveHub(MAX_LIVE_FEEDS)
+
+
+def warm_up():
+    """Warm up chart computation.
+
+    The worker pools start on first use, so gunicorn workers that never batch or render add no processes.
+    """
+    warm_up_charts()
+
 
 @api.route('/options')
 class Options(Resource):
@@ -53,45 +113,246 @@ class Options(Resource):
 class Chart(Resource):
     """Chart horoscope"""
 
-    @api.marshal_with(horoscope)
+    @api.response(200, 'Success', horoscope)
+    @api.response(304, 'Not modified, for a matching If-None-Match header')
     @input_schema(api, horo_settings)
-    def post(
-        self,
-        orb_limit: float,
-        conjunction_limit: float,
-        zodiac: str,
-        house_sys: str,
-        
-        latitude: float,
-        longitude: float,
-        date: str,
-        style: str,
-    ):
+    def post(self, **kwargs):
         """Get a horoscope"""
-        
-        init_ephe()
-
-        settings = EpheSettings(
-            orb_limit=orb_limit,
-            conjunction_limit=conjunction_limit,
-            location=(latitude, longitude),
-            zodiac=getattr(Zodiac, zodiac),
-            house_sys=bytes(getattr(HouseSystem, house_sys).value, 'latin1'),
-        )
+        chart_request = ChartRequest.from_payload(**kwargs)
 
-        date = datetime.fromisoformat(date)
-        date = date.astimezone(timezone.utc)
+        with timings.span('request', endpoint='chart', style=chart_request.style):
+            entry = chart_cache.get_or_compute(chart_request.key(), chart_request.encode)
+        return entry.make_response()
 
-        horo = Horoscope(ed=EpheDate(date), settings=settings)
 
-        chart_cls = CHART_STYLE_CLASSES[style]
-        chart = chart_cls(horo)
-        render = JsonRenderer(chart)
-        render.draw_all()
+@api.route('/chart/diff')
+class ChartDiff(Resource):
+    """Chart horoscope as changes since a previous chart"""
 
-        return dict(
-            planets={k.name: v for k, v in horo.planets.items()},
-            aspects={str(k): v for k, v in horo.aspects.items()},
-            ascending=horo.ascending,
-            chart=render.json
-        )
+    @api.response(200, 'Success. Planets, aspects and chart shapes changed since the base chart, or the whole horoscope if full is true.')
+    @api.response(304, 'Not modified, for a matching If-None-Match header')
+    @api.response(400, 'No base chart')
+    @api.response(404, 'Unknown base ETag. Get the full chart instead.')
+    @input_schema(api, chart_diff_settings)
+    def post(self, base: Optional[str] = None, base_date: Optional[str] = None, **kwargs):
+        """Get a horoscope, with the chart diffed against a chart from an ETag or another date"""
+        chart_request = ChartRequest.from_payload(**kwargs)
+        if base is not None:
+            base_entry = chart_cache.find(base)
+            if base_entry is None:
+                api.abort(404, f'Unknown base ETag: {base}')
+        elif base_date is not None:
+            base_request = ChartRequest.from_payload(**dict(kwargs, date=base_date))
+            base_entry = chart_cache.get_or_compute(base_request.key(), base_request.encode)
+        else:
+            api.abort(400, 'Either base or base_date is required')
+
+        with timings.span('request', endpoint='chart/diff', style=chart_request.style):
+            entry = chart_cache.get_or_compute(chart_request.key(), chart_request.encode)
+            key = f'{base_entry.etag}-{entry.etag}'
+            diff_entry = diff_cache.get_or_compute(key, lambda: encode_chart_diff(base_entry, entry))
+        return diff_entry.make_response()
+
+
+@api.route('/chart.<string:extension>')
+@api.param('extension', f'Image format. Can be: {", ".join(IMAGE_FORMATS)}')
+class ChartImage(Resource):
+    """Chart horoscope as an image"""
+
+    @api.response(200, 'Success')
+    @api.response(304, 'Not modified, for a matching If-None-Match header')
+    @api.response(404, 'Unknown image format')
+    @api.response(503, 'Too many renders are queued')
+    @api.response(504, 'Render timed out')
+    @input_schema(api, horo_settings)
+    def post(self, extension: str, **kwargs):
+        """Get a horoscope chart image, rendered in a pool of worker processes"""
+        if extension not in IMAGE_FORMATS:
+            api.abort(404, f'Unknown image format: {extension}')
+
+        image_format, _ = IMAGE_FORMATS[extension]
+        image_cache = image_caches[extension]
+        chart_request = ChartRequest.from_payload(**kwargs)
+        key = chart_request.key()
+
+        with timings.span('request', endpoint=f'chart.{extension}', style=chart_request.style):
+            entry = image_cache.get_or_compute(key, lambda: render_image(image_cache, key, chart_request, image_format))
+
+        return entry.make_response()
+
+
+@api.route('/stats')
+class Stats(Resource):
+    """Chart cache statistics"""
+
+    @api.marshal_with(cache_stats)
+    def get(self) -> Dict[str, Any]:
+        """Get counters for each response cache"""
+        caches = dict(chart=chart_cache, diff=diff_cache, **image_caches)
+        return {name: cache.stats() for name, cache in caches.items()}
+
+
+@api.route('/charts')
+class Charts(Resource):
+    """Chart a batch of horoscopes"""
+
+    @api.response(200, 'Success. Streams one NDJSON line per chart, with index, etag and result, or index and error.')
+    @api.response(400, 'Too many charts')
+    @input_list_schema(api, horo_settings)
+    def post(self, items: List[Dict[str, Any]]):
+        """Get a batch of horoscopes, streamed in order of completion"""
+        if len(items) > MAX_BATCH_SIZE:
+            api.abort(400, f'At most {MAX_BATCH_SIZE} charts can be requested at once')
+
+        return Response(stream_with_context(stream_charts(items)), mimetype='application/x-ndjson')
+
+
+@api.route('/ephemeris')
+class Ephemeris(Resource):
+    """Planet positions over a range of dates"""
+
+    @api.response(200, 'Success. Streams one row per date and planet, as NDJSON or CSV.')
+    @api.response(400, 'Invalid arguments, or too many rows')
+    @input_args(api, ephemeris_args)
+    def get(self, format: str, **kwargs):
+        """Get planet positions at regular time steps, with their signs, houses and dignities"""
+        try:
+            ephemeris_request = EphemerisRequest.from_args(**kwargs)
+        except (AttributeError, ValueError) as error:
+            api.abort(400, f'Invalid arguments: {error}')
+
+        rows = len(ephemeris_request.get_series())
+        if rows > MAX_EPHEMERIS_ROWS:
+            api.abort(400, f'At most {MAX_EPHEMERIS_ROWS} rows can be requested at once, not {rows}')
+
+        body = ephemeris_request.encode(format)
+        return Response(stream_with_context(body), mimetype=EPHEMERIS_FORMATS[format])
+
+
+@api.route('/live')
+class Live(Resource):
+    """Live horoscope for the current time"""
+
+    @api.response(200, 'Success. Streams server-sent chart events, with the chart ETag as event id.')
+    @api.response(400, 'Invalid arguments')
+    @api.response(503, 'Too many live streams are running')
+    @input_args(api, live_args)
+    def get(self, diff: bool, **kwargs):
+        """Stream the chart whenever a planet changes sign, face, house or direction, an aspect forms or
+        separates, or a planet or the ascendant moves by delta degrees.
+
+        Each distinct set of arguments is computed once, and shared by every stream.
+        With diff, events after the first are diff events, with the changes since the previous chart.
+        """
+        try:
+            live_request = LiveRequest.from_args(**kwargs)
+        except (AttributeError, ValueError) as error:
+            api.abort(400, f'Invalid arguments: {error}')
+
+        try:
+            feed = live_hub.subscribe(live_request)
+        except LiveFeedsFullError:
+            api.abort(503, 'Too many live streams are running, try again later')
+
+        response = Response(feed.stream(diff), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        response.call_on_close(lambda: live_hub.unsubscribe(feed))
+        return response
+
+
+def collect_metrics() -> List[MetricFamily]:
+    """Get response cache, sign splitter cache and live stream statistics"""
+    families = [
+        MetricFamily('astrohud_cache_entries', 'gauge', 'Entries cached in memory'),
+        MetricFamily('astrohud_cache_hits_total', 'counter', 'Lookups answered from a cache'),
+        MetricFamily('astrohud_cache_computed_total', 'counter', 'Entries computed and cached'),
+        MetricFamily('astrohud_cache_coalesced_total', 'counter', 'Requests that waited on an identical request in flight'),
+    ]
+    caches = dict(chart=chart_cache, diff=diff_cache, **image_caches)
+    for name, cache in caches.items():
+        stats = cache.stats()
+        for family, value in zip(families, (stats['size'], stats['hits'], stats['computed'], stats['coalesced'])):
+            family.add(value, cache=name)
+
+    splitter_info = get_rounded_sign_splitter.cache_info()
+    for family, value in zip(families, (splitter_info.currsize, splitter_info.hits, splitter_info.misses)):
+        family.add(value, cache='sign_splitter')
+
+    live_stats = live_hub.stats()
+    live_feeds = MetricFamily('astrohud_live_feeds', 'gauge', 'Live charts being computed')
+    live_feeds.add(live_stats['feeds'])
+    live_subscribers = MetricFamily('astrohud_live_subscribers', 'gauge', 'Open live chart streams')
+    live_subscribers.add(live_stats['subscribers'])
+    return families + [live_feeds, live_subscribers]
+
+
+def render_image(image_cache: ResponseCache, key: str, chart_request: ChartRequest, image_format: str) -> bytes:
+    """Render an image in the render pool, aborting if the pool is full or the render is too slow"""
+    try:
+        future = render_pool.submit(chart_request.render, image_format)
+    except PoolFullError:
+        api.abort(503, 'Too many renders are queued, try again later')
+
+    try:
+        body = future.result(timeout=RENDER_TIMEOUT)
+    except TimeoutError:
+        # Keep the result once the render finishes, so a retry is a cache hit
+        future.add_done_callback(lambda f: f.exception() is None and image_cache.put(key, f.result()))
+        api.abort(504, f'Render took longer than {RENDER_TIMEOUT} seconds')
+
+    return body
+
+
+def stream_charts(items: List[Dict[str, Any]]) -> Iterator[bytes]:
+    """Compute charts for a batch of payloads, and yield NDJSON lines as they complete.
+
+    Cached charts are yielded first. The rest are grouped by horoscope settings, sorted by date,
+    and split into chunks for the worker pool, so each worker can advance one horoscope through its chunk.
+    """
+    indices = defaultdict(list)
+    requests = dict()
+    for index, item in enumerate(items):
+        try:
+            chart_request = ChartRequest.from_payload(**item)
+        except (AttributeError, KeyError, TypeError, ValueError) as error:
+            yield encode_line(index, error=f'Invalid settings: {error}')
+            continue
+
+        key = chart_request.key()
+        indices[key].append(index)
+        requests[key] = chart_request
+
+    groups = defaultdict(list)
+    for key, chart_request in requests.items():
+        entry = chart_cache.get(key)
+        if entry is None:
+            groups[chart_request.horo_key()].append(chart_request)
+            continue
+        for index in indices[key]:
+            yield encode_line(index, entry)
+
+    missing = sum(len(group) for group in groups.values())
+    chunk_size = max(1, math.ceil(missing / batch_pool.max_workers))
+    futures = dict()
+    for group in groups.values():
+        group.sort(key=lambda r: r.date)
+        for start in range(0, len(group), chunk_size):
+            chunk = group[start:start + chunk_size]
+            futures[batch_pool.submit(encode_charts, chunk)] = chunk
+
+    for future in as_completed(futures):
+        chunk = futures[future]
+        try:
+            bodies = future.result()
+        except Exception as error:
+            for chart_request in chunk:
+                for index in indices[chart_request.key()]:
+                    yield encode_line(index, error=f'Failed to compute chart: {error}')
+            continue
+
+        for chart_request, body in zip(chunk, bodies):
+            key = chart_request.key()
+            entry = chart_cache.put(key, body)
+            for index in indices[key]:
+                yield encode_line(index, entry)
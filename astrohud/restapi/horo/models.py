@@ -1,9 +1,63 @@
 """Models for horo endpoint"""
 
+from dataclasses import asdict
 from dataclasses import dataclass
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from enum import Enum
+from threading import Event
+from threading import Lock
+from threading import Thread
 from typing import Any
+from typing import Iterator
 from typing import List
 from typing import Dict
+from typing import Optional
+from typing import Tuple
+import hashlib
+import json
+import logging
+
+from astrohud.chart.renderer.json.models import JsonRenderer
+from astrohud.chart.renderer.json.models import diff_charts
+from astrohud.chart.renderer.pillow.models import PillowRenderer
+from astrohud.chart.renderer.pillow.models import load_symbols
+from astrohud.chart.styles.const import CHART_STYLE_CLASSES
+from astrohud.chart.styles.const import CHART_STYLE_DESCRIPTIONS
+from astrohud.chart.styles.enums import ChartStyle
+from astrohud.lib.ephemeris.enums import HouseSystem
+from astrohud.lib.ephemeris.enums import Planet
+from astrohud.lib.ephemeris.enums import Zodiac
+from astrohud.lib.ephemeris.models import EpheDate
+from astrohud.lib.ephemeris.models import EpheSettings
+from astrohud.lib.ephemeris.models import SignPosition
+from astrohud.lib.ephemeris.models import init_ephe
+from astrohud.lib.horoscope.models import AspectHoroscope
+from astrohud.lib.horoscope.models import Horoscope
+from astrohud.lib.horoscope.models import PlanetHoroscope
+from astrohud.lib.horoscope.models import PlanetTuple
+from astrohud.lib.horoscope.models import Transition
+from astrohud.lib.series.models import PositionSeries
+from astrohud.lib.series.models import encode_csv
+from astrohud.lib.series.models import encode_ndjson
+from astrohud.lib.timing.models import timings
+from astrohud.restapi._base.models import Broadcast
+from astrohud.restapi._base.models import CachedResponse
+from astrohud.restapi._base.models import ResponseCache
+from astrohud.restapi._base.models import dump_json
+
+from .const import CHART_CACHE_VERSION
+from .const import LIVE_DIFF_CACHE_SIZE
+from .const import LIVE_HEARTBEAT
+from .const import LIVE_INTERVAL
+from .const import STEP_UNITS
+from .const import TIME_QUANTUM
+from .const import WARMUP_HOUSE_SYS
+from .const import WARMUP_ORB_LIMIT
+
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -16,3 +70,564 @@ class Option:
     def make_options(cls, items: Dict[str, str]) -> List[Any]:
         """Construct a list of options from a value-description dict"""
         return [cls(value=v, description=d) for v, d in items.items()]
+
+
+@dataclass(frozen=True)
+class ChartRequest:
+    """Normalized horo_settings payload for a chart"""
+    orb_limit: float
+    conjunction_limit: float
+    zodiac: str
+    house_sys: str
+    latitude: float
+    longitude: float
+    date: datetime
+    style: str
+
+    @classmethod
+    def from_payload(
+        cls,
+        orb_limit: float,
+        conjunction_limit: float,
+        zodiac: str,
+        house_sys: str,
+        latitude: float,
+        longitude: float,
+        style: str,
+        date: Optional[str] = None,
+        quantum: int = TIME_QUANTUM,
+    ):
+        """Construct from a horo_settings payload.
+
+        A missing date means now, rounded down to the time quantum. Explicit dates are kept exact.
+        """
+        if date is None:
+            date = datetime.now(timezone.utc)
+            if quantum > 0:
+                timestamp = date.timestamp()
+                date = datetime.fromtimestamp(timestamp - timestamp % quantum, timezone.utc)
+        else:
+            date = datetime.fromisoformat(date).astimezone(timezone.utc)
+
+        return cls(
+            orb_limit=float(orb_limit),
+            conjunction_limit=float(conjunction_limit),
+            zodiac=getattr(Zodiac, zodiac).name,
+            house_sys=getattr(HouseSystem, house_sys).name,
+            latitude=float(latitude),
+            longitude=float(longitude),
+            date=date,
+            style=getattr(ChartStyle, style).name,
+        )
+
+    def key(self) -> str:
+        """Get a unique key for the request"""
+        payload = dict(asdict(self), date=self.date.isoformat(), version=CHART_CACHE_VERSION)
+        encoded = json.dumps(payload, sort_keys=True).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def horo_key(self) -> Tuple:
+        """Get a key for the horoscope settings, ignoring date and style"""
+        return (self.orb_limit, self.conjunction_limit, self.zodiac, self.house_sys, self.latitude, self.longitude)
+
+    def get_settings(self) -> EpheSettings:
+        """Get ephemeris settings"""
+        return EpheSettings(
+            orb_limit=self.orb_limit,
+            conjunction_limit=self.conjunction_limit,
+            location=(self.latitude, self.longitude),
+            zodiac=getattr(Zodiac, self.zodiac),
+            house_sys=bytes(getattr(HouseSystem, self.house_sys).value, 'latin1'),
+        )
+
+    def get_horoscope(self) -> Horoscope:
+        """Compute the horoscope"""
+        with timings.span('horoscope'):
+            return Horoscope(ed=EpheDate(self.date), settings=self.get_settings())
+
+    def compute(self, horo: Optional[Horoscope] = None) -> Dict[str, Any]:
+        """Compute the horoscope and chart, optionally from an existing horoscope"""
+        if horo is None:
+            horo = self.get_horoscope()
+
+        chart_cls = CHART_STYLE_CLASSES[self.style]
+        with timings.span('layout', style=self.style):
+            chart = chart_cls(horo)
+        render = JsonRenderer(chart)
+        render.draw_all()
+
+        return dict(
+            planets={k.name: v for k, v in horo.planets.items()},
+            aspects={str(k): v for k, v in horo.aspects.items()},
+            ascending=horo.ascending,
+            chart=render.json
+        )
+
+    def render(self, image_format: str, horo: Optional[Horoscope] = None) -> bytes:
+        """Compute the horoscope and chart, rendered as an image in a Pillow format, optionally from an existing horoscope"""
+        if horo is None:
+            horo = self.get_horoscope()
+
+        chart_cls = CHART_STYLE_CLASSES[self.style]
+        chart = chart_cls(horo)
+        render = PillowRenderer(chart)
+        render.draw_all()
+        return render.encode(image_format)
+
+    def encode(self, horo: Optional[Horoscope] = None) -> bytes:
+        """Compute the horoscope and chart, encoded as a JSON response body"""
+        data = self.compute(horo)
+        with timings.span('serialize'):
+            return dump_json(dump_horoscope(data))
+
+
+@dataclass(frozen=True)
+class EphemerisRequest:
+    """Normalized query arguments for an ephemeris"""
+    start: datetime
+    end: datetime
+    step: timedelta
+    planets: Tuple[str, ...]
+    zodiac: str
+    house_sys: str
+    latitude: float
+    longitude: float
+
+    @classmethod
+    def from_args(
+        cls,
+        start: str,
+        end: str,
+        step: str,
+        planets: Optional[str],
+        zodiac: str,
+        house_sys: str,
+        latitude: float,
+        longitude: float,
+    ):
+        """Construct from query arguments. Missing planets mean all planets."""
+        if planets:
+            planet_names = tuple(getattr(Planet, name.strip()).name for name in planets.split(','))
+        else:
+            planet_names = tuple(planet.name for planet in Planet)
+
+        return cls(
+            start=datetime.fromisoformat(start).astimezone(timezone.utc),
+            end=datetime.fromisoformat(end).astimezone(timezone.utc),
+            step=parse_step(step),
+            planets=planet_names,
+            zodiac=getattr(Zodiac, zodiac).name,
+            house_sys=getattr(HouseSystem, house_sys).name,
+            latitude=float(latitude),
+            longitude=float(longitude),
+        )
+
+    def get_settings(self) -> EpheSettings:
+        """Get ephemeris settings. Orbs are unused, since aspects are not computed."""
+        return EpheSettings(
+            orb_limit=0,
+            conjunction_limit=0,
+            location=(self.latitude, self.longitude),
+            zodiac=getattr(Zodiac, self.zodiac),
+            house_sys=bytes(getattr(HouseSystem, self.house_sys).value, 'latin1'),
+        )
+
+    def get_series(self) -> PositionSeries:
+        """Get the position series"""
+        planets = [getattr(Planet, name) for name in self.planets]
+        return PositionSeries(self.get_settings(), planets, self.start, self.end, self.step)
+
+    def encode(self, series_format: str) -> Iterator[bytes]:
+        """Compute the series, and encode it one chunk of rows at a time as NDJSON or CSV"""
+        series = self.get_series()
+        if series_format == 'csv':
+            yield from encode_csv(series)
+        else:
+            yield from encode_ndjson(series)
+
+
+@dataclass(frozen=True)
+class LiveRequest:
+    """Normalized query arguments for a live chart"""
+    orb_limit: float
+    conjunction_limit: float
+    zodiac: str
+    house_sys: str
+    latitude: float
+    longitude: float
+    style: str
+    delta: float
+
+    @classmethod
+    def from_args(
+        cls,
+        orb_limit: float,
+        conjunction_limit: float,
+        zodiac: str,
+        house_sys: str,
+        latitude: float,
+        longitude: float,
+        style: str,
+        delta: float,
+    ):
+        """Construct from query arguments"""
+        if not delta > 0:
+            raise ValueError(f'Delta must be positive: {delta}')
+
+        return cls(
+            orb_limit=float(orb_limit),
+            conjunction_limit=float(conjunction_limit),
+            zodiac=getattr(Zodiac, zodiac).name,
+            house_sys=getattr(HouseSystem, house_sys).name,
+            latitude=float(latitude),
+            longitude=float(longitude),
+            style=getattr(ChartStyle, style).name,
+            delta=float(delta),
+        )
+
+    def get_chart_request(self, date: datetime) -> ChartRequest:
+        """Get the chart request for a date"""
+        return ChartRequest(
+            orb_limit=self.orb_limit,
+            conjunction_limit=self.conjunction_limit,
+            zodiac=self.zodiac,
+            house_sys=self.house_sys,
+            latitude=self.latitude,
+            longitude=self.longitude,
+            date=date,
+            style=self.style,
+        )
+
+
+@dataclass
+class LiveChart:
+    """Chart published by a live feed"""
+    date: datetime
+    transitions: List[Dict[str, Any]]
+    entry: CachedResponse
+
+    def encode_event(self, event: str, horoscope: bytes) -> bytes:
+        """Encode a server-sent event with the date, transitions and a horoscope body"""
+        data = b'{"date":"%s","transitions":%s,"horoscope":%s}' % (
+            self.date.isoformat().encode(),
+            dump_json(self.transitions),
+            horoscope,
+        )
+        return encode_event(event, data, self.entry.etag)
+
+
+class LiveFeed:
+    """Chart for the current time, recomputed in a background thread and broadcast to every subscriber.
+
+    A chart is published when the feed starts, then whenever a transition happens, or a planet
+    or the ascendant moves by the request's delta since the last chart.
+    """
+    live_request: LiveRequest
+    interval: float
+    broadcast: Broadcast
+    diffs: ResponseCache
+    subscribers: int
+
+    def __init__(self, live_request: LiveRequest, interval: float = LIVE_INTERVAL):
+        """Constructor"""
+        self.live_request = live_request
+        self.interval = interval
+        self.broadcast = Broadcast()
+        self.diffs = ResponseCache(LIVE_DIFF_CACHE_SIZE, mimetype='text/event-stream')
+        self.subscribers = 0
+        self.stopped = Event()
+        self.thread = Thread(target=self.run, name='live-feed', daemon=True)
+
+    def start(self):
+        """Start computing charts"""
+        self.thread.start()
+
+    def stop(self):
+        """Stop computing charts after the current one"""
+        self.stopped.set()
+
+    def run(self):
+        """Publish chart events until stopped, advancing one horoscope from each date to the next"""
+        try:
+            date = utc_now()
+            horo = published = self.live_request.get_chart_request(date).get_horoscope()
+            self.publish(date, horo, [])
+            while not self.stopped.wait(self.interval):
+                date = utc_now()
+                horo = horo.advance_to(EpheDate(date))
+                transitions = horo.get_transitions(published)
+                if transitions or horo.get_max_shift(published) >= self.live_request.delta:
+                    self.publish(date, horo, transitions)
+                    published = horo
+        except Exception:
+            logger.exception('Live feed failed')
+        finally:
+            self.broadcast.close()
+
+    def publish(self, date: datetime, horo: Horoscope, transitions: List[Transition]):
+        """Encode a chart and broadcast it"""
+        body = self.live_request.get_chart_request(date).encode(horo)
+        self.broadcast.publish(LiveChart(
+            date=date,
+            transitions=[dump_transition(transition) for transition in transitions],
+            entry=CachedResponse.from_body(body),
+        ))
+
+    def stream(self, diff: bool = False, heartbeat: float = LIVE_HEARTBEAT) -> Iterator[bytes]:
+        """Yield the latest chart event and each new one, with a comment as a heartbeat while idle.
+
+        Charts published while the previous event was being sent are skipped. In diff mode,
+        events after the first have the changes since the previous event's chart.
+        """
+        version = 0
+        sent = None
+        while True:
+            new_version, chart = self.broadcast.wait(version, heartbeat)
+            if new_version > version:
+                version = new_version
+                if diff and sent is not None:
+                    yield self.get_diff_event(sent, chart)
+                else:
+                    yield chart.encode_event('chart', chart.entry.body)
+                sent = chart
+            elif self.broadcast.closed:
+                return
+            else:
+                yield b': heartbeat\n\n'
+
+    def get_diff_event(self, base: LiveChart, chart: LiveChart) -> bytes:
+        """Get a diff event between two charts, shared by streams at the same charts"""
+        key = f'{base.entry.etag}-{chart.entry.etag}'
+        entry = self.diffs.get_or_compute(key, lambda: chart.encode_event('diff', encode_chart_diff(base.entry, chart.entry)))
+        return entry.body
+
+
+class LiveFeedsFullError(RuntimeError):
+    """Raised when too many distinct live feeds are running"""
+
+
+class LiveHub:
+    """Live feeds by request, shared between subscribers and stopped once the last one leaves"""
+    max_feeds: int
+    feeds: Dict[LiveRequest, LiveFeed]
+
+    def __init__(self, max_feeds: int):
+        """Constructor"""
+        self.max_feeds = max_feeds
+        self.feeds = dict()
+        self.lock = Lock()
+
+    def subscribe(self, live_request: LiveRequest) -> LiveFeed:
+        """Get the running feed for a request, starting it if needed"""
+        with self.lock:
+            feed = self.feeds.get(live_request)
+            if feed is None or feed.broadcast.closed:
+                if feed is None and len(self.feeds) >= self.max_feeds:
+                    raise LiveFeedsFullError(f'{len(self.feeds)} live feeds are already running')
+                feed = self.feeds[live_request] = LiveFeed(live_request)
+                feed.start()
+            feed.subscribers += 1
+            return feed
+
+    def unsubscribe(self, feed: LiveFeed):
+        """Leave a feed, stopping it if it has no subscribers left"""
+        with self.lock:
+            feed.subscribers -= 1
+            if feed.subscribers > 0:
+                return
+            feed.stop()
+            if self.feeds.get(feed.live_request) is feed:
+                del self.feeds[feed.live_request]
+
+    def stats(self) -> Dict[str, int]:
+        """Get the number of feeds and subscribers"""
+        with self.lock:
+            return dict(
+                feeds=len(self.feeds),
+                subscribers=sum(feed.subscribers for feed in self.feeds.values()),
+            )
+
+
+def utc_now() -> datetime:
+    """Get the current time, to the second like EpheDate"""
+    return datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def encode_event(event: str, data: bytes, event_id: Optional[str] = None) -> bytes:
+    """Encode a server-sent event. The data must be a single line, like compact JSON."""
+    head = b'event: %s\n' % event.encode()
+    if event_id is not None:
+        head = b'id: %s\n' % event_id.encode() + head
+    return head + b'data: %s\n\n' % data
+
+
+def parse_step(step: str) -> timedelta:
+    """Parse a positive time step, in seconds or with a unit in STEP_UNITS"""
+    step = step.strip()
+    unit = 1
+    if step and step[-1] in STEP_UNITS:
+        step, unit = step[:-1], STEP_UNITS[step[-1]]
+
+    seconds = float(step) * unit
+    if not seconds > 0:
+        raise ValueError(f'Step must be positive: {step}')
+    delta = timedelta(seconds=seconds)
+    if delta <= timedelta(0):
+        raise ValueError(f'Step must be at least a microsecond: {step}')
+    return delta
+
+
+def dump_horoscope(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Serialize a computed chart, with the same output as marshalling it with the horoscope schema"""
+    return dict(
+        planets={name: dump_planet(planet) for name, planet in data['planets'].items()},
+        ascending=dump_sign_position(data['ascending']),
+        aspects={name: dump_aspect(aspect) for name, aspect in data['aspects'].items()},
+        chart=data['chart'],
+    )
+
+
+def dump_planet(planet: PlanetHoroscope) -> Dict[str, Any]:
+    """Serialize a planet, matching the planet_horo schema"""
+    return dict(
+        position=dump_sign_position(planet.position),
+        dignity=_get_name(planet.dignity),
+        retrograde=planet.retrograde if planet.retrograde is None else bool(planet.retrograde),
+        score=_get_float(planet.score),
+    )
+
+
+def dump_sign_position(position: SignPosition) -> Dict[str, Any]:
+    """Serialize a sign position, matching the sign_pos schema"""
+    return dict(
+        abs_angle=_get_float(position.abs_angle),
+        sign=_get_name(position.sign),
+        declination=_get_float(position.declination),
+        speed=_get_float(position.speed),
+        house=_get_name(position.house),
+    )
+
+
+def dump_aspect(aspect: AspectHoroscope) -> Dict[str, Any]:
+    """Serialize an aspect, matching the aspect_horo schema"""
+    return dict(
+        aspect=_get_name(aspect.aspect),
+        orb=_get_float(aspect.orb),
+    )
+
+
+def dump_transition(transition: Transition) -> Dict[str, Any]:
+    """Serialize a transition, with enum names"""
+    subject = transition.subject
+    return dict(
+        kind=transition.kind.name,
+        subject=str(subject) if isinstance(subject, PlanetTuple) else subject.name,
+        before=_get_value(transition.before),
+        after=_get_value(transition.after),
+    )
+
+
+def _get_value(value: Any) -> Any:
+    """Get an enum name, or a builtin value"""
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, bool):
+        return value
+    return None if value is None else int(value)
+
+
+def _get_name(value: Optional[Enum]) -> Optional[str]:
+    """Get an enum name, or None"""
+    return None if value is None else value.name
+
+
+def _get_float(value: Optional[float]) -> Optional[float]:
+    """Get a builtin float, or None"""
+    return None if value is None else float(value)
+
+
+def encode_charts(requests: List[ChartRequest]) -> List[bytes]:
+    """Encode charts sharing horoscope settings, in date order.
+
+    Each horoscope is advanced from the previous one with no obliquity tolerance, so it reuses the sign splitter
+    and planet dignities while the dates share a splitter, as single requests do. Dates are built fresh rather
+    than accumulated, so bodies match single requests byte for byte, and can share the chart cache.
+    """
+    horo = None
+    horo_date = None
+    bodies = []
+    for chart_request in requests:
+        if horo is None:
+            horo = chart_request.get_horoscope()
+        elif chart_request.date != horo_date:
+            horo = horo.advance_to(EpheDate(chart_request.date), tolerance=0)
+        horo_date = chart_request.date
+        bodies.append(chart_request.encode(horo))
+    return bodies
+
+
+def encode_chart_diff(base: CachedResponse, entry: CachedResponse) -> bytes:
+    """Encode a chart response as its changes since a base chart response.
+
+    Only the planets and aspects that changed are included, with the names of removed aspects,
+    and the chart is replaced by its shape diff. If that is not smaller than the chart response,
+    as for STAR charts, whose houses are projected from the ascendant so every shape moves,
+    the whole response is sent instead, with full set.
+    The ETags of both charts are included, so the next diff can start from this chart.
+    """
+    base_data = json.loads(base.body)
+    data = json.loads(entry.body)
+    body = dump_json(dict(
+        base=base.etag,
+        etag=entry.etag,
+        full=False,
+        planets=get_changed(base_data['planets'], data['planets']),
+        ascending=data['ascending'],
+        aspects=get_changed(base_data['aspects'], data['aspects']),
+        removed_aspects=[name for name in base_data['aspects'] if name not in data['aspects']],
+        chart=diff_charts(base_data['chart'], data['chart']),
+    ))
+    if len(body) < len(entry.body):
+        return body
+    return dump_json(dict(base=base.etag, etag=entry.etag, full=True, **data))
+
+
+def get_changed(base: Dict[str, Any], items: Dict[str, Any]) -> Dict[str, Any]:
+    """Get the items that were added or changed since a base, by name"""
+    return {name: item for name, item in items.items() if base.get(name) != item}
+
+
+def encode_line(index: int, entry: Optional[CachedResponse] = None, error: Optional[str] = None) -> bytes:
+    """Encode one NDJSON line of a batch response"""
+    if entry is None:
+        return dump_json(dict(index=index, error=error)) + b'\n'
+    return b'{"index":%d,"etag":"%s","result":%s}\n' % (index, entry.etag.encode(), entry.body)
+
+
+def warm_up_charts():
+    """Compute throwaway charts for now, in every zodiac and style.
+
+    This opens the ephemeris files, runs the chart layouts once, and caches the sign splitters
+    of the current obliquity step, which requests for dates around now share for days.
+    """
+    for zodiac in Zodiac:
+        for style in CHART_STYLE_DESCRIPTIONS:
+            chart_request = ChartRequest.from_payload(
+                orb_limit=WARMUP_ORB_LIMIT,
+                conjunction_limit=WARMUP_ORB_LIMIT,
+                zodiac=zodiac.name,
+                house_sys=WARMUP_HOUSE_SYS.name,
+                latitude=0,
+                longitude=0,
+                style=style,
+            )
+            chart_request.encode()
+
+
+def init_render_worker():
+    """Prepare a render worker process, so its first render is not slower than the rest.
+
+    Fonts and constellation data load on import. Symbols are preloaded here, mapping the shared symbol datasets.
+    """
+    init_ephe()
+    load_symbols()
@@ -1,8 +1,13 @@
 """Schema for the horo endpoints"""
 
 from flask_restx import fields
+from flask_restx import inputs
 from flask_restx import Model
 from flask_restx import Namespace
+from flask_restx.reqparse import RequestParser
+
+from .const import EPHEMERIS_FORMATS
+from .const import LIVE_DELTA
 
 
 # Settings options
@@ -32,6 +37,34 @@ horo_settings = Model('HoroSettings', dict(
     style=fields.String(),
 ))
 
+chart_diff_settings = Model('ChartDiffSettings', dict(
+    horo_settings,
+    base=fields.String(description='ETag of a chart returned by this server, in any content coding'),
+    base_date=fields.DateTime(description='Date of the base chart, if no ETag is given'),
+))
+
+ephemeris_args = RequestParser()
+ephemeris_args.add_argument('start', required=True, help='First date, in ISO format')
+ephemeris_args.add_argument('end', required=True, help='Last date, in ISO format')
+ephemeris_args.add_argument('step', default='1d', help='Time between dates, in seconds, or with a unit of s, m, h or d')
+ephemeris_args.add_argument('planets', help='Comma-separated planets. Defaults to all')
+ephemeris_args.add_argument('format', default='ndjson', choices=tuple(EPHEMERIS_FORMATS))
+ephemeris_args.add_argument('zodiac', default='TROPICAL')
+ephemeris_args.add_argument('house_sys', default='PLACIDUS')
+ephemeris_args.add_argument('latitude', type=float, default=0)
+ephemeris_args.add_argument('longitude', type=float, default=0)
+
+live_args = RequestParser()
+live_args.add_argument('orb_limit', type=float, required=True)
+live_args.add_argument('conjunction_limit', type=float, required=True)
+live_args.add_argument('zodiac', default='TROPICAL')
+live_args.add_argument('house_sys', default='PLACIDUS')
+live_args.add_argument('latitude', type=float, required=True)
+live_args.add_argument('longitude', type=float, required=True)
+live_args.add_argument('style', default='MODERN_WHEEL')
+live_args.add_argument('delta', type=float, default=LIVE_DELTA, help='Degrees a planet or the ascendant moves before an update is sent without a transition')
+live_args.add_argument('diff', type=inputs.boolean, default=False, help='Send changes since the previous chart after the first one')
+
 # Horoscope
 
 sign_pos = Model('SignPosition', dict(
@@ -69,15 +102,31 @@ horoscope = Model('Horoscope', dict(
     chart=fields.Raw(),
 ))
 
+# Statistics
+
+cache_counters = Model('CacheCounters', dict(
+    size=fields.Integer(description='Entries in memory'),
+    hits=fields.Integer(description='Requests answered from memory or disk'),
+    computed=fields.Integer(description='Bodies computed and added'),
+    coalesced=fields.Integer(description='Requests that waited on an identical request in flight'),
+))
+
+cache_stats = Model('CacheStats', {
+    '*': fields.Wildcard(fields.Nested(cache_counters)),
+})
+
 
 def register_schema(api: Namespace):
     """Register schema with the api"""
     api.add_model(option.name, option)
     api.add_model(settings_options.name, settings_options)
     api.add_model(horo_settings.name, horo_settings)
+    api.add_model(chart_diff_settings.name, chart_diff_settings)
     api.add_model(sign_pos.name, sign_pos)
     api.add_model(planet_horo.name, planet_horo)
     api.add_model(aspect_horo.name, aspect_horo)
     api.add_model(planets.name, planets)
     api.add_model(aspects.name, aspects)
-    api.add_model(horoscope.name, horoscope)
\ No newline at end of file
+    api.add_model(horoscope.name, horoscope)
+    api.add_model(cache_counters.name, cache_counters)
+    api.add_model(cache_stats.name, cache_stats)
\ No newline at end of file
@@ -0,0 +1 @@
+"""Submodule for jobs namespace"""
\ No newline at end of file
@@ -0,0 +1,27 @@
+"""Constants for jobs endpoint"""
+
+import os
+import tempfile
+
+from astrohud.restapi._base.const import WORKER_COUNT
+
+
+# SQLite database of jobs, shared by every server process on the host
+JOBS_DB = os.environ.get('ASTROHUD_JOBS_DB') or os.path.join(tempfile.gettempdir(), 'astrohud-jobs.sqlite3')
+
+# Seconds to keep jobs and their results
+JOB_TTL = int(os.environ.get('ASTROHUD_JOB_TTL', 24 * 60 * 60))
+
+JOB_WORKER_COUNT = int(os.environ.get('ASTROHUD_JOB_WORKERS', 0)) or WORKER_COUNT
+
+# Maximum number of charts in one batch job
+MAX_JOB_CHARTS = int(os.environ.get('ASTROHUD_MAX_JOB_CHARTS', 100000))
+
+# Maximum number of events in one search job
+MAX_SEARCH_EVENTS = int(os.environ.get('ASTROHUD_MAX_SEARCH_EVENTS', 10000))
+
+# Charts encoded between progress updates in a batch job
+BATCH_JOB_CHUNK_SIZE = 32
+
+# Minimum seconds between progress writes
+PROGRESS_INTERVAL = 0.5
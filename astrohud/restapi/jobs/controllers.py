@@ -0,0 +1,129 @@
+"""Controllers for the jobs namespace"""
+
+from concurrent.futures import Future
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+from flask import Response
+
+from flask_restx import Namespace
+from flask_restx import Resource
+
+from astrohud.restapi._base.decorators import input_schema
+from astrohud.restapi._base.models import WorkerPool
+from astrohud.restapi.horo.models import init_render_worker
+
+from .const import JOB_TTL
+from .const import JOB_WORKER_COUNT
+from .const import JOBS_DB
+from .const import MAX_JOB_CHARTS
+from .enums import JobKind
+from .models import Job
+from .models import JobStore
+from .models import run_job
+from .models import validate_spec
+from .schema import job
+from .schema import job_spec
+from .schema import register_schema
+
+
+api = Namespace('jobs', description='Run long computations in the background')
+register_schema(api)
+
+job_store = JobStore(JOBS_DB)
+job_pool = WorkerPool(JOB_WORKER_COUNT, initializer=init_render_worker)
+
+
+def recover_jobs():
+    """Fail jobs left unfinished by a stopped server, and delete expired ones"""
+    job_store.fail_orphans()
+    job_store.purge_expired()
+
+
+@api.route('')
+class Jobs(Resource):
+    """Background jobs"""
+
+    @api.response(202, 'Queued', job)
+    @api.response(400, 'Invalid job spec')
+    @input_schema(api, job_spec)
+    def post(
+        self,
+        kind: str,
+        chart: Optional[Dict[str, Any]] = None,
+        format: str = 'json',
+        charts: Optional[list] = None,
+        search: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[Dict[str, Any], int, Dict[str, str]]:
+        """Queue a chart, batch or search job"""
+        job_kind = JobKind[kind]
+        spec = dict(chart=chart, format=format, charts=charts, search=search)
+        try:
+            validate_spec(job_kind, spec)
+        except (AttributeError, KeyError, TypeError, ValueError) as error:
+            api.abort(400, f'Invalid job spec: {error}')
+        if charts is not None and len(charts) > MAX_JOB_CHARTS:
+            api.abort(400, f'At most {MAX_JOB_CHARTS} charts can be requested at once')
+
+        job_store.purge_expired()
+        new_job = job_store.create(job_kind, spec, JOB_TTL)
+        future = job_pool.submit(run_job, job_store.path, new_job.id)
+        future.add_done_callback(lambda f: check_worker(new_job.id, f))
+        return api.marshal(new_job.to_dict(), job), 202, {'Location': self.api.url_for(JobDetail, job_id=new_job.id)}
+
+
+@api.route('/<string:job_id>')
+@api.param('job_id', 'Job id')
+class JobDetail(Resource):
+    """One background job"""
+
+    @api.marshal_with(job)
+    @api.response(404, 'Unknown or expired job')
+    def get(self, job_id: str) -> Dict[str, Any]:
+        """Get the status and progress of a job"""
+        return get_job(job_id).to_dict()
+
+    @api.marshal_with(job)
+    @api.response(404, 'Unknown or expired job')
+    def delete(self, job_id: str) -> Dict[str, Any]:
+        """Cancel a job. Running jobs stop at their next progress update."""
+        job_store.cancel(job_id)
+        return get_job(job_id).to_dict()
+
+
+@api.route('/<string:job_id>/result')
+@api.param('job_id', 'Job id')
+class JobResult(Resource):
+    """Result of a background job"""
+
+    @api.response(200, 'Success. The body is the chart JSON or image, batch NDJSON, or search JSON.')
+    @api.response(404, 'Unknown or expired job')
+    @api.response(409, 'The job has not finished successfully')
+    def get(self, job_id: str) -> Response:
+        """Get the result of a finished job"""
+        current = get_job(job_id)
+        result = job_store.get_result(job_id)
+        if result is None:
+            api.abort(409, f'Job is {current.status.name}')
+
+        body, mimetype = result
+        return Response(body, mimetype=mimetype)
+
+
+def get_job(job_id: str) -> Job:
+    """Get a job, aborting if it does not exist"""
+    current = job_store.get(job_id)
+    if current is None:
+        api.abort(404, f'Unknown or expired job: {job_id}')
+    return current
+
+
+def check_worker(job_id: str, future: Future):
+    """Fail a job if its worker died or the task was cancelled"""
+    if future.cancelled():
+        job_store.cancel(job_id)
+    elif future.exception() is not None:
+        job_store.fail(job_id, f'Worker failed: {future.exception()}')
+
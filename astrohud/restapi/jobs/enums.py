@@ -0,0 +1,17 @@
+"""Enums for jobs endpoint"""
+
+from enum import Enum
+
+
+class JobKind(Enum):
+    CHART = 0   # One chart, as JSON or an image
+    BATCH = 1   # Many charts, as NDJSON
+    SEARCH = 2  # Dates of events, as JSON
+
+
+class JobStatus(Enum):
+    QUEUED = 0
+    RUNNING = 1
+    DONE = 2
+    FAILED = 3
+    CANCELLED = 4
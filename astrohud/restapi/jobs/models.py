@@ -0,0 +1,377 @@
+"""Models for jobs endpoint"""
+
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+import json
+import os
+import sqlite3
+import time
+import uuid
+
+from astrohud.lib.ephemeris.enums import Planet
+from astrohud.lib.ephemeris.enums import Sign
+from astrohud.lib.ephemeris.enums import Zodiac
+from astrohud.lib.horoscope.enums import Aspect
+from astrohud.lib.search.enums import EventType
+from astrohud.lib.search.models import SearchQuery
+from astrohud.lib.search.models import search
+from astrohud.restapi._base.models import CachedResponse
+from astrohud.restapi._base.models import dump_json
+from astrohud.restapi.horo.const import IMAGE_FORMATS
+from astrohud.restapi.horo.models import ChartRequest
+from astrohud.restapi.horo.models import encode_charts
+from astrohud.restapi.horo.models import encode_line
+
+from .const import BATCH_JOB_CHUNK_SIZE
+from .const import MAX_SEARCH_EVENTS
+from .const import PROGRESS_INTERVAL
+from .enums import JobKind
+from .enums import JobStatus
+
+
+class JobCancelled(Exception):
+    """Raised in a worker once its job is cancelled"""
+
+
+@dataclass
+class Job:
+    """A job and its status, without its result"""
+    id: str
+    kind: JobKind
+    status: JobStatus
+    spec: Dict[str, Any]
+    progress: float
+    error: Optional[str]
+    mimetype: Optional[str]
+    created: float
+    updated: float
+    expires: float
+    owner: int
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row):
+        """Construct from a database row"""
+        return cls(
+            id=row['id'],
+            kind=JobKind[row['kind']],
+            status=JobStatus[row['status']],
+            spec=json.loads(row['spec']),
+            progress=row['progress'],
+            error=row['error'],
+            mimetype=row['mimetype'],
+            created=row['created'],
+            updated=row['updated'],
+            expires=row['expires'],
+            owner=row['owner'],
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the status fields, with enum names and ISO dates"""
+        return dict(
+            id=self.id,
+            kind=self.kind.name,
+            status=self.status.name,
+            progress=self.progress,
+            error=self.error,
+            created=_format_time(self.created),
+            updated=_format_time(self.updated),
+            expires=_format_time(self.expires),
+        )
+
+
+class JobStore:
+    """Jobs and their results, persisted in SQLite.
+
+    Every server and worker process on the host opens the same file, so no broker is needed.
+    Each call uses its own connection, and status changes are guarded by the expected current status.
+    """
+    path: str
+
+    def __init__(self, path: str):
+        """Constructor"""
+        self.path = path
+        with self.connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    spec TEXT NOT NULL,
+                    progress REAL NOT NULL,
+                    error TEXT,
+                    result BLOB,
+                    mimetype TEXT,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    expires REAL NOT NULL,
+                    owner INTEGER NOT NULL
+                )
+            ''')
+
+    @contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a connection in autocommit mode, closing it afterwards"""
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def create(self, kind: JobKind, spec: Dict[str, Any], ttl: float) -> Job:
+        """Add a queued job, owned by this process"""
+        now = time.time()
+        job = Job(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            status=JobStatus.QUEUED,
+            spec=spec,
+            progress=0,
+            error=None,
+            mimetype=None,
+            created=now,
+            updated=now,
+            expires=now + ttl,
+            owner=os.getpid(),
+        )
+        with self.connect() as db:
+            db.execute(
+                'INSERT INTO jobs VALUES (?, ?, ?, ?, ?, NULL, NULL, NULL, ?, ?, ?, ?)',
+                (job.id, kind.name, job.status.name, json.dumps(spec), 0, now, now, job.expires, job.owner),
+            )
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Get a job, or None if it does not exist or expired"""
+        with self.connect() as db:
+            row = db.execute(
+                'SELECT * FROM jobs WHERE id = ? AND expires >= ?',
+                (job_id, time.time()),
+            ).fetchone()
+        return None if row is None else Job.from_row(row)
+
+    def get_result(self, job_id: str) -> Optional[Tuple[bytes, str]]:
+        """Get the body and mimetype of a finished job, or None"""
+        with self.connect() as db:
+            row = db.execute(
+                'SELECT result, mimetype FROM jobs WHERE id = ? AND status = ? AND expires >= ?',
+                (job_id, JobStatus.DONE.name, time.time()),
+            ).fetchone()
+        return None if row is None else (row['result'], row['mimetype'])
+
+    def start(self, job_id: str) -> bool:
+        """Mark a queued job as running. Returns False if it was cancelled or expired."""
+        return self._update(job_id, [JobStatus.QUEUED], status=JobStatus.RUNNING.name)
+
+    def set_progress(self, job_id: str, progress: float) -> bool:
+        """Record the progress of a running job. Returns False if it is no longer running."""
+        return self._update(job_id, [JobStatus.RUNNING], progress=progress)
+
+    def finish(self, job_id: str, result: bytes, mimetype: str) -> bool:
+        """Store the result of a running job"""
+        return self._update(
+            job_id,
+            [JobStatus.RUNNING],
+            status=JobStatus.DONE.name,
+            progress=1,
+            result=result,
+            mimetype=mimetype,
+        )
+
+    def fail(self, job_id: str, error: str) -> bool:
+        """Mark an unfinished job as failed"""
+        return self._update(job_id, [JobStatus.QUEUED, JobStatus.RUNNING], status=JobStatus.FAILED.name, error=error)
+
+    def cancel(self, job_id: str) -> bool:
+        """Mark an unfinished job as cancelled. Running workers stop at their next progress update."""
+        return self._update(job_id, [JobStatus.QUEUED, JobStatus.RUNNING], status=JobStatus.CANCELLED.name)
+
+    def purge_expired(self) -> int:
+        """Delete expired jobs and their results"""
+        with self.connect() as db:
+            return db.execute('DELETE FROM jobs WHERE expires < ?', (time.time(),)).rowcount
+
+    def fail_orphans(self) -> int:
+        """Mark unfinished jobs as failed if the process that queued them is gone, such as after a restart"""
+        unfinished = (JobStatus.QUEUED.name, JobStatus.RUNNING.name)
+        with self.connect() as db:
+            rows = db.execute('SELECT id, owner FROM jobs WHERE status IN (?, ?)', unfinished).fetchall()
+
+        orphans = [row['id'] for row in rows if not _is_running(row['owner'])]
+        for job_id in orphans:
+            self.fail(job_id, 'The server stopped before the job finished')
+        return len(orphans)
+
+    def _update(self, job_id: str, statuses: List[JobStatus], **values: Any) -> bool:
+        """Update a job if it has one of the expected statuses"""
+        columns = ', '.join(f'{name} = ?' for name in values)
+        placeholders = ', '.join('?' for _ in statuses)
+        with self.connect() as db:
+            cursor = db.execute(
+                f'UPDATE jobs SET {columns}, updated = ? WHERE id = ? AND status IN ({placeholders})',
+                (*values.values(), time.time(), job_id, *(status.name for status in statuses)),
+            )
+            return cursor.rowcount == 1
+
+
+class ProgressReporter:
+    """Throttled progress updates from a worker, raising JobCancelled once the job is cancelled"""
+    store: JobStore
+    job_id: str
+    last_update: float
+
+    def __init__(self, store: JobStore, job_id: str):
+        """Constructor"""
+        self.store = store
+        self.job_id = job_id
+        self.last_update = time.monotonic()
+
+    def __call__(self, progress: float):
+        """Report the fraction of the job done"""
+        now = time.monotonic()
+        if now - self.last_update < PROGRESS_INTERVAL:
+            return
+        self.last_update = now
+        if not self.store.set_progress(self.job_id, progress):
+            raise JobCancelled()
+
+
+def parse_search(
+    event: str,
+    planet: str,
+    start: str,
+    end: str,
+    zodiac: str = 'TROPICAL',
+    sign: Optional[str] = None,
+    other: Optional[str] = None,
+    aspect: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> SearchQuery:
+    """Construct a search query from a search spec"""
+    limit = MAX_SEARCH_EVENTS if limit is None else min(int(limit), MAX_SEARCH_EVENTS)
+    return SearchQuery(
+        event=getattr(EventType, event),
+        planet=getattr(Planet, planet),
+        start=datetime.fromisoformat(start).astimezone(timezone.utc),
+        end=datetime.fromisoformat(end).astimezone(timezone.utc),
+        zodiac=getattr(Zodiac, zodiac),
+        sign=None if sign is None else getattr(Sign, sign),
+        other=None if other is None else getattr(Planet, other),
+        aspect=None if aspect is None else getattr(Aspect, aspect),
+        limit=limit,
+    )
+
+
+def validate_spec(kind: JobKind, spec: Dict[str, Any]):
+    """Check a job spec can be parsed, raising an error otherwise"""
+    if kind == JobKind.CHART:
+        ChartRequest.from_payload(**spec['chart'])
+        if spec.get('format', 'json') not in ('json', *IMAGE_FORMATS):
+            raise ValueError(f'Unknown format: {spec["format"]}')
+    elif kind == JobKind.BATCH:
+        if not isinstance(spec.get('charts'), list):
+            raise ValueError('Batch jobs need a list of charts')
+    elif kind == JobKind.SEARCH:
+        query = parse_search(**spec['search'])
+        if query.event == EventType.ASPECT and query.other is None:
+            raise ValueError('Aspect searches need another planet')
+
+
+def run_chart(spec: Dict[str, Any], progress: Callable[[float], None]) -> Tuple[bytes, str]:
+    """Compute one chart, as JSON or an image"""
+    chart_request = ChartRequest.from_payload(**spec['chart'])
+    extension = spec.get('format', 'json')
+    if extension == 'json':
+        return chart_request.encode(), 'application/json'
+
+    image_format, mimetype = IMAGE_FORMATS[extension]
+    return chart_request.render(image_format), mimetype
+
+
+def run_batch(spec: Dict[str, Any], progress: Callable[[float], None]) -> Tuple[bytes, str]:
+    """Compute many charts, as NDJSON lines like the batch endpoint, in input order.
+
+    Charts are grouped by horoscope settings and sorted by date, so each chunk advances one horoscope.
+    """
+    items = spec['charts']
+    lines = dict()
+    groups = defaultdict(list)
+    for index, item in enumerate(items):
+        try:
+            chart_request = ChartRequest.from_payload(**item)
+        except (AttributeError, KeyError, TypeError, ValueError) as error:
+            lines[index] = encode_line(index, error=f'Invalid settings: {error}')
+            continue
+        groups[chart_request.horo_key()].append((chart_request, index))
+
+    done = len(lines)
+    for group in groups.values():
+        group.sort(key=lambda pair: pair[0].date)
+        for start in range(0, len(group), BATCH_JOB_CHUNK_SIZE):
+            chunk = group[start:start + BATCH_JOB_CHUNK_SIZE]
+            bodies = encode_charts([chart_request for chart_request, _ in chunk])
+            for (_, index), body in zip(chunk, bodies):
+                lines[index] = encode_line(index, CachedResponse.from_body(body))
+            done += len(chunk)
+            progress(done / len(items))
+
+    return b''.join(lines[index] for index in range(len(items))), 'application/x-ndjson'
+
+
+def run_search(spec: Dict[str, Any], progress: Callable[[float], None]) -> Tuple[bytes, str]:
+    """Find the dates of events, as a JSON list"""
+    query = parse_search(**spec['search'])
+    events = [event.to_dict() for event in search(query, progress)]
+    return dump_json(events), 'application/json'
+
+
+JOB_RUNNERS = {
+    JobKind.CHART: run_chart,
+    JobKind.BATCH: run_batch,
+    JobKind.SEARCH: run_search,
+}
+
+
+def run_job(path: str, job_id: str):
+    """Run a job in a worker process, recording its progress and result in the store"""
+    store = JobStore(path)
+    if not store.start(job_id):
+        return
+
+    job = store.get(job_id)
+    try:
+        result, mimetype = JOB_RUNNERS[job.kind](job.spec, ProgressReporter(store, job_id))
+    except JobCancelled:
+        return
+    except Exception as error:
+        store.fail(job_id, f'{type(error).__name__}: {error}')
+        return
+
+    store.finish(job_id, result, mimetype)
+
+
+def _format_time(timestamp: float) -> str:
+    """Format a unix time as an ISO date"""
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def _is_running(pid: int) -> bool:
+    """Check if a process exists on this host"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,52 @@
+"""Schema for the jobs endpoints"""
+
+from flask_restx import fields
+from flask_restx import Model
+from flask_restx import Namespace
+
+from astrohud.lib.search.enums import EventType
+from astrohud.restapi.horo.const import IMAGE_FORMATS
+from astrohud.restapi.horo.schema import horo_settings
+
+from .enums import JobKind
+from .enums import JobStatus
+
+
+search_spec = Model('SearchSpec', dict(
+    event=fields.String(required=True, enum=[event.name for event in EventType]),
+    planet=fields.String(required=True),
+    start=fields.DateTime(required=True),
+    end=fields.DateTime(required=True),
+    zodiac=fields.String(),
+    sign=fields.String(description='For INGRESS, only entries into this sign'),
+    other=fields.String(description='For ASPECT, the second planet'),
+    aspect=fields.String(description='For ASPECT, only this aspect'),
+    limit=fields.Integer(description='Maximum number of events'),
+))
+
+job_spec = Model('JobSpec', dict(
+    kind=fields.String(required=True, enum=[kind.name for kind in JobKind]),
+    chart=fields.Nested(horo_settings, description='For CHART jobs'),
+    format=fields.String(enum=['json', *IMAGE_FORMATS], description='For CHART jobs. Defaults to json'),
+    charts=fields.List(fields.Nested(horo_settings), description='For BATCH jobs'),
+    search=fields.Nested(search_spec, description='For SEARCH jobs'),
+))
+
+job = Model('Job', dict(
+    id=fields.String(),
+    kind=fields.String(),
+    status=fields.String(enum=[status.name for status in JobStatus]),
+    progress=fields.Float(),
+    error=fields.String(),
+    created=fields.DateTime(),
+    updated=fields.DateTime(),
+    expires=fields.DateTime(),
+))
+
+
+def register_schema(api: Namespace):
+    """Register schema with the api"""
+    api.add_model(horo_settings.name, horo_settings)
+    api.add_model(search_spec.name, search_spec)
+    api.add_model(job_spec.name, job_spec)
+    api.add_model(job.name, job)
@@ -0,0 +1 @@
+"""Submodule for metrics namespace"""
\ No newline at end of file
@@ -0,0 +1,18 @@
+"""Constants for metrics endpoint"""
+
+import os
+
+
+# Set to 0 to disable stage timing
+METRICS_ENABLED = os.environ.get('ASTROHUD_METRICS', '1') != '0'
+
+# Prefix of every metric name
+METRIC_PREFIX = 'astrohud'
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Help text for counters from the library timing hooks
+COUNTER_HELP = {
+    'swe_calls': 'Calls to the Swiss Ephemeris',
+}
@@ -0,0 +1,28 @@
+"""Controllers for the metrics namespace"""
+
+from flask import Response
+
+from flask_restx import Namespace
+from flask_restx import Resource
+
+from astrohud.lib.timing.models import timings
+
+from .const import METRICS_ENABLED
+from .models import Metrics
+
+
+api = Namespace('metrics', description='Export server metrics', path='/metrics')
+
+metrics = Metrics()
+if METRICS_ENABLED:
+    timings.add_listener(metrics)
+
+
+@api.route('')
+class Export(Resource):
+    """Prometheus metrics"""
+
+    @api.response(200, 'Success. Metrics in the Prometheus text format.')
+    def get(self) -> Response:
+        """Get stage latency histograms, counters and cache statistics"""
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,140 @@
+"""Models for metrics endpoint"""
+
+from bisect import bisect_left
+from dataclasses import dataclass
+from dataclasses import field
+from threading import Lock
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Tuple
+
+from astrohud.lib.timing.models import TimingListener
+
+from .const import COUNTER_HELP
+from .const import LATENCY_BUCKETS
+from .const import METRIC_PREFIX
+
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+@dataclass
+class MetricFamily:
+    """Samples of one metric, rendered in the Prometheus text format"""
+    name: str
+    kind: str
+    help: str
+    samples: List[Tuple[str, Dict[str, str], float]] = field(default_factory=list)
+
+    def add(self, value: float, suffix: str = '', **labels: str):
+        """Add a sample, with a suffix to the name for histogram parts"""
+        self.samples.append((suffix, labels, value))
+
+    def render(self) -> str:
+        """Render the family with its help and type lines"""
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for suffix, labels, value in self.samples:
+            lines.append(f'{self.name}{suffix}{format_labels(labels)} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+class Histogram:
+    """Latency histogram with fixed buckets"""
+    buckets: Tuple[float, ...]
+    counts: List[int]
+    sum: float
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        """Constructor"""
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value: float):
+        """Add an observation"""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def add_samples(self, family: MetricFamily, labels: Dict[str, str]):
+        """Add cumulative bucket, sum and count samples to a family"""
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            family.add(total, '_bucket', **labels, le=format_value(bound))
+        family.add(self.sum, '_sum', **labels)
+        family.add(total, '_count', **labels)
+
+
+class Metrics(TimingListener):
+    """Collects stage timings and counters for the metrics endpoint.
+
+    Metrics are per process. Stages that run in worker pools are only covered by the request spans around them.
+    """
+    histograms: Dict[Tuple[str, Labels], Histogram]
+    counters: Dict[str, int]
+    collectors: List[Callable[[], Iterable[MetricFamily]]]
+
+    def __init__(self):
+        """Constructor"""
+        self.histograms = dict()
+        self.counters = dict()
+        self.collectors = []
+        self.lock = Lock()
+
+    def observe(self, stage: str, seconds: float, labels: Dict[str, str]):
+        """Record the duration of a stage"""
+        key = (stage, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, counter: str, amount: int):
+        """Increment a counter"""
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def add_collector(self, collector: Callable[[], Iterable[MetricFamily]]):
+        """Add a function collecting extra metrics, such as cache statistics"""
+        self.collectors.append(collector)
+
+    def collect(self) -> List[MetricFamily]:
+        """Get every metric family"""
+        stages = MetricFamily(f'{METRIC_PREFIX}_stage_seconds', 'histogram', 'Duration of each computation stage')
+        families = [stages]
+        with self.lock:
+            for (stage, labels), histogram in sorted(self.histograms.items()):
+                histogram.add_samples(stages, dict(stage=stage, **dict(labels)))
+            for counter, value in sorted(self.counters.items()):
+                help_text = COUNTER_HELP.get(counter, f'Number of {counter}')
+                families.append(MetricFamily(f'{METRIC_PREFIX}_{counter}_total', 'counter', help_text))
+                families[-1].add(value)
+
+        for collector in self.collectors:
+            families.extend(collector())
+        return families
+
+    def render(self) -> str:
+        """Render every metric family in the Prometheus text format"""
+        return ''.join(family.render() for family in self.collect())
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    """Format labels, escaping their values"""
+    if not labels:
+        return ''
+    escaped = {
+        name: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        for name, value in labels.items()
+    }
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped.items()) + '}'
+
+
+def format_value(value: float) -> str:
+    """Format a sample value"""
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -0,0 +1,111 @@
+"""Micro-benchmarks for Angle, AngleSegment and their array counterparts.
+
+Run with `python dev/angle_benchmarks.py` from the repository root.
+Reports time per call, and how many Angle/AngleSegment objects each call allocates.
+"""
+
+from typing import Callable
+from typing import Dict
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from astrohud.lib.math.models import Angle
+from astrohud.lib.math.models import AngleArray
+from astrohud.lib.math.models import AngleSegment
+from astrohud.lib.math.models import AngleSegmentArray
+
+
+N_ARCS = 200
+
+
+class AllocationCounter:
+    """Count constructor calls of a class"""
+
+    cls: type
+    count: int
+
+    def __init__(self, cls: type):
+        """Constructor"""
+        self.cls = cls
+        self.count = 0
+        self.original = cls.__init__
+
+        def counted_init(obj, *args, **kwargs):
+            """Count and forward"""
+            self.count += 1
+            self.original(obj, *args, **kwargs)
+
+        cls.__init__ = counted_init
+
+    def restore(self):
+        """Restore the original constructor"""
+        self.cls.__init__ = self.original
+
+
+def count_allocations(func: Callable) -> Dict[str, int]:
+    """Count Angle and AngleSegment allocations for one call"""
+    counters = [AllocationCounter(Angle), AllocationCounter(AngleSegment)]
+    try:
+        func()
+    finally:
+        for counter in counters:
+            counter.restore()
+    return {counter.cls.__name__: counter.count for counter in counters}
+
+
+def time_call(func: Callable, number: int) -> float:
+    """Get the average time per call, in microseconds"""
+    return timeit.timeit(func, number=number) / number * 1e6
+
+
+def main():
+    """Run all benchmarks"""
+    a1 = Angle(10)
+    a2 = Angle(350)
+    segment = AngleSegment(10, 50)
+    other = AngleSegment(40, 100)
+    point = Angle(20)
+
+    rng = np.random.default_rng(0)
+    starts = rng.uniform(0, 360, N_ARCS)
+    arcs = [AngleSegment(s, s + w) for s, w in zip(starts, rng.uniform(10, 170, N_ARCS))]
+    arc_array = AngleSegmentArray.from_segments(arcs)
+    points = [Angle(p) for p in rng.uniform(0, 360, N_ARCS)]
+    point_array = AngleArray.from_angles(points)
+
+    benchmarks = {
+        'Angle()': (lambda: Angle(123.4), 100000),
+        'Angle ==': (lambda: a1 == a2, 100000),
+        'hash(Angle)': (lambda: hash(a1), 100000),
+        'Angle.compare': (lambda: a1.compare(a2), 100000),
+        'Angle.average': (lambda: a1.average(a2), 100000),
+        'AngleSegment()': (lambda: AngleSegment(10, 50), 100000),
+        'collision (point)': (lambda: segment.check_collision(point, 0), 100000),
+        'collision (segment)': (lambda: segment.check_collision(other, 5), 100000),
+        f'collision matrix, {N_ARCS} arcs (loop)': (
+            lambda: [[s1.check_collision(s2, 5) for s1 in arcs] for s2 in arcs], 3
+        ),
+        f'collision matrix, {N_ARCS} arcs (array)': (
+            lambda: arc_array.check_collision(arc_array[:, np.newaxis], 5), 100
+        ),
+        f'{N_ARCS} points in {N_ARCS} arcs (loop)': (
+            lambda: [[s.check_collision(p, 0) for s in arcs] for p in points], 3
+        ),
+        f'{N_ARCS} points in {N_ARCS} arcs (array)': (
+            lambda: arc_array.check_collision(point_array[:, np.newaxis], 0), 100
+        ),
+    }
+
+    print(f'{"Benchmark":<40}{"us/call":>12}{"Angles":>10}{"Segments":>10}')
+    for name, (func, number) in benchmarks.items():
+        allocations = count_allocations(func)
+        print(f'{name:<40}{time_call(func, number):>12.3f}{allocations["Angle"]:>10}{allocations["AngleSegment"]:>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Benchmarks for encoding /horo/chart responses.
+
+Run with `python dev/serializer_benchmarks.py` from the repository root.
+Compares flask_restx marshalling against the dedicated serializer, with json and orjson.
+"""
+
+from typing import Any
+from typing import Callable
+from typing import Dict
+import json
+import os
+import sys
+import timeit
+
+from flask_restx import marshal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from astrohud.restapi.horo.models import ChartRequest
+from astrohud.restapi.horo.models import dump_horoscope
+from astrohud.restapi.horo.schema import horoscope
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+NUMBER = 200
+DATE = '2021-07-26T12:00:00+00:00'
+
+
+def time_call(func: Callable, number: int) -> float:
+    """Get the average time per call, in microseconds"""
+    return timeit.timeit(func, number=number) / number * 1e6
+
+
+def get_benchmarks(data: Dict[str, Any]) -> Dict[str, Callable]:
+    """Get the encoders to compare"""
+    benchmarks = {
+        'marshal + json': lambda: json.dumps(marshal(data, horoscope), separators=(',', ':')).encode(),
+        'dump_horoscope + json': lambda: json.dumps(dump_horoscope(data), separators=(',', ':')).encode(),
+    }
+    if orjson is not None:
+        benchmarks['dump_horoscope + orjson'] = lambda: orjson.dumps(dump_horoscope(data))
+    return benchmarks
+
+
+def main():
+    """Run all benchmarks"""
+    print(f'{"Style":<16}{"Benchmark":<28}{"us/call":>12}{"bytes":>10}')
+    for style in ('CLASSIC_WHEEL', 'MODERN_WHEEL'):
+        chart_request = ChartRequest.from_payload(2, 2, 'TROPICAL', 'PLACIDUS', 38.5616433, -121.6265455, style, DATE)
+        data = chart_request.compute()
+        for name, func in get_benchmarks(data).items():
+            print(f'{style:<16}{name:<28}{time_call(func, NUMBER):>12.1f}{len(func()):>10}')
+
+
+if __name__ == '__main__':
+    main()